@@ -1,4 +1,5 @@
 import os
+import re
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, CommandHandler, CallbackQueryHandler
@@ -8,6 +9,12 @@ logger = logging.getLogger(__name__)
 # List admin user IDs
 ADMIN_IDS = [int(x) for x in os.getenv('ADMIN_IDS', '').split(',') if x]
 
+# Browser user: jumlah user per halaman, state halaman disimpan di user_data admin
+ADMIN_USERS_PAGE_SIZE = int(os.getenv('ADMIN_USERS_PAGE_SIZE', '8'))
+USER_BROWSER_KEY = 'admin_users'
+# Username Telegram hanya huruf, angka dan underscore
+USER_QUERY_PATTERN = re.compile(r'\w+', re.ASCII)
+
 def admin_required(func):
     """Decorator untuk membatasi akses hanya untuk admin"""
     async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
@@ -18,21 +25,20 @@ def admin_required(func):
         return await func(update, context, *args, **kwargs)
     return wrapper
 
-@admin_required
-async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Panel utama admin"""
+ADMIN_PANEL_TEXT = "🛠️ **Admin Panel**\n\nPilih opsi di bawah:"
+
+def admin_panel_markup() -> InlineKeyboardMarkup:
     keyboard = [
         [InlineKeyboardButton("📊 Statistik Bot", callback_data="admin_stats")],
         [InlineKeyboardButton("👥 Manage Users", callback_data="admin_users")],
         [InlineKeyboardButton("🔧 Broadcast", callback_data="admin_broadcast")],
     ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    await update.message.reply_text(
-        "🛠️ **Admin Panel**\n\n"
-        "Pilih opsi di bawah:",
-        reply_markup=reply_markup
-    )
+    return InlineKeyboardMarkup(keyboard)
+
+@admin_required
+async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Panel utama admin"""
+    await update.message.reply_text(ADMIN_PANEL_TEXT, reply_markup=admin_panel_markup())
 
 async def admin_callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle callback dari admin panel"""
@@ -48,23 +54,50 @@ async def admin_callback_handler(update: Update, context: ContextTypes.DEFAULT_T
     
     if data == "admin_stats":
         await show_bot_stats(query, context)
+    elif data == "admin_users":
+        await show_users(query, context, reset=True)
+    elif data in ("admin_users_next", "admin_users_prev"):
+        await page_users(query, context, forward=data == "admin_users_next")
+    elif data.startswith("admin_user_premium:"):
+        await toggle_user_premium(query, context)
+    elif data == "admin_broadcast":
+        await show_broadcast(query, context)
+    elif data == "admin_broadcast_cancel":
+        await cancel_broadcast(query, context)
     elif data == "admin_back":
         await admin_panel_back(query, context)
     else:
         await query.edit_message_text("⚠️ Fitur ini sedang dalam pengembangan.")
 
 async def show_bot_stats(query, context):
-    """Menampilkan statistik bot sederhana"""
+    """Menampilkan statistik bot dari tabel rollup"""
     try:
-        text = """
+        from app.services.database import db
+        from app.services.usage_buffer import get_usage_stats
+        
+        if db.is_connected:
+            stats = await get_usage_stats()
+            text = f"""
+📊 **Statistik Bot**
+
+👥 **Total Users:** {stats['total_users']:,}
+💎 **Premium Users:** {stats['premium_users']:,}
+🚀 **Active Users (bulan ini):** {stats['active_users']:,}
+📨 **Total Usage:** {stats['total_usage']:,}
+🕐 **Usage 24 jam:** {stats['last_24h_usage']:,}
+📅 **Usage hari ini:** {stats['today_usage']:,}
+🗓️ **Usage bulan ini:** {stats['month_usage']:,}
+            """
+        else:
+            text = """
 📊 **Statistik Bot**
 
 👥 **Total Users:** Data tidak tersedia
 🚀 **Active Users:** Data tidak tersedia
 📨 **Total Usage:** Data tidak tersedia
 
-💡 *Database sedang dalam pengembangan*
-        """
+💡 *Database tidak terhubung*
+            """
         
         keyboard = [[InlineKeyboardButton("⬅️ Back", callback_data="admin_back")]]
         reply_markup = InlineKeyboardMarkup(keyboard)
@@ -75,14 +108,237 @@ async def show_bot_stats(query, context):
         logger.error(f"Error getting stats: {e}")
         await query.edit_message_text("❌ Error mengambil statistik.")
 
+@admin_required
+async def reload_ai_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Reload API key/model AI tanpa restart: /reloadai [nama_model]"""
+    from dotenv import load_dotenv
+    from app.services.ai_analyzer import analyzer_from_context
+    
+    # .env dibaca ulang (menimpa env lama) agar API key hasil rotasi ikut terpakai
+    load_dotenv(override=True)
+    analyzer = analyzer_from_context(context)
+    model_name = context.args[0] if context.args else None
+    
+    if analyzer.reload(model_name=model_name):
+        key_count = len(analyzer.key_pool) // len(analyzer.key_pool.tiers)
+        await update.message.reply_text(f"✅ AI di-reload dengan model {analyzer.model_name} ({key_count} API key)")
+    else:
+        await update.message.reply_text(f"❌ Gagal reload AI: {analyzer.last_error}")
+
+@admin_required
+async def flush_cache_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Kosongkan cache respons AI (memory + database)"""
+    from app.services.cache import response_cache
+    
+    stats = response_cache.stats()
+    try:
+        removed = await response_cache.clear()
+    except Exception as e:
+        logger.error(f"Error flush cache: {e}")
+        await update.message.reply_text("❌ Error mengosongkan cache.")
+        return
+    
+    await update.message.reply_text(
+        "🧹 **Cache AI dikosongkan**\n\n"
+        f"🗑️ Entry dihapus: {removed}\n"
+        f"✅ Hit: {stats['hits']} (DB: {stats['db_hits']})\n"
+        f"❌ Miss: {stats['misses']}\n"
+        f"♻️ Eviction: {stats['evictions']}\n"
+        f"📈 Hit rate: {stats['hit_rate']:.1%}"
+    )
+
+def _user_label(row) -> str:
+    if row['username']:
+        return f"@{row['username']}"
+    return row['first_name'] or str(row['user_id'])
+
+def _user_browser(context, search: str = None, reset: bool = False) -> dict:
+    """State browser: query pencarian dan stack cursor awal tiap halaman"""
+    state = context.user_data.get(USER_BROWSER_KEY)
+    if state is None or reset:
+        state = {'query': search, 'cursors': [None], 'next': None}
+        context.user_data[USER_BROWSER_KEY] = state
+    return state
+
+async def render_users_page(context):
+    """Halaman user saat ini: satu query keyset ter-index per halaman"""
+    from app.services.database import db
+    
+    back_row = [InlineKeyboardButton("⬅️ Back", callback_data="admin_back")]
+    if not db.is_connected:
+        return "👥 **Manage Users**\n\n💡 *Database tidak terhubung*", InlineKeyboardMarkup([back_row])
+    
+    state = _user_browser(context)
+    search = state['query']
+    cursor = state['cursors'][-1]
+    # Ambil satu baris lebih untuk tahu masih ada halaman berikutnya
+    if search:
+        rows = await db.search_users(search, cursor, ADMIN_USERS_PAGE_SIZE + 1)
+    else:
+        rows = await db.get_users_page(cursor, ADMIN_USERS_PAGE_SIZE + 1)
+    has_more = len(rows) > ADMIN_USERS_PAGE_SIZE
+    rows = rows[:ADMIN_USERS_PAGE_SIZE]
+    if has_more:
+        last = rows[-1]
+        state['next'] = (last['sort_key'], last['user_id']) if search else last['id']
+    else:
+        state['next'] = None
+    
+    page = len(state['cursors'])
+    title = f"👥 **Manage Users** — cari: {search}" if search else "👥 **Manage Users**"
+    lines = [f"{title}\n📄 Halaman {page}\n"]
+    keyboard = []
+    for number, row in enumerate(rows, start=(page - 1) * ADMIN_USERS_PAGE_SIZE + 1):
+        label = _user_label(row)
+        badge = "💎" if row['is_premium'] else "👤"
+        lines.append(f"{number}. {badge} {label} — {row['user_id']}")
+        action = "Cabut 💎" if row['is_premium'] else "Jadikan 💎"
+        keyboard.append([InlineKeyboardButton(
+            f"{action} {label}",
+            callback_data=f"admin_user_premium:{row['user_id']}:{0 if row['is_premium'] else 1}"
+        )])
+    if not rows:
+        lines.append("Tidak ada user.")
+    lines.append("\n💡 Cari: /users <username atau user_id>")
+    
+    navigation = []
+    if page > 1:
+        navigation.append(InlineKeyboardButton("◀️ Sebelumnya", callback_data="admin_users_prev"))
+    if has_more:
+        navigation.append(InlineKeyboardButton("Berikutnya ▶️", callback_data="admin_users_next"))
+    if navigation:
+        keyboard.append(navigation)
+    keyboard.append(back_row)
+    return '\n'.join(lines), InlineKeyboardMarkup(keyboard)
+
+async def show_users(query, context, reset: bool = False):
+    if reset:
+        _user_browser(context, reset=True)
+    try:
+        text, reply_markup = await render_users_page(context)
+    except Exception as e:
+        logger.error(f"Error mengambil daftar user: {e}")
+        await query.edit_message_text("❌ Error mengambil daftar user.")
+        return
+    await query.edit_message_text(text, reply_markup=reply_markup)
+
+async def page_users(query, context, forward: bool):
+    state = _user_browser(context)
+    if forward and state['next'] is not None:
+        state['cursors'].append(state['next'])
+    elif not forward and len(state['cursors']) > 1:
+        state['cursors'].pop()
+    await show_users(query, context)
+
+async def toggle_user_premium(query, context):
+    """Ubah status premium langsung dari daftar user"""
+    from app.services.database import update_user_premium
+    
+    _, user_id, is_premium = query.data.split(':')
+    try:
+        await update_user_premium(int(user_id), is_premium == '1')
+    except Exception as e:
+        logger.error(f"Error mengubah premium user {user_id}: {e}")
+        await query.edit_message_text("❌ Error mengubah status premium.")
+        return
+    logger.info(f"💎 Admin {query.from_user.id} set premium user {user_id} = {is_premium == '1'}")
+    await show_users(query, context)
+
+@admin_required
+async def users_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Daftar/cari user: /users [username atau user_id]"""
+    search = ' '.join(context.args).strip().lstrip('@') if context.args else ''
+    if search and not USER_QUERY_PATTERN.fullmatch(search):
+        await update.message.reply_text("💡 Gunakan: /users <username atau user_id>")
+        return
+    
+    _user_browser(context, search=search or None, reset=True)
+    try:
+        text, reply_markup = await render_users_page(context)
+    except Exception as e:
+        logger.error(f"Error mengambil daftar user: {e}")
+        await update.message.reply_text("❌ Error mengambil daftar user.")
+        return
+    await update.message.reply_text(text, reply_markup=reply_markup)
+
+def broadcast_markup(running: bool) -> InlineKeyboardMarkup:
+    keyboard = [[InlineKeyboardButton("🔄 Refresh", callback_data="admin_broadcast")]]
+    if running:
+        keyboard.append([InlineKeyboardButton("⛔ Hentikan", callback_data="admin_broadcast_cancel")])
+    keyboard.append([InlineKeyboardButton("⬅️ Back", callback_data="admin_back")])
+    return InlineKeyboardMarkup(keyboard)
+
+@admin_required
+async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Kirim pesan ke semua user: /broadcast <pesan>"""
+    from app.services.database import db
+    from app.services.broadcast import broadcaster, format_progress, BroadcastBusy
+    
+    # Ambil teks setelah command apa adanya (baris baru tetap dipertahankan)
+    parts = update.message.text.split(maxsplit=1)
+    if len(parts) < 2:
+        await update.message.reply_text("💡 Gunakan: /broadcast <pesan>")
+        return
+    if not db.is_connected:
+        await update.message.reply_text("❌ Broadcast membutuhkan database.")
+        return
+    
+    progress_message = await update.message.reply_text("📣 Menyiapkan broadcast...")
+    try:
+        await broadcaster.start(
+            context.bot, parts[1], update.effective_user.id, progress_message=progress_message
+        )
+    except BroadcastBusy:
+        await progress_message.edit_text(
+            "⚠️ Broadcast lain masih berjalan.",
+            reply_markup=broadcast_markup(running=True)
+        )
+        return
+    except Exception as e:
+        logger.error(f"Error memulai broadcast: {e}")
+        await progress_message.edit_text("❌ Error memulai broadcast.")
+        return
+    
+    await progress_message.edit_text(
+        format_progress(broadcaster.progress()),
+        reply_markup=broadcast_markup(running=True)
+    )
+
+async def show_broadcast(query, context):
+    """Progres dan throughput broadcast terakhir"""
+    from app.services.broadcast import broadcaster, format_progress
+    
+    progress = broadcaster.progress()
+    if progress is None:
+        text = "📣 **Broadcast**\n\nBelum ada broadcast.\n💡 Kirim dengan: /broadcast <pesan>"
+    else:
+        text = format_progress(progress)
+        if progress['paused_for']:
+            text += f"\n⏸️ Dijeda Telegram: {progress['paused_for']:.0f} detik"
+    
+    await query.edit_message_text(
+        text, reply_markup=broadcast_markup(running=bool(progress and progress['running']))
+    )
+
+async def cancel_broadcast(query, context):
+    from app.services.broadcast import broadcaster
+    
+    if await broadcaster.cancel():
+        logger.info(f"⛔ Broadcast dihentikan oleh admin {query.from_user.id}")
+    await show_broadcast(query, context)
+
 async def admin_panel_back(query, context):
     """Kembali ke admin panel"""
-    await admin_panel(update=query, context=context)
+    await query.edit_message_text(ADMIN_PANEL_TEXT, reply_markup=admin_panel_markup())
 
 def setup_admin_handlers(application):
     """Setup semua handler admin"""
     try:
         application.add_handler(CommandHandler("admin", admin_panel))
+        application.add_handler(CommandHandler("reloadai", reload_ai_command))
+        application.add_handler(CommandHandler("flushcache", flush_cache_command))
+        application.add_handler(CommandHandler("broadcast", broadcast_command))
+        application.add_handler(CommandHandler("users", users_command))
         application.add_handler(CallbackQueryHandler(admin_callback_handler, pattern="^admin_"))
         logger.info("✅ Admin handlers berhasil di-setup")
     except Exception as e:
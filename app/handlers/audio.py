@@ -1,74 +1,97 @@
-import os
-import tempfile
 from telegram import Update
 from telegram.ext import ContextTypes
-from pydub import AudioSegment
-import requests
 import logging
+from app.services.audio_pipeline import AudioTooLargeError, PcmAudio, TranscodeError, audio_pipeline
+from app.services.cache import transcript_cache
+from app.services.stt import transcriber
+from app.services.usage_buffer import track_usage
+from app.services.user_cache import remember_user, is_premium_user
+from app.services.work_queue import audio_queue
+from app.utils.rate_limiter import rate_limited
+from app.utils.streaming import MessageStreamer
 
 logger = logging.getLogger(__name__)
 
+TRANSCRIPT_HEADER = "🎤 **Hasil Transkripsi:**\n\n"
+TRANSCRIPT_FOOTER = "\n\n💡 **Tips:** Anda bisa menganalisis teks ini dengan mengirimnya sebagai pesan teks biasa."
+TRUNCATED_NOTE = "\n\n⚠️ **Audio terlalu panjang:** hanya {minutes:.0f} menit pertama yang ditranskripsi."
+STT_UNAVAILABLE_NOTE = "Fitur transkripsi audio belum dikonfigurasi. Silakan gunakan fitur teks untuk analisis."
+
+@rate_limited('audio')
 async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await process_audio(update, context, is_voice=True)
 
+@rate_limited('audio')
 async def handle_audio(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await process_audio(update, context, is_voice=False)
 
 async def process_audio(update: Update, context: ContextTypes.DEFAULT_TYPE, is_voice: bool):
+    await remember_user(update.effective_user)
+    await track_usage(update.effective_user.id, 'voice' if is_voice else 'audio')
     processing_msg = await update.message.reply_text("🔊 Memproses audio...")
     
     try:
-        if is_voice:
-            audio_file = await update.message.voice.get_file()
-        else:
-            audio_file = await update.message.audio.get_file()
+        media = update.message.voice if is_voice else update.message.audio
         
-        # Download audio file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.ogg') as temp_file:
-            await audio_file.download_to_drive(temp_file.name)
-            temp_path = temp_file.name
+        # Tanpa engine STT tidak perlu download dan transkode sama sekali
+        if not transcriber.is_available:
+            await processing_msg.edit_text(f"{TRANSCRIPT_HEADER}{STT_UNAVAILABLE_NOTE}{TRANSCRIPT_FOOTER}")
+            return
         
-        # Convert to WAV
-        wav_path = temp_path.replace('.ogg', '.wav')
-        audio = AudioSegment.from_file(temp_path)
-        audio.export(wav_path, format='wav')
+        # Voice note yang di-forward punya file_unique_id sama: tanpa download/ffmpeg/STT
+        engine = transcriber.version
+        cached = await transcript_cache.get(media.file_unique_id, engine)
+        if cached is not None:
+            logger.info(f"⚡ Transkripsi dari cache ({media.file_unique_id})")
+            streamer = MessageStreamer(processing_msg, header=TRANSCRIPT_HEADER, footer=TRANSCRIPT_FOOTER)
+            await streamer.append(cached)
+            await streamer.finish()
+            return
         
-        # Process with speech-to-text (placeholder - integrate with actual service)
-        transcribed_text = await speech_to_text(wav_path)
+        # Audio melewati batas durasi ditolak sebelum download
+        audio_pipeline.check_duration(media.duration)
+        audio_file = await media.get_file()
         
-        # Cleanup
-        os.unlink(temp_path)
-        os.unlink(wav_path)
+        # Antrean prioritas audio: user premium didahulukan
+        premium = await is_premium_user(update.effective_user.id)
+        async with audio_queue.slot(update.effective_user.id, premium):
+            # Download ke memori lalu transkode async ke PCM 16 kHz mono (tanpa file sementara)
+            audio = await audio_pipeline.load(audio_file)
+            
+            # Transkrip parsial ditulis bertahap ke pesan "Memproses audio..."
+            transcribed_text = await stream_transcript(audio, processing_msg)
         
-        await processing_msg.delete()
+        # Transkrip parsial (audio terpotong) tidak disimpan di cache
+        if transcribed_text and not audio.truncated:
+            await transcript_cache.set(media.file_unique_id, engine, transcribed_text, audio.duration)
         
-        if transcribed_text:
-            response_text = f"""
-🎤 **Hasil Transkripsi:**
-
-{transcribed_text}
-
-💡 **Tips:** Anda bisa menganalisis teks ini dengan mengirimnya sebagai pesan teks biasa.
-            """
-            await update.message.reply_text(response_text)
-        else:
-            await update.message.reply_text("❌ Tidak dapat mengenali suara. Pastikan audio jelas dan tidak ada noise.")
+        if not transcribed_text:
+            await processing_msg.edit_text("❌ Tidak dapat mengenali suara. Pastikan audio jelas dan tidak ada noise.")
             
+    except AudioTooLargeError as e:
+        await processing_msg.delete()
+        await update.message.reply_text(f"❌ {e}. Kirim audio yang lebih pendek.")
+    except TranscodeError as e:
+        logger.error(f"Error transkode audio: {e}")
+        await processing_msg.delete()
+        await update.message.reply_text("❌ Format audio tidak dapat diproses. Silakan coba lagi.")
     except Exception as e:
         logger.error(f"Error processing audio: {e}")
         await processing_msg.delete()
         await update.message.reply_text("❌ Error memproses audio. Silakan coba lagi.")
 
-async def speech_to_text(audio_path: str) -> str:
-    """
-    Placeholder untuk integrasi speech-to-text
-    Di sini Anda bisa integrasi dengan:
-    - Google Speech-to-Text
-    - Whisper OpenAI
-    - Atau layanan STT lainnya
-    """
-    # Contoh implementasi sederhana
-    # return "Ini adalah teks hasil transkripsi dari audio."
+async def stream_transcript(audio: PcmAudio, processing_msg) -> str:
+    """Transkripsi per potongan (berurutan) dengan edit pesan bertahap"""
+    footer = TRANSCRIPT_FOOTER
+    if audio.truncated:
+        # User diberi tahu bahwa transkrip hanya mencakup bagian awal audio
+        footer = TRUNCATED_NOTE.format(minutes=audio_pipeline.max_seconds / 60) + footer
+    streamer = MessageStreamer(processing_msg, header=TRANSCRIPT_HEADER, footer=footer)
+    parts = []
+    async for text in transcriber.stream(audio):
+        await streamer.append((' ' if parts else '') + text)
+        parts.append(text)
     
-    # Untuk sekarang return placeholder
-    return "Fitur transkripsi audio sedang dalam pengembangan. Silakan gunakan fitur teks untuk analisis."
\ No newline at end of file
+    if parts:
+        await streamer.finish()
+    return ' '.join(parts)
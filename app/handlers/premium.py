@@ -1,9 +1,11 @@
 from telegram import Update
 from telegram.ext import ContextTypes
 import logging
+from app.utils.rate_limiter import rate_limited
 
 logger = logging.getLogger(__name__)
 
+@rate_limited('command')
 async def premium_info(update: Update, context: ContextTypes.DEFAULT_TYPE):
     premium_text = """
 🌟 **Fitur Premium Trenbolt-Bot**
@@ -1,9 +1,11 @@
 from telegram import Update
 from telegram.ext import ContextTypes
 import logging
+from app.utils.rate_limiter import rate_limited
 
 logger = logging.getLogger(__name__)
 
+@rate_limited('command')
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     welcome_text = f"""
@@ -24,6 +26,7 @@ Coba kirim saya pesan teks atau audio!
     
     await update.message.reply_text(welcome_text)
 
+@rate_limited('command')
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     help_text = """
 📖 **Bantuan Trenbolt-Bot**
@@ -32,9 +35,10 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 /start - Memulai bot
 /help - Menampilkan bantuan ini
 /premium - Info fitur premium
+/reset - Mulai percakapan AI baru
 
 **Cara menggunakan:**
-1. Kirim teks langsung untuk dianalisis
+1. Kirim teks langsung untuk dianalisis (pertanyaan lanjutan mengingat percakapan sebelumnya)
 2. Kirim pesan suara untuk dikonversi ke teks
 3. Gunakan fitur premium untuk analisis mendalam
     """
@@ -2,9 +2,12 @@ from telegram import Update
 from telegram.ext import ContextTypes, CommandHandler
 import os
 import logging
+from app.services.ai_analyzer import analyzer_from_context
+from app.utils.rate_limiter import rate_limited
 
 logger = logging.getLogger(__name__)
 
+@rate_limited('command')
 async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Cek status AI dan sistem"""
     
@@ -12,25 +15,118 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     telegram_token = bool(os.getenv('TELEGRAM_BOT_TOKEN'))
     google_api_key = bool(os.getenv('GOOGLE_AI_STUDIO_API_KEY'))
     
-    # Test AI connection
+    # Status AI dari analyzer bersama (tanpa inisialisasi baru)
     ai_status = "❌ Tidak aktif"
     ai_detail = "Belum di-test"
+    cache_detail = "N/A"
+    breaker_detail = "N/A"
+    key_detail = "N/A"
     
-    if google_api_key:
-        try:
-            from app.services.ai_analyzer import AIAnalyzer
-            analyzer = AIAnalyzer()
-            
-            if analyzer.is_enabled:
-                ai_status = "✅ Aktif"
-                ai_detail = "Model: gemini-2.0-flash"
-            else:
-                ai_status = "❌ Error"
-                ai_detail = "Gagal inisialisasi AI"
-                
-        except Exception as e:
+    try:
+        ai_state = analyzer_from_context(context).status()
+        cache_stats = ai_state['cache']
+        breaker = ai_state['breaker']
+        limiter = ai_state['limiter']
+        breaker_detail = (
+            f"{breaker['state']} (trip {breaker['trips']}x, fallback cepat {breaker['short_circuited']}), "
+            f"concurrency {limiter['in_flight']}/{limiter['limit']}"
+        )
+        hedging = ai_state['hedging']
+        if hedging['enabled']:
+            breaker_detail += (
+                f", hedge {hedging['hedges']}/{hedging['requests']} "
+                f"({hedging['hedge_rate']:.1%}, menang {hedging['wins']})"
+            )
+        near_stats = ai_state['near_duplicates']
+        cache_detail = (
+            f"{cache_stats['size']} entry, hit rate {cache_stats['hit_rate']:.1%}, "
+            f"near-duplicate {near_stats['matches']}/{near_stats['lookups']}, "
+            f"coalesced {ai_state['coalescing']['coalesced']}"
+        )
+        conversations = ai_state['conversations']
+        cache_detail += (
+            f"; riwayat {conversations['users']} user/{conversations['total_tokens']} token"
+        )
+        
+        key_pool = ai_state['key_pool']
+        if key_pool:
+            key_detail = ", ".join(
+                f"{key['key']} {key['rpm']} rpm{' (istirahat)' if key['sidelined'] else ''}"
+                for key in key_pool['keys']
+            ) + f"; penuh {key_pool['exhausted']}x"
+        
+        if ai_state['enabled']:
+            ai_status = "✅ Aktif"
+            ai_detail = f"Model: {ai_state['model']}"
+        elif google_api_key:
             ai_status = "❌ Error"
-            ai_detail = f"Error: {str(e)}"
+            ai_detail = f"Gagal inisialisasi AI: {ai_state['error']}"
+            
+    except Exception as e:
+        ai_status = "❌ Error"
+        ai_detail = f"Error: {str(e)}"
+    
+    # Status database dari pool yang sudah ada
+    db_status = "⚠️ Tidak dikonfigurasi"
+    try:
+        from app.services.database import db
+        from app.services.user_cache import user_cache
+        if db.is_connected:
+            db_status = "✅ OK" if await db.health_check() else "❌ Error"
+            user_stats = user_cache.stats()
+            db_status += (
+                f" (cache user: hit rate {user_stats['hit_rate']:.1%}, "
+                f"upsert dilewati {user_stats['upserts_skipped']})"
+            )
+    except Exception as e:
+        db_status = f"❌ Error: {str(e)}"
+    
+    # Porsi pesan yang dijawab lokal tanpa Gemini
+    from app.services.fast_path import fast_path
+    fast_stats = fast_path.stats()
+    fast_detail = (
+        f"{fast_stats['absorbed']}/{fast_stats['checked']} pesan ({fast_stats['absorbed_rate']:.1%}), "
+        f"rata-rata {fast_stats['avg_us']:.1f}µs"
+    )
+    
+    # Antrean update per lane
+    queue_detail = "N/A"
+    processor = context.bot_data.get('update_processor')
+    if processor is not None:
+        queue_detail = ", ".join(
+            f"{name}: {lane['running']} jalan/{lane['queued']} antre (p95 tunggu {lane['wait_p95']:.2f}s)"
+            for name, lane in processor.stats()['lanes'].items()
+        )
+    
+    # Latency per tier antrean AI/audio (SLA premium)
+    from app.services.work_queue import ai_queue, audio_queue
+    tier_lines = []
+    for queue in (ai_queue, audio_queue):
+        for tier, tier_stats in queue.stats()['tiers'].items():
+            latency = tier_stats['latency']
+            tier_lines.append(
+                f"• {queue.name}/{tier}: p50 {latency['p50']:.2f}s, p95 {latency['p95']:.2f}s, "
+                f"p99 {latency['p99']:.2f}s ({tier_stats['queued']} antre)"
+            )
+    from app.services.audio_pipeline import audio_pipeline
+    transcode = audio_pipeline.stats()
+    tier_lines.append(
+        f"• transkode audio: {transcode['running']}/{transcode['concurrency']} jalan, "
+        f"p95 {transcode['latency']['p95']:.2f}s, gagal {transcode['failures']}"
+    )
+    from app.services.stt import transcriber
+    stt = transcriber.stats()
+    tier_lines.append(
+        f"• transkripsi ({stt['engine']}{'' if stt['available'] else ', tidak aktif'}): "
+        f"{stt['workers']} worker, p95 {stt['latency']['p95']:.2f}s"
+    )
+    from app.services.cache import transcript_cache
+    transcripts = transcript_cache.stats()
+    tier_lines.append(
+        f"• cache transkripsi: {transcripts['hits'] + transcripts['db_hits']} hit, "
+        f"{transcripts['saved_seconds'] / 60:.1f} menit audio tidak diproses ulang"
+    )
+    tier_detail = "\n".join(tier_lines)
     
     status_text = f"""
 🔧 **Status Sistem Trenbolt-Bot**
@@ -38,6 +134,14 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 🤖 **Telegram Bot:** {'✅ OK' if telegram_token else '❌ Error'}
 🧠 **Google AI Studio:** {ai_status}
 📋 **Detail AI:** {ai_detail}
+🔌 **Circuit Breaker:** {breaker_detail}
+🔑 **API Key:** {key_detail}
+⚡ **Cache AI:** {cache_detail}
+💬 **Fast-path:** {fast_detail}
+🗄️ **Database:** {db_status}
+🚦 **Antrean:** {queue_detail}
+⏱️ **Latency per tier:**
+{tier_detail}
 
 💡 **Commands:**
 /start - Memulai bot
@@ -47,6 +151,7 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     await update.message.reply_text(status_text)
 
+@rate_limited('text')
 async def test_ai_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Test AI dengan prompt sederhana"""
     test_text = "Halo, ini adalah test AI. Bisakah kamu memperkenalkan diri dalam 2-3 kalimat?"
@@ -54,8 +159,7 @@ async def test_ai_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     processing_msg = await update.message.reply_text("🧠 Testing AI...")
     
     try:
-        from app.services.ai_analyzer import AIAnalyzer
-        analyzer = AIAnalyzer()
+        analyzer = analyzer_from_context(context)
         
         if not analyzer.is_enabled:
             await processing_msg.delete()
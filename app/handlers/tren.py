@@ -1,10 +1,36 @@
 from telegram import Update
 from telegram.ext import ContextTypes
-import logging
 import os
+import asyncio
+import logging
+from app.services.ai_analyzer import analyzer_from_context
+from app.services.fast_path import FAST_PATH_ENABLED, fast_path
+from app.services.conversation import conversation_memory
+from app.services.text_stats import analyze as text_statistics, document_frequency
+from app.services.usage_buffer import track_usage
+from app.services.user_cache import remember_user
+from app.utils.helpers import split_message
+from app.utils.streaming import MessageStreamer
+from app.utils.rate_limiter import rate_limited
 
 logger = logging.getLogger(__name__)
 
+# Mode streaming: edit placeholder bertahap selama Gemini menghasilkan teks
+AI_STREAMING = os.getenv('AI_STREAMING', 'true').lower() in ('1', 'true', 'yes')
+# Batas keras (detik) sebelum user diberi analisis dasar; streaming: sampai chunk pertama. 0 = mati
+AI_DEADLINE = float(os.getenv('AI_DEADLINE', '20')) or None
+
+AI_HEADER = "🤖 **Hasil Analisis AI:**\n\n"
+AI_FOOTER = "\n\n💎 *Dianalisis dengan Google Gemini AI*"
+
+AI_DISABLED_NOTE = """⚠️ **Fitur AI Tidak Aktif**
+💡 *Admin perlu mengonfigurasi Google AI Studio API Key untuk analisis AI.*"""
+AI_OUTAGE_NOTE = """⚠️ **AI Sedang Gangguan**
+💡 *Menampilkan analisis dasar sementara layanan AI dipulihkan.*"""
+AI_SLOW_NOTE = """⚠️ **AI Sedang Lambat**
+💡 *Respons AI melewati batas waktu, menampilkan analisis dasar.*"""
+
+@rate_limited('text')
 async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     text = update.message.text
@@ -13,24 +39,45 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Silakan kirim teks yang ingin dianalisis.")
         return
     
-    # Cek apakah AI tersedia
-    ai_available = bool(os.getenv('GOOGLE_AI_STUDIO_API_KEY'))
+    await remember_user(update.effective_user)
+    await track_usage(user_id, 'text')
+    
+    # Pesan trivial (salam, terima kasih, emoji) dijawab lokal tanpa Gemini
+    if FAST_PATH_ENABLED:
+        reply = fast_path.respond(text, update.effective_user.first_name)
+        if reply is not None:
+            await update.message.reply_text(reply)
+            return
+    
+    # Cek apakah AI tersedia (analyzer bersama, tanpa inisialisasi ulang)
+    ai_analyzer = analyzer_from_context(context)
     
-    if not ai_available:
+    if not ai_analyzer.is_enabled:
         # Analisis sederhana tanpa AI
         await analyze_text_basic(update, text)
+    elif not ai_analyzer.is_available:
+        # Circuit breaker terbuka: langsung ke analisis dasar tanpa menunggu Gemini
+        await analyze_text_basic(update, text, note=AI_OUTAGE_NOTE)
     else:
         # Analisis dengan AI
-        await analyze_text_ai(update, text, user_id)
+        await analyze_text_ai(update, context, text, user_id)
 
-async def analyze_text_basic(update: Update, text: str):
+@rate_limited('command')
+async def reset_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Mulai percakapan baru: hapus riwayat AI user"""
+    if await conversation_memory.clear(update.effective_user.id):
+        await update.message.reply_text("🧹 Riwayat percakapan dihapus. Silakan mulai topik baru!")
+    else:
+        await update.message.reply_text("ℹ️ Belum ada riwayat percakapan.")
+
+async def analyze_text_basic(update: Update, text: str, note: str = None):
     """Analisis teks sederhana tanpa AI"""
     processing_msg = await update.message.reply_text("📊 Menganalisis teks...")
     
     try:
-        words = text.split()
-        word_count = len(words)
-        char_count = len(text)
+        # Semua statistik dalam satu lintasan; kata kunci TF-IDF tanpa stopword
+        stats = text_statistics(text, df=document_frequency)
+        keywords = ', '.join(term for term, _ in stats.keywords) or 'N/A'
         
         # Analisis sederhana
         analysis = f"""
@@ -39,15 +86,14 @@ async def analyze_text_basic(update: Update, text: str):
 **Input:** {text[:100]}...
 
 📈 **Statistik:**
-• Panjang teks: {char_count} karakter
-• Jumlah kata: {word_count} kata
-• Kata terpanjang: {max(words, key=len) if words else 'N/A'}
-• Rata-rata panjang kata: {sum(len(word) for word in words) // word_count if word_count > 0 else 0} karakter
+• Panjang teks: {stats.char_count} karakter
+• Jumlah kata: {stats.word_count} kata ({stats.unique_words} unik, {stats.sentence_count} kalimat)
+• Kata terpanjang: {stats.longest_word or 'N/A'}
+• Rata-rata panjang kata: {stats.avg_word_length:.1f} karakter
 
-🔍 **Kata-kata kunci:** {', '.join(set(words[:8]))}
+🔍 **Kata-kata kunci:** {keywords}
 
-⚠️ **Fitur AI Tidak Aktif**
-💡 *Admin perlu mengonfigurasi Google AI Studio API Key untuk analisis AI.*
+{note or AI_DISABLED_NOTE}
         """
         
         await processing_msg.delete()
@@ -58,13 +104,12 @@ async def analyze_text_basic(update: Update, text: str):
         await processing_msg.delete()
         await update.message.reply_text("❌ Maaf, terjadi error saat menganalisis teks.")
 
-async def analyze_text_ai(update: Update, text: str, user_id: int):
+async def analyze_text_ai(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user_id: int):
     """Analisis teks dengan AI"""
     processing_msg = await update.message.reply_text("🧠 Menganalisis dengan AI...")
     
     try:
-        from app.services.ai_analyzer import AIAnalyzer
-        ai_analyzer = AIAnalyzer()
+        ai_analyzer = analyzer_from_context(context)
         
         if not ai_analyzer.is_enabled:
             await processing_msg.delete()
@@ -72,7 +117,20 @@ async def analyze_text_ai(update: Update, text: str, user_id: int):
             await analyze_text_basic(update, text)
             return
         
-        analysis = await ai_analyzer.analyze_text(text, user_id)
+        # Slot antrean prioritas diambil analyzer hanya saat benar-benar memanggil Gemini
+        if AI_STREAMING:
+            await stream_analysis(ai_analyzer, processing_msg, update, text, user_id)
+            return
+        
+        try:
+            analysis = await asyncio.wait_for(
+                ai_analyzer.analyze_text(text, user_id), timeout=AI_DEADLINE
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"⏱️ AI melewati batas {AI_DEADLINE}s, fallback ke analisis dasar")
+            await processing_msg.delete()
+            await analyze_text_basic(update, text, note=AI_SLOW_NOTE)
+            return
         
         await processing_msg.delete()
         
@@ -82,18 +140,10 @@ async def analyze_text_ai(update: Update, text: str, user_id: int):
             await update.message.reply_text(f"{analysis}\n\nBeralih ke analisis dasar...")
             await analyze_text_basic(update, text)
         else:
-            # Potong teks jika terlalu panjang untuk Telegram
-            if len(analysis) > 4000:
-                analysis = analysis[:4000] + "\n\n... (pesan dipotong karena terlalu panjang)"
-            
-            response_text = f"""
-🤖 **Hasil Analisis AI:**
-
-{analysis}
-
-💎 *Dianalisis dengan Google Gemini AI*
-            """
-            await update.message.reply_text(response_text)
+            response_text = f"{AI_HEADER}{analysis}{AI_FOOTER}"
+            # Teks panjang dilanjutkan ke pesan berikutnya, bukan dipotong
+            for part in split_message(response_text):
+                await update.message.reply_text(part)
         
     except Exception as e:
         logger.error(f"AI Analysis error: {e}")
@@ -102,4 +152,37 @@ async def analyze_text_ai(update: Update, text: str, user_id: int):
         except:
             pass
         await update.message.reply_text("❌ Error pada analisis AI. Beralih ke analisis dasar...")
-        await analyze_text_basic(update, text)
\ No newline at end of file
+        await analyze_text_basic(update, text)
+
+async def stream_analysis(ai_analyzer, processing_msg, update: Update, text: str, user_id: int):
+    """Tulis respons AI bertahap ke pesan placeholder"""
+    streamer = MessageStreamer(processing_msg, header=AI_HEADER, footer=AI_FOOTER)
+    chunks = ai_analyzer.analyze_text_stream(text, user_id)
+    
+    try:
+        # Batas keras hanya sampai chunk pertama; sesudahnya berlaku timeout per chunk
+        try:
+            first = await asyncio.wait_for(chunks.__anext__(), timeout=AI_DEADLINE)
+        except asyncio.TimeoutError:
+            logger.warning(f"⏱️ AI Stream melewati batas {AI_DEADLINE}s, fallback ke analisis dasar")
+            await processing_msg.delete()
+            await analyze_text_basic(update, text, note=AI_SLOW_NOTE)
+            return
+        except StopAsyncIteration:
+            first = ''
+        
+        await streamer.append(first)
+        async for chunk in chunks:
+            await streamer.append(chunk)
+    except Exception as e:
+        logger.error(f"AI Streaming error: {e}")
+        if not streamer.text:
+            # Belum ada output sama sekali: fallback ke basic analysis
+            await processing_msg.edit_text(f"❌ Error AI: {e}\n\nBeralih ke analisis dasar...")
+            await analyze_text_basic(update, text)
+            return
+        await streamer.append("\n\n⚠️ (respons AI terputus)")
+    finally:
+        await chunks.aclose()
+    
+    await streamer.finish()
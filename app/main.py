@@ -23,13 +23,96 @@ class TrenboltBot:
         logger.info(f"✅ TELEGRAM_BOT_TOKEN: {'***' + self.token[-4:] if self.token else 'MISSING'}")
         logger.info(f"✅ GOOGLE_AI_STUDIO_API_KEY: {'SET' if self.google_api_key else 'MISSING'}")
         
-        self.application = Application.builder().token(self.token).build()
+        # Update antar chat diproses paralel, urutan dalam satu chat tetap
+        from app.utils.update_processor import ChatOrderedUpdateProcessor
+        self.update_processor = ChatOrderedUpdateProcessor()
+        
+        self.application = (
+            Application.builder()
+            .token(self.token)
+            .concurrent_updates(self.update_processor)
+            .post_init(self.post_init)
+            .post_stop(self.post_stop)
+            .post_shutdown(self.post_shutdown)
+            .build()
+        )
+        
+    async def post_init(self, application):
+        """Lifecycle startup: buat service bersama sekali per proses"""
+        await self.setup_database()
+        self.setup_ai_analyzer(application)
+        application.bot_data['update_processor'] = self.update_processor
+        
+        from app.services.usage_buffer import usage_buffer
+        from app.services.maintenance import maintenance_job
+        usage_buffer.start()
+        maintenance_job.start()
+        
+        # Lanjutkan broadcast yang terputus oleh restart; gagal baca checkpoint
+        # tidak boleh menggagalkan startup bot
+        try:
+            from app.services.broadcast import broadcaster
+            await broadcaster.resume(application.bot)
+        except Exception as e:
+            logger.error(f"❌ Error melanjutkan broadcast: {e}")
+    
+    async def post_stop(self, application):
+        """Lifecycle stop: dijalankan sebelum client HTTP bot ditutup"""
+        # Pengiriman broadcast yang sedang berjalan selesai/berhenti dengan rapi
+        # dan checkpoint disimpan selagi bot dan pool database masih terbuka
+        from app.services.broadcast import broadcaster
+        await broadcaster.stop()
+    
+    async def post_shutdown(self, application):
+        """Lifecycle shutdown: lepaskan resource service bersama"""
+        from app.services.key_pool import close_http_session
+        await close_http_session()
+        
+        from app.services.stt import transcriber
+        transcriber.shutdown()
+        
+        from app.services.maintenance import maintenance_job
+        await maintenance_job.stop()
+        
+        # Flush event penggunaan tersisa sebelum pool ditutup
+        from app.services.usage_buffer import usage_buffer
+        await usage_buffer.stop()
+        
+        from app.services.database import close_db
+        await close_db()
+    
+    async def setup_database(self):
+        """Buka connection pool database (opsional)"""
+        if not os.getenv('DATABASE_URL'):
+            logger.warning("⚠️ DATABASE_URL tidak di-set, database dinonaktifkan")
+            return
+        try:
+            from app.services.database import init_db
+            await init_db()
+        except Exception as e:
+            logger.error(f"❌ Error koneksi database: {e}")
+    
+    def setup_ai_analyzer(self, application):
+        """Buat AIAnalyzer bersama dan simpan di bot_data"""
+        try:
+            from app.services.ai_analyzer import get_analyzer, BOT_DATA_KEY
+            analyzer = get_analyzer()
+            application.bot_data[BOT_DATA_KEY] = analyzer
+            
+            if analyzer.is_enabled:
+                logger.info("✅ Google AI Studio: AKTIF")
+            elif self.google_api_key:
+                logger.error("❌ Google AI Studio: GAGAL INISIALISASI")
+            else:
+                logger.warning("⚠️ Google AI Studio: API KEY TIDAK ADA")
+        except Exception as e:
+            logger.error(f"❌ Error checking AI status: {e}")
         
     def setup_handlers(self):
         """Setup semua handlers dengan import langsung"""
         try:
             from app.handlers.start import start, help_command
-            from app.handlers.tren import handle_text
+            from app.handlers.tren import handle_text, reset_command
             from app.handlers.audio import handle_voice, handle_audio
             from app.handlers.premium import premium_info
             
@@ -37,6 +120,7 @@ class TrenboltBot:
             self.application.add_handler(CommandHandler("start", start))
             self.application.add_handler(CommandHandler("help", help_command))
             self.application.add_handler(CommandHandler("premium", premium_info))
+            self.application.add_handler(CommandHandler("reset", reset_command))
             
             # Message handlers
             self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
@@ -87,20 +171,6 @@ class TrenboltBot:
         self.setup_handlers()
         logger.info("🤖 Trenbolt-Bot sedang berjalan...")
         
-        # Log AI status
-        if self.google_api_key:
-            try:
-                from app.services.ai_analyzer import AIAnalyzer
-                analyzer = AIAnalyzer()
-                if analyzer.is_enabled:
-                    logger.info("✅ Google AI Studio: AKTIF")
-                else:
-                    logger.error("❌ Google AI Studio: GAGAL INISIALISASI")
-            except Exception as e:
-                logger.error(f"❌ Error checking AI status: {e}")
-        else:
-            logger.warning("⚠️ Google AI Studio: API KEY TIDAK ADA")
-        
         # Untuk production di Railway
         port = int(os.environ.get('PORT', 8443))
         webhook_url = os.getenv('RAILWAY_STATIC_URL')
@@ -1,71 +1,329 @@
 import os
+import asyncio
 import logging
-import google.generativeai as genai
+from contextlib import asynccontextmanager
+from app.services.cache import response_cache
+from app.services.simhash import near_duplicates
+from app.services.conversation import conversation_memory, estimate_tokens
+from app.services.user_cache import is_premium_user
+from app.services.work_queue import ai_queue
+from app.services.resilience import AdaptiveLimiter, CircuitBreaker, HedgePolicy, guarded_call, hedged
+from app.services.key_pool import (
+    build_key_pool, is_quota_error, load_api_keys, load_fallback_models
+)
+from app.utils.singleflight import SingleFlight, LeaderAbandoned
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_MODEL = 'models/gemini-2.0-flash'
+
+# Batas waktu per panggilan dan jumlah request Gemini yang boleh berjalan bersamaan
+AI_TIMEOUT = float(os.getenv('AI_TIMEOUT', '30'))
+AI_MAX_CONCURRENT = int(os.getenv('AI_MAX_CONCURRENT', '8'))
+# Berapa key berbeda yang dicoba saat key sebelumnya kena quota error
+AI_KEY_RETRIES = int(os.getenv('AI_KEY_RETRIES', '3'))
+
+# Generate response dengan batasan token
+GENERATION_CONFIG = {
+    "max_output_tokens": 800,  # Batasi output
+    "temperature": 0.7,
+}
+
 class AIAnalyzer:
-    def __init__(self):
-        api_key = os.getenv('GOOGLE_AI_STUDIO_API_KEY')
-        
+    def __init__(self, api_key: str = None, model_name: str = None,
+                 timeout: float = AI_TIMEOUT, max_concurrent: int = AI_MAX_CONCURRENT):
+        self.api_key = None
+        self.model_name = None
+        self.model = None
+        self.key_pool = None
+        self.is_enabled = False
+        self.last_error = None
+        self.timeout = timeout
+        self.max_concurrent = max_concurrent
+        self.in_flight_requests = SingleFlight()
+        # Concurrency adaptif (AIMD, maksimal max_concurrent) dan circuit breaker
+        self.limiter = AdaptiveLimiter(max_concurrent)
+        self.breaker = CircuitBreaker()
+        # Hedging untuk ekor latency (hanya non-streaming)
+        self.hedging = HedgePolicy()
+        self.reload(api_key=api_key, model_name=model_name)
+
+    def reload(self, api_key: str = None, model_name: str = None) -> bool:
+        """Inisialisasi ulang API key/model tanpa restart bot"""
+        api_keys = [api_key] if api_key else load_api_keys()
+        model_name = model_name or os.getenv('GEMINI_MODEL') or DEFAULT_MODEL
+        model_names = [model_name] + [m for m in load_fallback_models() if m != model_name]
+
         logger.info(f"🔧 Initializing AI Analyzer...")
-        logger.info(f"🔧 API Key available: {bool(api_key)}")
-        
-        if not api_key:
+        logger.info(f"🔧 API Key available: {len(api_keys)}")
+
+        if not api_keys:
             logger.warning("⚠️ GOOGLE_AI_STUDIO_API_KEY tidak ditemukan. Fitur AI dinonaktifkan.")
+            self.api_key = None
+            self.model_name = model_name
             self.model = None
+            self.key_pool = None
             self.is_enabled = False
-            return
-        
+            self.last_error = "API key tidak ada"
+            return False
+
         try:
-            # Configure API
-            genai.configure(api_key=api_key)
-            logger.info("✅ Google AI configured")
-            
-            # Langsung gunakan model yang kita tahu berhasil
-            self.model = genai.GenerativeModel('models/gemini-2.0-flash')
+            # Tiap key memakai kredensial sendiri di pool (REST API Gemini)
+            key_pool = build_key_pool(api_keys, model_names)
+            model = key_pool.tiers[0][0].model
+
+            # Analisis tersimpan milik model lama tidak disajikan ulang
+            if model_name != self.model_name:
+                near_duplicates.clear()
+
+            # Swap atomik: request yang sedang berjalan tetap memakai model lama
+            self.api_key = api_keys[0]
+            self.model_name = model_name
+            self.model = model
+            self.key_pool = key_pool
             self.is_enabled = True
-            logger.info("✅ AI Analyzer initialized with models/gemini-2.0-flash")
-            
+            self.last_error = None
+            logger.info(f"✅ AI Analyzer initialized with {model_name} ({len(api_keys)} key, {len(model_names)} model)")
+            return True
+
         except Exception as e:
             logger.error(f"❌ Error initializing AI: {e}")
             self.model = None
+            self.key_pool = None
             self.is_enabled = False
-    
-    async def analyze_text(self, text: str, user_id: int) -> str:
-        logger.info(f"🧠 AI Analysis requested by user {user_id}")
-        
-        if not self.is_enabled:
-            return "❌ Fitur AI sedang tidak tersedia."
-        
-        try:
-            logger.info(f"🧠 Processing: {text[:50]}...")
-            
-            # Prompt yang lebih sederhana dengan batasan panjang
-            prompt = f"""
+            self.last_error = str(e)
+            return False
+
+    @property
+    def in_flight(self) -> int:
+        return self.limiter.in_flight
+
+    @property
+    def is_available(self) -> bool:
+        """AI aktif dan upstream tidak sedang dianggap gangguan"""
+        return self.is_enabled and not self.breaker.is_open
+
+    def status(self) -> dict:
+        """Status analyzer tanpa melakukan inisialisasi baru"""
+        return {
+            'enabled': self.is_enabled,
+            'model': self.model_name,
+            'error': self.last_error,
+            'in_flight': self.in_flight,
+            'max_concurrent': self.max_concurrent,
+            'limiter': self.limiter.stats(),
+            'breaker': self.breaker.stats(),
+            'hedging': self.hedging.stats(),
+            'key_pool': self.key_pool.stats() if self.key_pool else None,
+            'cache': response_cache.stats(),
+            'near_duplicates': near_duplicates.stats(),
+            'coalescing': self.in_flight_requests.stats(),
+            'conversations': conversation_memory.stats(),
+        }
+
+    def build_prompt(self, text: str, history: str = '') -> str:
+        # Riwayat percakapan (sudah dibatasi budget token) untuk pertanyaan lanjutan
+        context = f"Riwayat percakapan sebelumnya:\n{history}\n\n" if history else ''
+        # Prompt yang lebih sederhana dengan batasan panjang
+        return f"""
             Anda adalah asisten AI yang helpful. Berikan respons dalam bahasa Indonesia.
             Berikan respons yang singkat, padat, dan jelas (maksimal 500 kata).
-            
-            Pertanyaan/pesan: {text}
-            
+
+            {context}Pertanyaan/pesan: {text}
+
             Berikan respons yang ramah, informatif, dan helpful dalam bahasa Indonesia.
             """
-            
-            # Generate response dengan batasan token
-            generation_config = {
-                "max_output_tokens": 800,  # Batasi output
-                "temperature": 0.7,
-            }
-            
-            response = self.model.generate_content(
-                prompt,
-                generation_config=generation_config
+
+    async def _lookup_cached(self, text: str, history: str = ''):
+        """Cari respons di cache exact lalu index near-duplicate"""
+        if history:
+            # Pertanyaan lanjutan bergantung riwayat: hanya cache exact atas riwayat + teks
+            cache_key = response_cache.make_key(f"{history}\n\n{text}", self.model_name, GENERATION_CONFIG)
+            return cache_key, None, await response_cache.get(cache_key)
+
+        cache_key = response_cache.make_key(text, self.model_name, GENERATION_CONFIG)
+        cached = await response_cache.get(cache_key)
+        if cached is not None:
+            return cache_key, None, cached
+
+        fingerprint = near_duplicates.fingerprint(text)
+        return cache_key, fingerprint, near_duplicates.get(fingerprint)
+
+    async def _store_cached(self, cache_key: str, fingerprint, analysis: str):
+        await response_cache.set(cache_key, analysis)
+        near_duplicates.add(fingerprint, analysis)
+
+    async def _generate(self, prompt: str, stream: bool = False):
+        """Pilih key lewat pool (sadar kuota); key yang kena 429 diistirahatkan"""
+        key_pool = self.key_pool
+        tokens = estimate_tokens(prompt) + GENERATION_CONFIG['max_output_tokens']
+        tried = []
+
+        while True:
+            slot, usage = key_pool.acquire(tokens, exclude=tried)
+            try:
+                response = await slot.model.generate_content_async(
+                    prompt, generation_config=GENERATION_CONFIG, stream=stream
+                )
+            except Exception as e:
+                if not is_quota_error(e):
+                    raise
+                key_pool.sideline(slot)
+                tried.append(slot)
+                if len(tried) >= AI_KEY_RETRIES:
+                    raise
+                logger.warning(f"⚠️ Quota habis di {slot.label}, pindah ke key lain")
+                continue
+
+            # TPM per key dihitung dari pemakaian sebenarnya, bukan estimasi awal
+            if stream:
+                response.on_usage = lambda total, slot=slot, usage=usage: slot.reconcile(usage, total)
+            else:
+                slot.reconcile(usage, response.total_tokens)
+            return response
+
+    @asynccontextmanager
+    async def _upstream_slot(self, user_id: int):
+        # Slot antrean prioritas hanya untuk panggilan Gemini sungguhan; cache hit,
+        # near-duplicate dan follower SingleFlight tidak ikut mengantre
+        async with ai_queue.slot(user_id, await is_premium_user(user_id)):
+            yield
+
+    async def _complete(self, text: str, history: str, cache_key: str, fingerprint, user_id: int) -> str:
+        """Satu panggilan Gemini non-streaming; hasil sukses disimpan ke cache"""
+        logger.info(f"🧠 Processing: {text[:50]}...")
+
+        # Lewat antrean prioritas, circuit breaker + limiter AIMD; CancelledError diteruskan apa adanya
+        async with self._upstream_slot(user_id), guarded_call(self.breaker, self.limiter):
+            prompt = self.build_prompt(text, history)
+            response = await asyncio.wait_for(
+                hedged(lambda: self._generate(prompt), self.hedging),
+                timeout=self.timeout
+            )
+
+        logger.info("✅ AI Response received successfully")
+
+        if response.text:
+            await self._store_cached(cache_key, fingerprint, response.text)
+        return response.text
+
+    async def analyze_text(self, text: str, user_id: int) -> str:
+        logger.info(f"🧠 AI Analysis requested by user {user_id}")
+
+        model = self.model
+        if not self.is_enabled or model is None:
+            return "❌ Fitur AI sedang tidak tersedia."
+
+        history = await conversation_memory.get_context(user_id)
+        cache_key, fingerprint, cached = await self._lookup_cached(text, history)
+        if cached is not None:
+            logger.info("⚡ AI Response dari cache")
+            await conversation_memory.record(user_id, text, cached)
+            return cached
+
+        try:
+            # Request identik yang sedang berjalan menunggu hasil yang sama
+            analysis = await self.in_flight_requests.do(
+                cache_key, lambda: self._complete(text, history, cache_key, fingerprint, user_id)
             )
-            
-            logger.info("✅ AI Response received successfully")
-            
-            return response.text if response.text else "❌ Tidak ada respons dari AI."
-            
+            if not analysis:
+                return "❌ Tidak ada respons dari AI."
+            await conversation_memory.record(user_id, text, analysis)
+            return analysis
+
+        except asyncio.TimeoutError:
+            logger.error(f"❌ AI Analysis timeout setelah {self.timeout}s")
+            return f"❌ Error AI: timeout setelah {self.timeout:.0f} detik"
         except Exception as e:
             logger.error(f"❌ AI Analysis error: {e}")
-            return f"❌ Error AI: {str(e)}"
\ No newline at end of file
+            return f"❌ Error AI: {str(e)}"
+
+    async def analyze_text_stream(self, text: str, user_id: int):
+        """Streaming respons Gemini per chunk; error dilempar ke pemanggil"""
+        logger.info(f"🧠 AI Streaming requested by user {user_id}")
+
+        model = self.model
+        if not self.is_enabled or model is None:
+            raise RuntimeError("Fitur AI sedang tidak tersedia.")
+
+        history = await conversation_memory.get_context(user_id)
+        cache_key, fingerprint, cached = await self._lookup_cached(text, history)
+        if cached is not None:
+            logger.info("⚡ AI Stream dari cache")
+            await conversation_memory.record(user_id, text, cached)
+            yield cached
+            return
+
+        leader = self.in_flight_requests.lead(cache_key)
+        if leader is None:
+            # Request identik sedang berjalan: tunggu hasil utuh dan kirim sebagai satu chunk
+            result = await self.analyze_text(text, user_id)
+            if result.startswith("❌"):
+                raise RuntimeError(result)
+            yield result
+            return
+
+        parts = []
+        try:
+            async with self._upstream_slot(user_id), guarded_call(self.breaker, self.limiter) as call:
+                response = await asyncio.wait_for(
+                    self._generate(self.build_prompt(text, history), stream=True),
+                    timeout=self.timeout
+                )
+                chunks = response.__aiter__()
+                try:
+                    while True:
+                        # Timeout berlaku per chunk, bukan untuk seluruh stream
+                        try:
+                            chunk = await asyncio.wait_for(chunks.__anext__(), timeout=self.timeout)
+                        except StopAsyncIteration:
+                            break
+                        if chunk.text:
+                            # Latency stream untuk AIMD = waktu sampai chunk pertama
+                            call.mark()
+                            parts.append(chunk.text)
+                            yield chunk.text
+                finally:
+                    # Lepaskan koneksi HTTP walau stream berhenti di tengah
+                    await chunks.aclose()
+        except (asyncio.CancelledError, GeneratorExit):
+            # Pemilik stream pergi: follower mengulang request sendiri
+            if not leader.done():
+                leader.set_exception(LeaderAbandoned())
+            raise
+        except Exception as e:
+            if not leader.done():
+                leader.set_exception(e)
+            raise
+
+        logger.info("✅ AI Stream selesai")
+        analysis = ''.join(parts)
+        # Follower dilepas sebelum await apa pun: cancel/error saat menulis cache
+        # tidak boleh membuat mereka menunggu selamanya
+        leader.set_result(analysis)
+        if analysis:
+            await self._store_cached(cache_key, fingerprint, analysis)
+            await conversation_memory.record(user_id, text, analysis)
+
+# Key di application.bot_data tempat analyzer bersama disimpan
+BOT_DATA_KEY = 'ai_analyzer'
+
+# Registry analyzer per-proses (satu instance per nama)
+_analyzers = {}
+
+def get_analyzer(name: str = 'default') -> AIAnalyzer:
+    """Ambil analyzer bersama, dibuat sekali per proses"""
+    analyzer = _analyzers.get(name)
+    if analyzer is None:
+        analyzer = AIAnalyzer()
+        _analyzers[name] = analyzer
+    return analyzer
+
+def analyzer_from_context(context) -> AIAnalyzer:
+    """Ambil analyzer dari bot_data, fallback ke registry proses"""
+    bot_data = getattr(context, 'bot_data', None)
+    if bot_data is not None:
+        analyzer = bot_data.get(BOT_DATA_KEY)
+        if analyzer is not None:
+            return analyzer
+    return get_analyzer()
@@ -0,0 +1,134 @@
+import io
+import os
+import time
+import asyncio
+import logging
+from typing import NamedTuple
+
+from app.utils.metrics import LatencyWindow
+
+logger = logging.getLogger(__name__)
+
+# Format yang dibutuhkan engine STT: PCM 16-bit little-endian, mono, 16 kHz
+AUDIO_SAMPLE_RATE = 16000
+AUDIO_SAMPLE_WIDTH = 2
+
+FFMPEG_BINARY = os.getenv('FFMPEG_BINARY', 'ffmpeg')
+# Batas proses ffmpeg bersamaan, ukuran file, durasi yang ditranskode dan waktu transkode
+AUDIO_TRANSCODE_CONCURRENCY = int(os.getenv('AUDIO_TRANSCODE_CONCURRENCY', str(max(1, (os.cpu_count() or 2) // 2))))
+AUDIO_MAX_BYTES = int(os.getenv('AUDIO_MAX_BYTES', str(20 * 1024 * 1024)))
+AUDIO_MAX_SECONDS = int(os.getenv('AUDIO_MAX_SECONDS', '600'))
+AUDIO_TRANSCODE_TIMEOUT = float(os.getenv('AUDIO_TRANSCODE_TIMEOUT', '60'))
+
+class AudioTooLargeError(Exception):
+    """File audio melewati AUDIO_MAX_BYTES atau AUDIO_MAX_SECONDS"""
+
+class TranscodeError(Exception):
+    """ffmpeg gagal atau melewati batas waktu"""
+
+class PcmAudio(NamedTuple):
+    pcm: bytes
+    sample_rate: int = AUDIO_SAMPLE_RATE
+    # True jika ffmpeg memotong audio di AUDIO_MAX_SECONDS
+    truncated: bool = False
+
+    @property
+    def duration(self) -> float:
+        return len(self.pcm) / (AUDIO_SAMPLE_WIDTH * self.sample_rate)
+
+class AudioPipeline:
+    """
+    Download audio Telegram ke memori lalu transkode lewat ffmpeg async
+    (stdin -> stdout) ke PCM mono 16 kHz. Tanpa file sementara; proses
+    ffmpeg selalu dimatikan jika gagal/dibatalkan, dan jumlahnya dibatasi.
+    """
+
+    def __init__(self, concurrency: int = AUDIO_TRANSCODE_CONCURRENCY, ffmpeg: str = FFMPEG_BINARY,
+                 max_bytes: int = AUDIO_MAX_BYTES, max_seconds: int = AUDIO_MAX_SECONDS,
+                 timeout: float = AUDIO_TRANSCODE_TIMEOUT):
+        self.concurrency = concurrency
+        self.ffmpeg = ffmpeg
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(concurrency)
+        self.running = 0
+        self.transcoded = 0
+        self.failures = 0
+        self.latency = LatencyWindow()
+
+    def check_duration(self, seconds) -> None:
+        """Tolak audio yang durasi metadatanya melewati batas, sebelum download"""
+        if seconds and seconds > self.max_seconds:
+            raise AudioTooLargeError(
+                f"Audio {seconds / 60:.1f} menit melewati batas {self.max_seconds / 60:.0f} menit"
+            )
+
+    async def download(self, telegram_file) -> bytes:
+        """Download file Telegram langsung ke memori"""
+        size = getattr(telegram_file, 'file_size', None)
+        if size and size > self.max_bytes:
+            raise AudioTooLargeError(f"Audio {size / 2**20:.1f} MB melewati batas {self.max_bytes / 2**20:.0f} MB")
+
+        buffer = io.BytesIO()
+        await telegram_file.download_to_memory(out=buffer)
+        return buffer.getvalue()
+
+    async def transcode(self, data: bytes) -> PcmAudio:
+        """Transkode audio apa pun yang dikenali ffmpeg ke PCM s16le mono 16 kHz"""
+        async with self._slots:
+            self.running += 1
+            started = time.monotonic()
+            process = None
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    self.ffmpeg, '-hide_banner', '-loglevel', 'error', '-nostdin',
+                    '-i', 'pipe:0', '-t', str(self.max_seconds),
+                    '-ac', '1', '-ar', str(AUDIO_SAMPLE_RATE), '-f', 's16le', 'pipe:1',
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+                pcm, stderr = await asyncio.wait_for(process.communicate(data), timeout=self.timeout)
+                if process.returncode != 0:
+                    message = stderr.decode('utf-8', 'replace').strip().splitlines()
+                    raise TranscodeError(message[-1] if message else f"ffmpeg exit {process.returncode}")
+
+                self.transcoded += 1
+                self.latency.add(time.monotonic() - started)
+                # Metadata durasi bisa kosong/salah: output sepanjang batas berarti terpotong '-t'
+                truncated = len(pcm) >= self.max_seconds * AUDIO_SAMPLE_RATE * AUDIO_SAMPLE_WIDTH
+                if truncated:
+                    logger.warning(f"⚠️ Audio dipotong di {self.max_seconds} detik")
+                return PcmAudio(pcm, truncated=truncated)
+
+            except asyncio.TimeoutError:
+                self.failures += 1
+                raise TranscodeError(f"Transkode melewati {self.timeout:.0f} detik")
+            except FileNotFoundError:
+                self.failures += 1
+                raise TranscodeError(f"ffmpeg tidak ditemukan ({self.ffmpeg})")
+            except Exception:
+                self.failures += 1
+                raise
+            finally:
+                self.running -= 1
+                # Timeout/cancel/error: jangan tinggalkan proses ffmpeg yatim
+                if process is not None and process.returncode is None:
+                    process.kill()
+                    await process.wait()
+
+    async def load(self, telegram_file) -> PcmAudio:
+        return await self.transcode(await self.download(telegram_file))
+
+    def stats(self) -> dict:
+        return {
+            'running': self.running,
+            'concurrency': self.concurrency,
+            'transcoded': self.transcoded,
+            'failures': self.failures,
+            'latency': self.latency.summary(),
+        }
+
+# Global instance
+audio_pipeline = AudioPipeline()
@@ -0,0 +1,295 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Optional
+
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError, TimedOut
+
+from app.services.database import db
+from app.utils.rate_limiter import GCRALimiter, Limit
+
+logger = logging.getLogger(__name__)
+
+# Limit global Telegram ~30 pesan/detik; sisakan ruang untuk balasan normal
+BROADCAST_RATE = Limit.parse(os.getenv('BROADCAST_RATE', '25/1/5'))
+# Ukuran batch keyset (juga batas pesan terkirim ulang setelah crash)
+BROADCAST_BATCH = int(os.getenv('BROADCAST_BATCH', '100'))
+BROADCAST_CONCURRENCY = int(os.getenv('BROADCAST_CONCURRENCY', '8'))
+BROADCAST_MAX_RETRIES = int(os.getenv('BROADCAST_MAX_RETRIES', '3'))
+BROADCAST_PROGRESS_INTERVAL = float(os.getenv('BROADCAST_PROGRESS_INTERVAL', '15'))
+# Error sementara (mis. DB putus): backoff eksponensial, menyerah setelah sekian error berturut-turut
+BROADCAST_ERROR_BACKOFF = float(os.getenv('BROADCAST_ERROR_BACKOFF', '5'))
+BROADCAST_MAX_ERRORS = int(os.getenv('BROADCAST_MAX_ERRORS', '10'))
+MAX_ERROR_BACKOFF = 300
+
+RUNNING = 'running'
+DONE = 'done'
+CANCELLED = 'cancelled'
+FAILED = 'failed'
+
+class BroadcastBusy(Exception):
+    """Masih ada broadcast yang berjalan"""
+
+class BroadcastJob:
+    """State satu broadcast; disimpan ke tabel broadcasts sebagai checkpoint"""
+
+    def __init__(self, job_id: int, message: str, total: int, last_user_id: int = 0,
+                 sent: int = 0, failed: int = 0, blocked: int = 0, status: str = RUNNING):
+        self.id = job_id
+        self.message = message
+        self.total = total
+        self.last_user_id = last_user_id
+        self.sent = sent
+        self.failed = failed
+        self.blocked = blocked
+        self.status = status
+        # Throughput dihitung sejak job (di-resume) di proses ini
+        self.started = time.monotonic()
+        self.processed_at_start = self.processed
+
+    @property
+    def processed(self) -> int:
+        return self.sent + self.failed + self.blocked
+
+    def progress(self) -> dict:
+        elapsed = time.monotonic() - self.started
+        rate = (self.processed - self.processed_at_start) / elapsed if elapsed > 0 else 0.0
+        remaining = max(self.total - self.processed, 0)
+        return {
+            'id': self.id,
+            'status': self.status,
+            'total': self.total,
+            'processed': self.processed,
+            'sent': self.sent,
+            'failed': self.failed,
+            'blocked': self.blocked,
+            'percent': self.processed / self.total if self.total else 1.0,
+            'rate': rate,
+            'eta': remaining / rate if rate > 0 else None,
+        }
+
+class Broadcaster:
+    """
+    Broadcast ke semua user: penerima dibaca per batch dengan cursor keyset
+    (user_id > terakhir), dikirim lewat token bucket global (GCRA), jeda
+    bersama saat Telegram membalas RetryAfter, dan checkpoint per batch
+    sehingga bisa dilanjutkan setelah restart.
+    """
+
+    def __init__(self, database=db, rate: Limit = BROADCAST_RATE, batch_size: int = BROADCAST_BATCH,
+                 concurrency: int = BROADCAST_CONCURRENCY):
+        self.database = database
+        self.limiter = GCRALimiter(rate)
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.job: Optional[BroadcastJob] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = asyncio.Event()
+        self._paused_until = 0.0
+        self._progress_message = None
+        self._last_progress = 0.0
+        self.retry_afters = 0
+        self.last_error = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self, bot, message: str, created_by: int, progress_message=None) -> BroadcastJob:
+        if self.is_running:
+            raise BroadcastBusy("Broadcast lain masih berjalan")
+        total = await self.database.count_users()
+        job_id = await self.database.create_broadcast(message, created_by, total)
+        self.job = BroadcastJob(job_id, message, total)
+        self._progress_message = progress_message
+        self._launch(bot)
+        logger.info(f"📣 Broadcast #{job_id} dimulai ke {total:,} user")
+        return self.job
+
+    async def resume(self, bot) -> Optional[BroadcastJob]:
+        """Lanjutkan broadcast yang terputus (status running di checkpoint)"""
+        if self.is_running or not self.database.is_connected:
+            return None
+        row = await self.database.get_active_broadcast()
+        if row is None:
+            return None
+        self.job = BroadcastJob(
+            row['id'], row['message'], row['total'], row['last_user_id'],
+            row['sent'], row['failed'], row['blocked']
+        )
+        self._launch(bot)
+        logger.info(f"📣 Broadcast #{row['id']} dilanjutkan dari user_id > {row['last_user_id']}")
+        return self.job
+
+    def _launch(self, bot):
+        self._stop.clear()
+        self._task = asyncio.create_task(self._run(bot))
+
+    async def cancel(self) -> bool:
+        """Hentikan broadcast secara permanen (tidak di-resume)"""
+        if not self.is_running:
+            return False
+        self.job.status = CANCELLED
+        await self.stop()
+        return True
+
+    async def stop(self):
+        """Hentikan task (shutdown); checkpoint tetap 'running' agar di-resume"""
+        if self._task is None:
+            return
+        self._stop.set()
+        await self._task
+        self._task = None
+
+    async def _sleep(self, delay: float):
+        # Tidur yang bisa dibangunkan stop() (tanpa cancel task)
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _acquire(self) -> bool:
+        """Tunggu token global; False jika broadcast dihentikan"""
+        while not self._stop.is_set():
+            paused = self._paused_until - time.monotonic()
+            if paused > 0:
+                await self._sleep(paused)
+                continue
+            delay = self.limiter.check('broadcast')
+            if not delay:
+                return True
+            await self._sleep(delay)
+        return False
+
+    async def _send(self, bot, user_id: int, semaphore: asyncio.Semaphore):
+        job = self.job
+        async with semaphore:
+            attempts = 0
+            while attempts < BROADCAST_MAX_RETRIES:
+                if not await self._acquire():
+                    return
+                try:
+                    await bot.send_message(chat_id=user_id, text=job.message)
+                    job.sent += 1
+                    return
+                except RetryAfter as e:
+                    # Semua pengirim ikut berhenti sampai batas Telegram pulih
+                    self.retry_afters += 1
+                    self._paused_until = max(self._paused_until, time.monotonic() + float(e.retry_after))
+                    logger.warning(f"⚠️ Broadcast kena RetryAfter {e.retry_after}s")
+                    # Bukan kegagalan penerima: tidak mengurangi jatah percobaan
+                except Forbidden:
+                    # User memblokir bot
+                    job.blocked += 1
+                    return
+                except TimedOut:
+                    attempts += 1
+                except (BadRequest, TelegramError) as e:
+                    logger.debug(f"Broadcast ke {user_id} gagal: {e}")
+                    job.failed += 1
+                    return
+            job.failed += 1
+
+    async def _run(self, bot):
+        job = self.job
+        semaphore = asyncio.Semaphore(self.concurrency)
+        errors = 0
+        try:
+            while not self._stop.is_set():
+                counters = (job.sent, job.failed, job.blocked)
+                try:
+                    if await self._run_batch(bot, semaphore):
+                        break
+                    errors = 0
+                except Exception as e:
+                    # Error sementara (DB, jaringan): batch diulang dari cursor terakhir
+                    job.sent, job.failed, job.blocked = counters
+                    errors += 1
+                    self.last_error = str(e)
+                    if errors >= BROADCAST_MAX_ERRORS:
+                        logger.error(f"❌ Broadcast #{job.id} gagal setelah {errors} error: {e}")
+                        job.status = FAILED
+                        break
+                    delay = min(BROADCAST_ERROR_BACKOFF * 2 ** (errors - 1), MAX_ERROR_BACKOFF)
+                    logger.warning(f"⚠️ Broadcast #{job.id} error: {e}, dicoba lagi dalam {delay:.0f}s")
+                    await self._sleep(delay)
+        finally:
+            await self._checkpoint()
+            await self._report(bot, final=job.status != RUNNING)
+            if job.status != RUNNING:
+                logger.info(f"📣 Broadcast #{job.id} {job.status}: {job.sent:,} terkirim, "
+                            f"{job.blocked:,} diblokir, {job.failed:,} gagal")
+
+    async def _run_batch(self, bot, semaphore: asyncio.Semaphore) -> bool:
+        """Kirim satu batch keyset; True jika broadcast selesai atau dihentikan"""
+        job = self.job
+        user_ids = await self.database.get_user_ids_after(job.last_user_id, self.batch_size)
+        if not user_ids:
+            job.status = DONE
+            return True
+
+        counters = (job.sent, job.failed, job.blocked)
+        # Tunggu semua pengirim selesai dulu agar penghitung tidak berubah setelah error
+        results = await asyncio.gather(
+            *(self._send(bot, user_id, semaphore) for user_id in user_ids), return_exceptions=True
+        )
+        if self._stop.is_set():
+            # Batch belum tentu lengkap: cursor tidak dimajukan dan, jika
+            # akan di-resume, penghitung dikembalikan agar tidak dihitung dua kali
+            if job.status == RUNNING:
+                job.sent, job.failed, job.blocked = counters
+            return True
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+
+        job.last_user_id = user_ids[-1]
+        await self._checkpoint()
+        await self._report(bot)
+        return False
+
+    async def _checkpoint(self):
+        job = self.job
+        try:
+            await self.database.save_broadcast_checkpoint(
+                job.id, job.status, job.last_user_id, job.sent, job.failed, job.blocked
+            )
+        except Exception as e:
+            logger.error(f"❌ Gagal menyimpan checkpoint broadcast #{job.id}: {e}")
+
+    async def _report(self, bot, final: bool = False):
+        """Perbarui pesan progres admin secara berkala"""
+        message = self._progress_message
+        now = time.monotonic()
+        if message is None or (not final and now - self._last_progress < BROADCAST_PROGRESS_INTERVAL):
+            return
+        self._last_progress = now
+        try:
+            await message.edit_text(format_progress(self.job.progress()))
+        except TelegramError:
+            pass
+
+    def progress(self) -> Optional[dict]:
+        if self.job is None:
+            return None
+        progress = self.job.progress()
+        progress['running'] = self.is_running
+        progress['paused_for'] = max(self._paused_until - time.monotonic(), 0.0)
+        return progress
+
+def format_progress(progress: dict) -> str:
+    eta = progress['eta']
+    eta_text = f"{eta / 60:.0f} menit" if eta is not None else "-"
+    return (
+        f"📣 **Broadcast #{progress['id']}** ({progress['status']})\n\n"
+        f"📈 Progres: {progress['processed']:,}/{progress['total']:,} ({progress['percent']:.1%})\n"
+        f"✅ Terkirim: {progress['sent']:,}\n"
+        f"🚫 Diblokir: {progress['blocked']:,}\n"
+        f"❌ Gagal: {progress['failed']:,}\n"
+        f"⚡ Throughput: {progress['rate']:.1f} pesan/detik\n"
+        f"⏳ Perkiraan selesai: {eta_text}"
+    )
+
+# Global instance
+broadcaster = Broadcaster()
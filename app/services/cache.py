@@ -0,0 +1,233 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Optional, Dict
+
+logger = logging.getLogger(__name__)
+
+# Konfigurasi cache respons AI
+AI_CACHE_SIZE = int(os.getenv('AI_CACHE_SIZE', '1000'))
+AI_CACHE_TTL = int(os.getenv('AI_CACHE_TTL', '3600'))
+AI_CACHE_DB = os.getenv('AI_CACHE_DB', 'true').lower() in ('1', 'true', 'yes')
+
+# Konfigurasi cache transkripsi audio (kunci: file_unique_id Telegram + engine)
+TRANSCRIPT_CACHE_SIZE = int(os.getenv('TRANSCRIPT_CACHE_SIZE', '2000'))
+TRANSCRIPT_CACHE_TTL = int(os.getenv('TRANSCRIPT_CACHE_TTL', str(7 * 24 * 3600)))
+TRANSCRIPT_CACHE_DB = os.getenv('TRANSCRIPT_CACHE_DB', 'true').lower() in ('1', 'true', 'yes')
+
+_whitespace = re.compile(r'\s+')
+
+def normalize_prompt(text: str) -> str:
+    """Normalisasi prompt: huruf kecil dan spasi dirapikan"""
+    return _whitespace.sub(' ', text).strip().lower()
+
+class TTLCache:
+    """LRU in-memory terbatas dengan TTL per entry"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key, default=None):
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl: float = None):
+        self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+class ResponseCache:
+    """Cache respons AI: LRU in-memory + tier Postgres opsional"""
+
+    def __init__(self, maxsize: int = AI_CACHE_SIZE, ttl: int = AI_CACHE_TTL, use_db: bool = AI_CACHE_DB):
+        self.memory = TTLCache(maxsize, ttl)
+        self.ttl = ttl
+        self.use_db = use_db
+        self.db_hits = 0
+        self.db_misses = 0
+
+    @staticmethod
+    def make_key(text: str, model_name: str, generation_config: Dict[str, Any]) -> str:
+        raw = json.dumps(
+            [normalize_prompt(text), model_name, generation_config],
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _db(self):
+        if not self.use_db:
+            return None
+        from app.services.database import db
+        return db if db.is_connected else None
+
+    async def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+
+        database = self._db()
+        if database is None:
+            return None
+
+        try:
+            value = await database.get_cached_response(key)
+        except Exception as e:
+            logger.warning(f"⚠️ Cache DB error: {e}")
+            return None
+
+        if value is None:
+            self.db_misses += 1
+            return None
+
+        self.db_hits += 1
+        self.memory.set(key, value)
+        return value
+
+    async def set(self, key: str, value: str):
+        self.memory.set(key, value)
+
+        database = self._db()
+        if database is None:
+            return
+        try:
+            await database.set_cached_response(key, value, self.ttl)
+        except Exception as e:
+            logger.warning(f"⚠️ Cache DB error: {e}")
+
+    async def clear(self) -> int:
+        """Kosongkan semua tier, return jumlah entry yang dihapus"""
+        removed = len(self.memory)
+        self.memory.clear()
+
+        database = self._db()
+        if database is not None:
+            removed += await database.clear_response_cache()
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.memory.stats()
+        stats['db_hits'] = self.db_hits
+        stats['db_misses'] = self.db_misses
+        return stats
+
+# Global cache instance
+response_cache = ResponseCache()
+
+class TranscriptCache:
+    """
+    Cache transkripsi per file audio Telegram (file_unique_id sama untuk
+    voice note yang di-forward): LRU in-memory + tier Postgres opsional.
+    Hit dicatat bersama durasi audio untuk melihat CPU STT yang dihemat.
+    """
+
+    def __init__(self, maxsize: int = TRANSCRIPT_CACHE_SIZE, ttl: int = TRANSCRIPT_CACHE_TTL,
+                 use_db: bool = TRANSCRIPT_CACHE_DB):
+        self.memory = TTLCache(maxsize, ttl)
+        self.use_db = use_db
+        self.db_hits = 0
+        self.db_misses = 0
+        self.saved_seconds = 0.0
+
+    def _db(self):
+        if not self.use_db:
+            return None
+        from app.services.database import db
+        return db if db.is_connected else None
+
+    async def get(self, file_unique_id: str, engine: str) -> Optional[str]:
+        key = (file_unique_id, engine)
+        entry = self.memory.get(key)
+        database = self._db()
+
+        if entry is not None:
+            if database is not None:
+                try:
+                    await database.record_transcript_hit(file_unique_id, engine)
+                except Exception as e:
+                    logger.warning(f"⚠️ Cache transkripsi DB error: {e}")
+        elif database is not None:
+            try:
+                # Ambil sekaligus menaikkan hitungan hit (satu query)
+                entry = await database.get_transcript(file_unique_id, engine)
+            except Exception as e:
+                logger.warning(f"⚠️ Cache transkripsi DB error: {e}")
+                return None
+            if entry is None:
+                self.db_misses += 1
+                return None
+            self.db_hits += 1
+            self.memory.set(key, entry)
+
+        if entry is None:
+            return None
+        transcript, duration = entry
+        self.saved_seconds += duration
+        return transcript
+
+    async def set(self, file_unique_id: str, engine: str, transcript: str, duration: float):
+        self.memory.set((file_unique_id, engine), (transcript, duration))
+
+        database = self._db()
+        if database is None:
+            return
+        try:
+            await database.set_transcript(file_unique_id, engine, transcript, duration)
+        except Exception as e:
+            logger.warning(f"⚠️ Cache transkripsi DB error: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.memory.stats()
+        stats['db_hits'] = self.db_hits
+        stats['db_misses'] = self.db_misses
+        stats['saved_seconds'] = self.saved_seconds
+        return stats
+
+# Global transcript cache instance
+transcript_cache = TranscriptCache()
@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import logging
+from collections import OrderedDict, deque
+
+logger = logging.getLogger(__name__)
+
+# Riwayat percakapan per user untuk pertanyaan lanjutan
+AI_HISTORY_ENABLED = os.getenv('AI_HISTORY_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+AI_HISTORY_TURNS = int(os.getenv('AI_HISTORY_TURNS', '6'))
+# Budget token riwayat per user (turn + ringkasan), jadi ukuran prompt tetap terbatas
+AI_HISTORY_TOKENS = int(os.getenv('AI_HISTORY_TOKENS', '1200'))
+AI_HISTORY_TURN_TOKENS = int(os.getenv('AI_HISTORY_TURN_TOKENS', '400'))
+AI_HISTORY_SUMMARY_TOKENS = int(os.getenv('AI_HISTORY_SUMMARY_TOKENS', '150'))
+# Batas global: jumlah user dan total token di memori (LRU user yang idle dibuang)
+AI_HISTORY_MAX_USERS = int(os.getenv('AI_HISTORY_MAX_USERS', '10000'))
+AI_HISTORY_MAX_TOKENS = int(os.getenv('AI_HISTORY_MAX_TOKENS', '2000000'))
+# Riwayat hanya untuk pertanyaan lanjutan: setelah idle selama ini percakapan dianggap
+# baru, sehingga pertanyaan berikutnya kembali lewat cache/near-duplicate/coalescing
+AI_HISTORY_IDLE_SECONDS = float(os.getenv('AI_HISTORY_IDLE_SECONDS', '600'))
+AI_HISTORY_DB = os.getenv('AI_HISTORY_DB', 'false').lower() in ('1', 'true', 'yes')
+
+# Panjang maksimal satu topik di ringkasan (karakter)
+SUMMARY_TOPIC_CHARS = 60
+
+def estimate_tokens(text: str) -> int:
+    """Estimasi kasar jumlah token (~4 karakter per token)"""
+    return len(text) // 4 + 1
+
+def clip(text: str, tokens: int) -> str:
+    """Potong teks ke kira-kira `tokens` token"""
+    text = ' '.join(text.split())
+    limit = tokens * 4
+    return text if len(text) <= limit else text[:limit - 1] + '…'
+
+class _History:
+    __slots__ = ('turns', 'topics', 'tokens', 'updated')
+
+    def __init__(self, turns=(), topics=(), updated: float = None):
+        # turn: (pertanyaan, jawaban, token)
+        self.turns = deque(turns)
+        # Ringkasan ekstraktif dari turn yang sudah dibuang: topik pertanyaan
+        self.topics = deque(topics)
+        self.tokens = sum(turn[2] for turn in self.turns) + self.summary_tokens
+        # Waktu (monotonic) turn terakhir dicatat
+        self.updated = time.monotonic() if updated is None else updated
+
+    def __bool__(self) -> bool:
+        return bool(self.turns or self.topics)
+
+    @property
+    def summary(self) -> str:
+        return '; '.join(self.topics)
+
+    @property
+    def summary_tokens(self) -> int:
+        return estimate_tokens(self.summary) if self.topics else 0
+
+    def render(self) -> str:
+        parts = []
+        if self.topics:
+            parts.append(f"Topik sebelumnya: {self.summary}")
+        for question, answer, _ in self.turns:
+            parts.append(f"User: {question}\nAsisten: {answer}")
+        return '\n\n'.join(parts)
+
+class ConversationMemory:
+    """
+    Riwayat percakapan per user dalam ring buffer dengan budget token.
+    Turn tertua diringkas menjadi daftar topik saat budget terlampaui;
+    seluruh store dibatasi jumlah user dan total token (LRU).
+    """
+
+    def __init__(self, max_turns: int = AI_HISTORY_TURNS, token_budget: int = AI_HISTORY_TOKENS,
+                 turn_tokens: int = AI_HISTORY_TURN_TOKENS, summary_tokens: int = AI_HISTORY_SUMMARY_TOKENS,
+                 max_users: int = AI_HISTORY_MAX_USERS, max_total_tokens: int = AI_HISTORY_MAX_TOKENS,
+                 idle_seconds: float = AI_HISTORY_IDLE_SECONDS, use_db: bool = AI_HISTORY_DB,
+                 enabled: bool = AI_HISTORY_ENABLED):
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.turn_tokens = turn_tokens
+        self.summary_tokens = summary_tokens
+        self.max_users = max_users
+        self.max_total_tokens = max_total_tokens
+        self.idle_seconds = idle_seconds
+        self.use_db = use_db
+        self.enabled = enabled
+        self._users = OrderedDict()
+        self.total_tokens = 0
+        self.summarized_turns = 0
+        self.evicted_users = 0
+        self.expired = 0
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def _db(self):
+        if not self.use_db:
+            return None
+        from app.services.database import db
+        return db if db.is_connected else None
+
+    async def _load(self, user_id: int) -> _History:
+        database = self._db()
+        if database is not None:
+            try:
+                row = await database.get_conversation(user_id)
+                if row is not None:
+                    return _History(
+                        (tuple(turn) for turn in json.loads(row['turns'])),
+                        json.loads(row['topics']),
+                        time.monotonic() - row['idle_seconds']
+                    )
+            except Exception as e:
+                logger.warning(f"⚠️ Gagal memuat riwayat user {user_id}: {e}")
+        return _History()
+
+    async def _save(self, user_id: int, history: _History):
+        database = self._db()
+        if database is None:
+            return
+        try:
+            await database.save_conversation(
+                user_id,
+                json.dumps(list(history.topics), ensure_ascii=False),
+                json.dumps(list(history.turns), ensure_ascii=False)
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Gagal menyimpan riwayat user {user_id}: {e}")
+
+    async def _get(self, user_id: int) -> _History:
+        history = self._users.get(user_id)
+        if history is not None:
+            self._users.move_to_end(user_id)
+            return history
+
+        history = await self._load(user_id)
+        # Bisa saja user yang sama sudah dimuat oleh request lain selama await
+        existing = self._users.get(user_id)
+        if existing is not None:
+            return existing
+        self._users[user_id] = history
+        self.total_tokens += history.tokens
+        self._evict()
+        return history
+
+    def _evict(self):
+        while self._users and (len(self._users) > self.max_users
+                               or self.total_tokens > self.max_total_tokens):
+            _, history = self._users.popitem(last=False)
+            self.total_tokens -= history.tokens
+            self.evicted_users += 1
+
+    def _compact(self, history: _History):
+        """Ringkas turn tertua sampai jumlah turn dan token kembali dalam budget"""
+        while history.turns and (len(history.turns) > self.max_turns
+                                 or history.tokens > self.token_budget):
+            question, _, tokens = history.turns.popleft()
+            history.tokens -= tokens + history.summary_tokens
+            history.topics.append(clip(question, SUMMARY_TOPIC_CHARS // 4))
+            while history.topics and estimate_tokens(history.summary) > self.summary_tokens:
+                history.topics.popleft()
+            history.tokens += history.summary_tokens
+            self.summarized_turns += 1
+
+    async def get_context(self, user_id: int) -> str:
+        """Riwayat siap pakai untuk prompt ('' jika belum ada)"""
+        if not self.enabled:
+            return ''
+        history = await self._get(user_id)
+        if history and time.monotonic() - history.updated > self.idle_seconds:
+            # Bukan pertanyaan lanjutan lagi: mulai percakapan baru
+            await self.clear(user_id)
+            self.expired += 1
+            return ''
+        return history.render()
+
+    async def record(self, user_id: int, question: str, answer: str):
+        if not self.enabled:
+            return
+        history = await self._get(user_id)
+        before = history.tokens
+
+        question = clip(question, self.turn_tokens // 4)
+        answer = clip(answer, self.turn_tokens - self.turn_tokens // 4)
+        tokens = estimate_tokens(question) + estimate_tokens(answer)
+        history.turns.append((question, answer, tokens))
+        history.tokens += tokens
+        history.updated = time.monotonic()
+        self._compact(history)
+
+        if user_id in self._users:
+            self.total_tokens += history.tokens - before
+            self._evict()
+        await self._save(user_id, history)
+
+    async def clear(self, user_id: int) -> bool:
+        """Hapus riwayat user (memori dan DB)"""
+        history = self._users.pop(user_id, None)
+        if history is not None:
+            self.total_tokens -= history.tokens
+
+        database = self._db()
+        if database is not None:
+            try:
+                await database.delete_conversation(user_id)
+            except Exception as e:
+                logger.warning(f"⚠️ Gagal menghapus riwayat user {user_id}: {e}")
+        return bool(history)
+
+    def stats(self) -> dict:
+        return {
+            'users': len(self._users),
+            'total_tokens': self.total_tokens,
+            'summarized_turns': self.summarized_turns,
+            'evicted_users': self.evicted_users,
+            'expired': self.expired,
+        }
+
+# Global instance
+conversation_memory = ConversationMemory()
@@ -1,25 +1,101 @@
 import os
 import asyncpg
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 import logging
-from datetime import datetime, timedelta
+from collections import Counter
+from datetime import date, datetime, timezone
 
 logger = logging.getLogger(__name__)
 
+# Konfigurasi connection pool
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '2'))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE_SIZE', '256'))
+DB_COMMAND_TIMEOUT = float(os.getenv('DB_COMMAND_TIMEOUT', '10'))
+DB_MAX_IDLE_LIFETIME = float(os.getenv('DB_MAX_IDLE_LIFETIME', '300'))
+
+# Partisi bulanan user_usage dan retensi data mentah
+USAGE_PARTITIONS_AHEAD = int(os.getenv('USAGE_PARTITIONS_AHEAD', '3'))
+USAGE_RETENTION_MONTHS = int(os.getenv('USAGE_RETENTION_MONTHS', '6'))
+# Advisory lock untuk DDL/migrasi startup dan maintenance partisi: dua proses
+# yang start bersamaan (mis. deploy Railway yang tumpang tindih) tidak balapan DDL
+USAGE_MAINTENANCE_LOCK = 748201
+# Jumlah baris tabel user_usage lama yang dipindah per transaksi saat migrasi
+USAGE_MIGRATION_BATCH = int(os.getenv('USAGE_MIGRATION_BATCH', '10000'))
+
+# Kolom untuk daftar user di panel admin
+USER_LIST_COLUMNS = 'id, user_id, username, first_name, is_premium'
+
+def _add_months(day: date, months: int) -> date:
+    month_index = day.year * 12 + day.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+def _partition_name(month: date) -> str:
+    return f"user_usage_p{month.year:04d}{month.month:02d}"
+
+def _partition_month(name: str) -> Optional[date]:
+    suffix = name[len('user_usage_p'):]
+    if not name.startswith('user_usage_p') or len(suffix) != 6 or not suffix.isdigit():
+        return None
+    return date(int(suffix[:4]), int(suffix[4:]), 1)
+
 class Database:
     def __init__(self):
-        self.conn: Optional[asyncpg.Connection] = None
+        self.pool: Optional[asyncpg.Pool] = None
+    
+    @property
+    def is_connected(self) -> bool:
+        return self.pool is not None
     
     async def connect(self):
         database_url = os.getenv('DATABASE_URL')
         if not database_url:
             raise ValueError("DATABASE_URL tidak ditemukan!")
         
-        self.conn = await asyncpg.connect(database_url)
+        # Prepared statement di-cache per koneksi (statement_cache_size);
+        # koneksi idle terlalu lama ditutup dan dibuat ulang oleh pool
+        self.pool = await asyncpg.create_pool(
+            database_url,
+            min_size=DB_POOL_MIN_SIZE,
+            max_size=DB_POOL_MAX_SIZE,
+            statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+            command_timeout=DB_COMMAND_TIMEOUT,
+            max_inactive_connection_lifetime=DB_MAX_IDLE_LIFETIME,
+        )
         await self.create_tables()
+        logger.info(f"✅ Database pool siap ({DB_POOL_MIN_SIZE}-{DB_POOL_MAX_SIZE} koneksi)")
+    
+    async def close(self):
+        if self.pool is not None:
+            pool, self.pool = self.pool, None
+            await pool.close()
+            logger.info("✅ Database pool ditutup")
+    
+    async def health_check(self) -> bool:
+        """Cek koneksi database dengan query ringan"""
+        if self.pool is None:
+            return False
+        try:
+            return await self.pool.fetchval('SELECT 1') == 1
+        except Exception as e:
+            logger.warning(f"⚠️ Database health check gagal: {e}")
+            return False
     
     async def create_tables(self):
-        await self.conn.execute('''
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute('SELECT pg_advisory_xact_lock($1)', USAGE_MAINTENANCE_LOCK)
+                await self._create_tables(conn)
+            
+            # Data lama dipindah per batch sebelum rollup di-backfill dari user_usage
+            await self._migrate_legacy_usage(conn)
+            
+            async with conn.transaction():
+                await conn.execute('SELECT pg_advisory_xact_lock($1)', USAGE_MAINTENANCE_LOCK)
+                await self._create_rollup_tables(conn)
+    
+    async def _create_tables(self, conn: asyncpg.Connection):
+        await conn.execute('''
             CREATE TABLE IF NOT EXISTS users (
                 id SERIAL PRIMARY KEY,
                 user_id BIGINT UNIQUE NOT NULL,
@@ -33,28 +109,399 @@ class Database:
             )
         ''')
         
-        await self.conn.execute('''
-            CREATE TABLE IF NOT EXISTS user_usage (
+        # Pencarian prefix di browser admin: urutan byte (COLLATE "C") agar prefix
+        # menjadi range index biasa, user_id sebagai tie-breaker untuk keyset
+        await conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_users_username_prefix
+            ON users ((lower(username)) COLLATE "C", user_id)
+        ''')
+        await conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_users_user_id_prefix
+            ON users ((user_id::text) COLLATE "C", user_id)
+        ''')
+        
+        await self._create_usage_table(conn)
+        
+        await conn.execute('''
+            CREATE TABLE IF NOT EXISTS ai_response_cache (
+                cache_key CHAR(64) PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                expires_at TIMESTAMP NOT NULL
+            )
+        ''')
+        
+        await conn.execute('''
+            CREATE TABLE IF NOT EXISTS conversation_history (
+                user_id BIGINT PRIMARY KEY,
+                topics JSONB NOT NULL DEFAULT '[]',
+                turns JSONB NOT NULL DEFAULT '[]',
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        # Tabel lama menyimpan topik sebagai teks "a; b" (rusak jika topik berisi "; ")
+        await conn.execute('''
+            ALTER TABLE conversation_history ADD COLUMN IF NOT EXISTS topics JSONB NOT NULL DEFAULT '[]'
+        ''')
+        
+        await conn.execute('''
+            CREATE TABLE IF NOT EXISTS transcription_cache (
+                file_unique_id VARCHAR(64) NOT NULL,
+                engine VARCHAR(128) NOT NULL,
+                transcript TEXT NOT NULL,
+                duration REAL NOT NULL DEFAULT 0,
+                hits INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (file_unique_id, engine)
+            )
+        ''')
+        await conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_transcription_cache_last_used
+            ON transcription_cache(last_used_at)
+        ''')
+        
+        # Checkpoint broadcast admin (cursor keyset + penghitung) agar bisa di-resume
+        await conn.execute('''
+            CREATE TABLE IF NOT EXISTS broadcasts (
                 id SERIAL PRIMARY KEY,
+                message TEXT NOT NULL,
+                created_by BIGINT NOT NULL,
+                status VARCHAR(16) NOT NULL DEFAULT 'running',
+                last_user_id BIGINT NOT NULL DEFAULT 0,
+                total INTEGER NOT NULL DEFAULT 0,
+                sent INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                blocked INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+    
+    async def _create_usage_table(self, conn: asyncpg.Connection):
+        """user_usage dipartisi per bulan; tabel lama non-partisi di-rename untuk dimigrasi"""
+        relkind = await conn.fetchval('''
+            SELECT c.relkind FROM pg_class c
+            WHERE c.relname = 'user_usage' AND c.relnamespace = current_schema()::regnamespace
+        ''')
+        
+        if relkind == 'r':
+            logger.info("🔧 Migrasi user_usage ke tabel partisi...")
+            await conn.execute('ALTER TABLE user_usage RENAME TO user_usage_legacy')
+            await conn.execute('ALTER INDEX IF EXISTS user_usage_pkey RENAME TO user_usage_legacy_pkey')
+            await conn.execute('ALTER SEQUENCE IF EXISTS user_usage_id_seq RENAME TO user_usage_legacy_id_seq')
+        
+        await conn.execute('''
+            CREATE TABLE IF NOT EXISTS user_usage (
+                id BIGSERIAL,
+                user_id BIGINT NOT NULL,
+                action_type VARCHAR(50) NOT NULL,
+                timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                details JSONB,
+                PRIMARY KEY (id, timestamp)
+            ) PARTITION BY RANGE (timestamp)
+        ''')
+        # Partisi default menampung baris di luar range agar insert tidak pernah gagal
+        await conn.execute('CREATE TABLE IF NOT EXISTS user_usage_default PARTITION OF user_usage DEFAULT')
+        await conn.execute('CREATE INDEX IF NOT EXISTS idx_user_usage_user_ts ON user_usage (user_id, timestamp)')
+        
+        await conn.execute('''
+            CREATE TABLE IF NOT EXISTS user_usage_monthly (
+                month DATE NOT NULL,
                 user_id BIGINT NOT NULL,
                 action_type VARCHAR(50) NOT NULL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                details JSONB
+                events BIGINT NOT NULL DEFAULT 0,
+                PRIMARY KEY (month, user_id, action_type)
             )
         ''')
+        
+        today = datetime.now(timezone.utc).date()
+        first_month = today
+        if relkind == 'r':
+            oldest = await conn.fetchval('SELECT MIN(timestamp) FROM user_usage_legacy')
+            if oldest is not None:
+                first_month = min(oldest.date(), today)
+        
+        await self._ensure_partitions(conn, first_month, _add_months(today, USAGE_PARTITIONS_AHEAD))
+    
+    async def _migrate_legacy_usage(self, conn: asyncpg.Connection):
+        """
+        Pindahkan user_usage_legacy ke tabel partisi per batch (satu transaksi
+        per batch). Jika terputus, sisa baris dilanjutkan pada startup berikutnya.
+        """
+        moved = 0
+        while True:
+            async with conn.transaction():
+                await conn.execute('SELECT pg_advisory_xact_lock($1)', USAGE_MAINTENANCE_LOCK)
+                # Proses lain mungkin sudah menyelesaikan migrasi selagi menunggu lock
+                if await conn.fetchval("SELECT to_regclass('user_usage_legacy') IS NULL"):
+                    break
+                
+                batch = await conn.fetchval('''
+                    WITH moved AS (
+                        DELETE FROM user_usage_legacy WHERE id IN (
+                            SELECT id FROM user_usage_legacy ORDER BY id LIMIT $1
+                        )
+                        RETURNING user_id, action_type, timestamp, details
+                    ), inserted AS (
+                        INSERT INTO user_usage (user_id, action_type, timestamp, details)
+                        SELECT user_id, action_type, COALESCE(timestamp, CURRENT_TIMESTAMP), details
+                        FROM moved
+                        RETURNING 1
+                    )
+                    SELECT COUNT(*) FROM inserted
+                ''', USAGE_MIGRATION_BATCH)
+                
+                if batch == 0:
+                    await conn.execute('DROP TABLE user_usage_legacy')
+                    logger.info(f"✅ Migrasi user_usage selesai ({moved} baris)")
+                    break
+                moved += batch
+    
+    async def _ensure_partitions(self, conn: asyncpg.Connection, start: date, end: date) -> int:
+        """Buat partisi bulanan dari bulan `start` sampai bulan `end` (inklusif), return jumlah yang baru dibuat"""
+        created = 0
+        month = start.replace(day=1)
+        while month <= end:
+            upper = _add_months(month, 1)
+            name = _partition_name(month)
+            if await conn.fetchval('SELECT to_regclass($1) IS NULL', name):
+                await conn.execute(f'''
+                    CREATE TABLE IF NOT EXISTS {name}
+                    PARTITION OF user_usage
+                    FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')
+                ''')
+                created += 1
+            month = upper
+        return created
+    
+    async def maintain_partitions(self, months_ahead: int = None, retention_months: int = None) -> Dict[str, int]:
+        """
+        Buat partisi ke depan, ringkas partisi lama ke user_usage_monthly
+        lalu drop partisinya. Aman dijalankan dari beberapa proses sekaligus.
+        """
+        months_ahead = USAGE_PARTITIONS_AHEAD if months_ahead is None else months_ahead
+        retention_months = USAGE_RETENTION_MONTHS if retention_months is None else retention_months
+        today = datetime.now(timezone.utc).date()
+        cutoff = _add_months(today.replace(day=1), -retention_months)
+        dropped = 0
+        
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                if not await conn.fetchval('SELECT pg_try_advisory_xact_lock($1)', USAGE_MAINTENANCE_LOCK):
+                    return {'created': 0, 'dropped': 0}
+                
+                created = await self._ensure_partitions(conn, today, _add_months(today, months_ahead))
+                
+                partitions = await conn.fetch('''
+                    SELECT c.relname FROM pg_inherits i
+                    JOIN pg_class c ON c.oid = i.inhrelid
+                    WHERE i.inhparent = 'user_usage'::regclass
+                ''')
+                for row in partitions:
+                    month = _partition_month(row['relname'])
+                    if month is None or _add_months(month, 1) > cutoff:
+                        continue
+                    
+                    # Ringkas ke agregat per user/bulan sebelum partisi di-drop
+                    await conn.execute(f'''
+                        INSERT INTO user_usage_monthly (month, user_id, action_type, events)
+                        SELECT $1::date, user_id, action_type, COUNT(*)
+                        FROM {row['relname']} GROUP BY user_id, action_type
+                        ON CONFLICT (month, user_id, action_type) DO UPDATE SET
+                        events = user_usage_monthly.events + EXCLUDED.events
+                    ''', month)
+                    await conn.execute(f'DROP TABLE {row["relname"]}')
+                    dropped += 1
+                
+                # Rollup per jam tidak dibutuhkan lagi untuk data di luar retensi;
+                # rollup harian tetap disimpan
+                await conn.execute('DELETE FROM usage_rollup_hourly WHERE bucket < $1', 
+                                   datetime.combine(cutoff, datetime.min.time()))
+        
+        if dropped:
+            logger.info(f"🧹 {dropped} partisi user_usage lama diringkas dan di-drop")
+        return {'created': created, 'dropped': dropped}
+    
+    async def _create_rollup_tables(self, conn: asyncpg.Connection):
+        """Tabel rollup usage per jam/hari, di-maintain saat event ditulis"""
+        await conn.execute('''
+            CREATE TABLE IF NOT EXISTS usage_rollup_hourly (
+                bucket TIMESTAMP NOT NULL,
+                action_type VARCHAR(50) NOT NULL,
+                events BIGINT NOT NULL DEFAULT 0,
+                PRIMARY KEY (bucket, action_type)
+            )
+        ''')
+        
+        await conn.execute('''
+            CREATE TABLE IF NOT EXISTS usage_rollup_daily (
+                day DATE NOT NULL,
+                action_type VARCHAR(50) NOT NULL,
+                events BIGINT NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, action_type)
+            )
+        ''')
+        
+        # Active users dihitung dari last_active_at ter-index, bukan COUNT(DISTINCT)
+        await conn.execute('ALTER TABLE users ADD COLUMN IF NOT EXISTS last_active_at TIMESTAMP')
+        await conn.execute('CREATE INDEX IF NOT EXISTS idx_users_last_active ON users (last_active_at)')
+        await conn.execute('CREATE INDEX IF NOT EXISTS idx_users_premium ON users (user_id) WHERE is_premium')
+        
+        # Backfill sekali dari data lama ketika rollup masih kosong
+        if await conn.fetchval('SELECT NOT EXISTS (SELECT 1 FROM usage_rollup_daily)'):
+            await conn.execute('''
+                INSERT INTO usage_rollup_hourly (bucket, action_type, events)
+                SELECT date_trunc('hour', timestamp), action_type, COUNT(*)
+                FROM user_usage GROUP BY 1, 2
+            ''')
+            await conn.execute('''
+                INSERT INTO usage_rollup_daily (day, action_type, events)
+                SELECT timestamp::date, action_type, COUNT(*)
+                FROM user_usage GROUP BY 1, 2
+            ''')
+            await conn.execute('''
+                UPDATE users u SET last_active_at = a.last_active
+                FROM (SELECT user_id, MAX(timestamp) AS last_active FROM user_usage GROUP BY user_id) a
+                WHERE u.user_id = a.user_id AND u.last_active_at IS NULL
+            ''')
+
+        await self._create_stats_counters(conn)
+    
+    async def _create_stats_counters(self, conn: asyncpg.Connection):
+        """
+        Counter statistik yang di-maintain trigger: total user, premium, total
+        usage sepanjang waktu, plus bucket bulanan (user aktif dan usage per
+        bulan). get_usage_stats cukup membaca beberapa baris lewat primary key.
+        """
+        await conn.execute('''
+            CREATE TABLE IF NOT EXISTS stats_counters (
+                name VARCHAR(64) PRIMARY KEY,
+                value BIGINT NOT NULL DEFAULT 0
+            )
+        ''')
+        await conn.execute('''
+            CREATE OR REPLACE FUNCTION bump_stats_counter(counter_name TEXT, delta BIGINT) RETURNS void AS $$
+                INSERT INTO stats_counters (name, value) VALUES (counter_name, delta)
+                ON CONFLICT (name) DO UPDATE SET value = stats_counters.value + EXCLUDED.value
+            $$ LANGUAGE sql
+        ''')
+        await conn.execute('''
+            CREATE OR REPLACE FUNCTION users_stats_counters() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    PERFORM bump_stats_counter('users', 1);
+                    IF NEW.is_premium THEN
+                        PERFORM bump_stats_counter('premium_users', 1);
+                    END IF;
+                    IF NEW.last_active_at IS NOT NULL THEN
+                        PERFORM bump_stats_counter('active:' || to_char(NEW.last_active_at, 'YYYY-MM'), 1);
+                    END IF;
+                ELSIF TG_OP = 'DELETE' THEN
+                    PERFORM bump_stats_counter('users', -1);
+                    IF OLD.is_premium THEN
+                        PERFORM bump_stats_counter('premium_users', -1);
+                    END IF;
+                ELSE
+                    IF NEW.is_premium IS DISTINCT FROM OLD.is_premium THEN
+                        PERFORM bump_stats_counter('premium_users', CASE WHEN NEW.is_premium THEN 1 ELSE -1 END);
+                    END IF;
+                    -- User dihitung aktif sekali per bulan: saat pertama aktif di bulan itu
+                    IF NEW.last_active_at IS NOT NULL AND (OLD.last_active_at IS NULL OR
+                       date_trunc('month', OLD.last_active_at) < date_trunc('month', NEW.last_active_at)) THEN
+                        PERFORM bump_stats_counter('active:' || to_char(NEW.last_active_at, 'YYYY-MM'), 1);
+                    END IF;
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        ''')
+        await conn.execute('''
+            CREATE OR REPLACE FUNCTION usage_stats_counters() RETURNS trigger AS $$
+            DECLARE
+                delta BIGINT;
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    delta := NEW.events;
+                ELSE
+                    delta := NEW.events - OLD.events;
+                END IF;
+                PERFORM bump_stats_counter('total_usage', delta);
+                PERFORM bump_stats_counter('usage:' || to_char(NEW.day, 'YYYY-MM'), delta);
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        ''')
+        
+        if await conn.fetchval("SELECT EXISTS (SELECT 1 FROM stats_counters WHERE name = 'users')"):
+            return
+        
+        # Pertama kali: pasang trigger lalu isi counter dari data yang ada. Lock
+        # menahan write selama seeding agar tidak ada update yang terlewat/terhitung dua kali
+        await conn.execute('LOCK TABLE users, usage_rollup_daily IN SHARE ROW EXCLUSIVE MODE')
+        await conn.execute('DROP TRIGGER IF EXISTS users_stats_counters ON users')
+        await conn.execute('''
+            CREATE TRIGGER users_stats_counters
+            AFTER INSERT OR DELETE OR UPDATE OF is_premium, last_active_at ON users
+            FOR EACH ROW EXECUTE FUNCTION users_stats_counters()
+        ''')
+        await conn.execute('DROP TRIGGER IF EXISTS usage_stats_counters ON usage_rollup_daily')
+        await conn.execute('''
+            CREATE TRIGGER usage_stats_counters
+            AFTER INSERT OR UPDATE OF events ON usage_rollup_daily
+            FOR EACH ROW EXECUTE FUNCTION usage_stats_counters()
+        ''')
+        await conn.execute('''
+            INSERT INTO stats_counters (name, value)
+            SELECT 'users', COUNT(*) FROM users
+            UNION ALL SELECT 'premium_users', COUNT(*) FROM users WHERE is_premium
+            UNION ALL SELECT 'total_usage', COALESCE(SUM(events), 0) FROM usage_rollup_daily
+            UNION ALL SELECT 'active:' || to_char(last_active_at, 'YYYY-MM'), COUNT(*)
+                FROM users WHERE last_active_at IS NOT NULL
+                GROUP BY to_char(last_active_at, 'YYYY-MM')
+            UNION ALL SELECT 'usage:' || to_char(day, 'YYYY-MM'), SUM(events)
+                FROM usage_rollup_daily GROUP BY to_char(day, 'YYYY-MM')
+            ON CONFLICT (name) DO UPDATE SET value = EXCLUDED.value
+        ''')
     
     async def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
-        return await self.conn.fetchrow(
+        return await self.pool.fetchrow(
             'SELECT * FROM users WHERE user_id = $1', user_id
         )
     
     async def get_all_users(self, limit: int = 100) -> List[Dict[str, Any]]:
-        return await self.conn.fetch(
-            'SELECT * FROM users ORDER BY created_at DESC LIMIT $1', limit
+        # id SERIAL mengikuti urutan created_at dan sudah ter-index (primary key)
+        return await self.pool.fetch(
+            'SELECT * FROM users ORDER BY id DESC LIMIT $1', limit
         )
     
-    async def create_user(self, user_data: Dict[str, Any]) -> None:
-        await self.conn.execute('''
+    async def get_users_page(self, before_id: Optional[int], limit: int) -> List[Dict[str, Any]]:
+        """Satu halaman user terbaru dengan keyset (id < cursor), hanya kolom yang ditampilkan"""
+        return await self.pool.fetch(f'''
+            SELECT {USER_LIST_COLUMNS} FROM users
+            WHERE id < $1 ORDER BY id DESC LIMIT $2
+        ''', before_id if before_id is not None else 2**31 - 1, limit)
+    
+    async def search_users(self, prefix: str, after: Optional[Tuple[str, int]], limit: int) -> List[Dict[str, Any]]:
+        """
+        Cari user berdasarkan prefix username (atau user_id jika berupa angka).
+        Prefix diubah menjadi range [prefix, prefix+1) pada index COLLATE "C",
+        halaman berikutnya memakai keyset (sort_key, user_id) > cursor.
+        """
+        key = 'user_id::text' if prefix.isdigit() else 'lower(username)'
+        prefix = prefix.lower()
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        after_key, after_user_id = after if after is not None else (prefix, 0)
+        return await self.pool.fetch(f'''
+            SELECT {USER_LIST_COLUMNS}, {key} AS sort_key FROM users
+            WHERE {key} COLLATE "C" >= $1 AND {key} COLLATE "C" < $2
+            AND ({key} COLLATE "C", user_id) > ($3 COLLATE "C", $4)
+            ORDER BY {key} COLLATE "C", user_id LIMIT $5
+        ''', prefix, upper, after_key, after_user_id, limit)
+    
+    async def create_user(self, user_data: Dict[str, Any]) -> bool:
+        """Upsert user, return status premium-nya"""
+        return await self.pool.fetchval('''
             INSERT INTO users (user_id, username, first_name, last_name)
             VALUES ($1, $2, $3, $4)
             ON CONFLICT (user_id) DO UPDATE SET
@@ -62,68 +509,221 @@ class Database:
             first_name = EXCLUDED.first_name,
             last_name = EXCLUDED.last_name,
             updated_at = CURRENT_TIMESTAMP
+            RETURNING is_premium
         ''', user_data['user_id'], user_data['username'], 
            user_data['first_name'], user_data['last_name'])
     
     async def update_user_usage(self, user_id: int, action_type: str) -> None:
-        await self.conn.execute('''
-            INSERT INTO user_usage (user_id, action_type)
-            VALUES ($1, $2)
-        ''', user_id, action_type)
-        
-        await self.conn.execute('''
+        # Satu round trip: INSERT, rollup dan UPDATE dalam satu statement (CTE)
+        await self.pool.execute('''
+            WITH now_utc AS (
+                SELECT (NOW() AT TIME ZONE 'UTC') AS ts
+            ), usage AS (
+                INSERT INTO user_usage (user_id, action_type, timestamp)
+                SELECT $1, $2, ts FROM now_utc
+            ), hourly AS (
+                INSERT INTO usage_rollup_hourly (bucket, action_type, events)
+                SELECT date_trunc('hour', ts), $2, 1 FROM now_utc
+                ON CONFLICT (bucket, action_type) DO UPDATE SET
+                events = usage_rollup_hourly.events + 1
+            ), daily AS (
+                INSERT INTO usage_rollup_daily (day, action_type, events)
+                SELECT ts::date, $2, 1 FROM now_utc
+                ON CONFLICT (day, action_type) DO UPDATE SET
+                events = usage_rollup_daily.events + 1
+            )
             UPDATE users 
             SET usage_count = usage_count + 1, 
+                last_active_at = (SELECT ts FROM now_utc),
                 updated_at = CURRENT_TIMESTAMP 
             WHERE user_id = $1
-        ''', user_id)
+        ''', user_id, action_type)
+    
+    async def flush_usage_events(self, events: List[tuple]) -> None:
+        """Tulis batch event (user_id, action_type, timestamp) dalam satu transaksi"""
+        counts = Counter()
+        last_active = {}
+        hourly = Counter()
+        daily = Counter()
+        for user_id, action_type, timestamp in events:
+            counts[user_id] += 1
+            if timestamp > last_active.get(user_id, timestamp.min):
+                last_active[user_id] = timestamp
+            hourly[(timestamp.replace(minute=0, second=0, microsecond=0), action_type)] += 1
+            daily[(timestamp.date(), action_type)] += 1
+        
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.copy_records_to_table(
+                    'user_usage',
+                    records=events,
+                    columns=['user_id', 'action_type', 'timestamp']
+                )
+                # Satu UPDATE agregat untuk semua counter user di batch ini
+                user_ids = list(counts.keys())
+                await conn.execute('''
+                    UPDATE users u
+                    SET usage_count = u.usage_count + v.n,
+                        last_active_at = GREATEST(u.last_active_at, v.last_active),
+                        updated_at = CURRENT_TIMESTAMP
+                    FROM unnest($1::bigint[], $2::int[], $3::timestamp[]) AS v(user_id, n, last_active)
+                    WHERE u.user_id = v.user_id
+                ''', user_ids, [counts[u] for u in user_ids], [last_active[u] for u in user_ids])
+                
+                # Rollup inkremental per jam dan per hari
+                await conn.execute('''
+                    INSERT INTO usage_rollup_hourly (bucket, action_type, events)
+                    SELECT * FROM unnest($1::timestamp[], $2::varchar[], $3::bigint[])
+                    ON CONFLICT (bucket, action_type) DO UPDATE SET
+                    events = usage_rollup_hourly.events + EXCLUDED.events
+                ''', [k[0] for k in hourly], [k[1] for k in hourly], list(hourly.values()))
+                await conn.execute('''
+                    INSERT INTO usage_rollup_daily (day, action_type, events)
+                    SELECT * FROM unnest($1::date[], $2::varchar[], $3::bigint[])
+                    ON CONFLICT (day, action_type) DO UPDATE SET
+                    events = usage_rollup_daily.events + EXCLUDED.events
+                ''', [k[0] for k in daily], [k[1] for k in daily], list(daily.values()))
     
     async def update_user_premium(self, user_id: int, is_premium: bool) -> None:
-        await self.conn.execute('''
+        await self.pool.execute('''
             UPDATE users 
             SET is_premium = $1, 
                 updated_at = CURRENT_TIMESTAMP 
             WHERE user_id = $2
         ''', is_premium, user_id)
     
-    async def get_usage_stats(self) -> Dict[str, Any]:
-        """Mendapatkan statistik penggunaan bot"""
-        # Total users
-        total_users = await self.conn.fetchval('SELECT COUNT(*) FROM users')
-        
-        # Premium users
-        premium_users = await self.conn.fetchval('SELECT COUNT(*) FROM users WHERE is_premium = true')
-        
-        # Total usage
-        total_usage = await self.conn.fetchval('SELECT COUNT(*) FROM user_usage')
-        
-        # Active users (30 hari terakhir)
-        active_users = await self.conn.fetchval('''
-            SELECT COUNT(DISTINCT user_id) FROM user_usage 
-            WHERE timestamp >= NOW() - INTERVAL '30 days'
-        ''')
-        
-        # Usage hari ini
-        today_usage = await self.conn.fetchval('''
-            SELECT COUNT(*) FROM user_usage 
-            WHERE DATE(timestamp) = CURRENT_DATE
+    async def get_cached_response(self, cache_key: str) -> Optional[str]:
+        return await self.pool.fetchval('''
+            SELECT response FROM ai_response_cache
+            WHERE cache_key = $1 AND expires_at > CURRENT_TIMESTAMP
+        ''', cache_key)
+    
+    async def set_cached_response(self, cache_key: str, response: str, ttl: int) -> None:
+        await self.pool.execute('''
+            INSERT INTO ai_response_cache (cache_key, response, expires_at)
+            VALUES ($1, $2, CURRENT_TIMESTAMP + make_interval(secs => $3))
+            ON CONFLICT (cache_key) DO UPDATE SET
+            response = EXCLUDED.response,
+            created_at = CURRENT_TIMESTAMP,
+            expires_at = EXCLUDED.expires_at
+        ''', cache_key, response, float(ttl))
+    
+    async def clear_response_cache(self) -> int:
+        result = await self.pool.execute('DELETE FROM ai_response_cache')
+        return int(result.split()[-1])
+    
+    async def get_transcript(self, file_unique_id: str, engine: str) -> Optional[Tuple[str, float]]:
+        """Ambil transkripsi tersimpan sekaligus mencatat hit"""
+        row = await self.pool.fetchrow('''
+            UPDATE transcription_cache
+            SET hits = hits + 1, last_used_at = CURRENT_TIMESTAMP
+            WHERE file_unique_id = $1 AND engine = $2
+            RETURNING transcript, duration
+        ''', file_unique_id, engine)
+        return (row['transcript'], row['duration']) if row else None
+    
+    async def record_transcript_hit(self, file_unique_id: str, engine: str) -> None:
+        await self.pool.execute('''
+            UPDATE transcription_cache
+            SET hits = hits + 1, last_used_at = CURRENT_TIMESTAMP
+            WHERE file_unique_id = $1 AND engine = $2
+        ''', file_unique_id, engine)
+    
+    async def set_transcript(self, file_unique_id: str, engine: str, transcript: str, duration: float) -> None:
+        await self.pool.execute('''
+            INSERT INTO transcription_cache (file_unique_id, engine, transcript, duration)
+            VALUES ($1, $2, $3, $4)
+            ON CONFLICT (file_unique_id, engine) DO UPDATE SET
+            transcript = EXCLUDED.transcript,
+            duration = EXCLUDED.duration,
+            last_used_at = CURRENT_TIMESTAMP
+        ''', file_unique_id, engine, transcript, duration)
+    
+    async def prune_transcripts(self, retention_days: int) -> int:
+        """Hapus transkripsi yang tidak dipakai selama retention_days"""
+        result = await self.pool.execute('''
+            DELETE FROM transcription_cache
+            WHERE last_used_at < CURRENT_TIMESTAMP - make_interval(days => $1)
+        ''', retention_days)
+        return int(result.split()[-1])
+    
+    async def get_conversation(self, user_id: int) -> Optional[Dict[str, Any]]:
+        row = await self.pool.fetchrow('''
+            SELECT topics::text AS topics, turns::text AS turns,
+            EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - updated_at)::float AS idle_seconds
+            FROM conversation_history WHERE user_id = $1
+        ''', user_id)
+        return dict(row) if row else None
+    
+    async def save_conversation(self, user_id: int, topics: str, turns: str) -> None:
+        await self.pool.execute('''
+            INSERT INTO conversation_history (user_id, topics, turns, updated_at)
+            VALUES ($1, $2::jsonb, $3::jsonb, CURRENT_TIMESTAMP)
+            ON CONFLICT (user_id) DO UPDATE SET
+            topics = EXCLUDED.topics,
+            turns = EXCLUDED.turns,
+            updated_at = CURRENT_TIMESTAMP
+        ''', user_id, topics, turns)
+    
+    async def delete_conversation(self, user_id: int) -> None:
+        await self.pool.execute('DELETE FROM conversation_history WHERE user_id = $1', user_id)
+    
+    async def count_users(self) -> int:
+        return await self.pool.fetchval('SELECT COUNT(*) FROM users')
+    
+    async def get_user_ids_after(self, last_user_id: int, limit: int) -> List[int]:
+        """Keyset pagination lewat primary key: biaya per halaman tetap, tanpa OFFSET"""
+        rows = await self.pool.fetch('''
+            SELECT user_id FROM users WHERE user_id > $1 ORDER BY user_id LIMIT $2
+        ''', last_user_id, limit)
+        return [row['user_id'] for row in rows]
+    
+    async def create_broadcast(self, message: str, created_by: int, total: int) -> int:
+        return await self.pool.fetchval('''
+            INSERT INTO broadcasts (message, created_by, total) VALUES ($1, $2, $3) RETURNING id
+        ''', message, created_by, total)
+    
+    async def save_broadcast_checkpoint(self, broadcast_id: int, status: str, last_user_id: int,
+                                        sent: int, failed: int, blocked: int) -> None:
+        await self.pool.execute('''
+            UPDATE broadcasts SET status = $2, last_user_id = $3, sent = $4, failed = $5,
+            blocked = $6, updated_at = CURRENT_TIMESTAMP
+            WHERE id = $1
+        ''', broadcast_id, status, last_user_id, sent, failed, blocked)
+    
+    async def get_active_broadcast(self) -> Optional[Dict[str, Any]]:
+        row = await self.pool.fetchrow('''
+            SELECT * FROM broadcasts WHERE status = 'running' ORDER BY id DESC LIMIT 1
         ''')
-        
-        # Usage bulan ini
-        month_usage = await self.conn.fetchval('''
-            SELECT COUNT(*) FROM user_usage 
-            WHERE EXTRACT(MONTH FROM timestamp) = EXTRACT(MONTH FROM CURRENT_DATE)
-            AND EXTRACT(YEAR FROM timestamp) = EXTRACT(YEAR FROM CURRENT_DATE)
+        return dict(row) if row else None
+    
+    async def get_usage_stats(self) -> Dict[str, Any]:
+        """
+        Statistik penggunaan bot dari counter dan bucket rollup saat ini (satu
+        query, tanpa scan tabel). active_users = user aktif di bulan kalender
+        berjalan (UTC), bukan 30 hari terakhir seperti versi sebelumnya.
+        """
+        row = await self.pool.fetchrow('''
+            WITH today AS (
+                SELECT (NOW() AT TIME ZONE 'UTC') AS ts
+            ), counters AS (
+                SELECT name, value FROM stats_counters, today
+                WHERE name IN ('users', 'premium_users', 'total_usage',
+                               'active:' || to_char(today.ts, 'YYYY-MM'),
+                               'usage:' || to_char(today.ts, 'YYYY-MM'))
+            )
+            SELECT
+                (SELECT COALESCE(MAX(value) FILTER (WHERE name = 'users'), 0) FROM counters) AS total_users,
+                (SELECT COALESCE(MAX(value) FILTER (WHERE name = 'premium_users'), 0) FROM counters) AS premium_users,
+                (SELECT COALESCE(MAX(value) FILTER (WHERE name = 'total_usage'), 0) FROM counters) AS total_usage,
+                (SELECT COALESCE(MAX(value) FILTER (WHERE name LIKE 'active:%'), 0) FROM counters) AS active_users,
+                (SELECT COALESCE(MAX(value) FILTER (WHERE name LIKE 'usage:%'), 0) FROM counters) AS month_usage,
+                (SELECT COALESCE(SUM(events), 0) FROM usage_rollup_hourly, today
+                 WHERE bucket >= date_trunc('hour', today.ts) - INTERVAL '23 hours') AS last_24h_usage,
+                (SELECT COALESCE(SUM(events), 0) FROM usage_rollup_daily, today
+                 WHERE day = today.ts::date) AS today_usage
         ''')
-        
-        return {
-            'total_users': total_users,
-            'premium_users': premium_users,
-            'total_usage': total_usage,
-            'active_users': active_users,
-            'today_usage': today_usage,
-            'month_usage': month_usage
-        }
+        return dict(row)
 
 # Global database instance
 db = Database()
@@ -131,20 +731,27 @@ db = Database()
 async def init_db():
     await db.connect()
 
+async def close_db():
+    await db.close()
+
 async def get_user(user_id: int):
-    return await db.get_user(user_id)
+    # Lewat cache profil; return UserProfile
+    from app.services.user_cache import user_cache
+    return await user_cache.get_user(user_id)
 
 async def get_all_users(limit: int = 100):
     return await db.get_all_users(limit)
 
 async def create_user(user_data: Dict[str, Any]):
-    return await db.create_user(user_data)
+    from app.services.user_cache import user_cache
+    return await user_cache.create_user(user_data)
 
 async def update_user_usage(user_id: int, action_type: str):
     return await db.update_user_usage(user_id, action_type)
 
 async def update_user_premium(user_id: int, is_premium: bool):
-    return await db.update_user_premium(user_id, is_premium)
+    from app.services.user_cache import user_cache
+    return await user_cache.update_user_premium(user_id, is_premium)
 
 async def get_usage_stats():
     return await db.get_usage_stats()
\ No newline at end of file
@@ -0,0 +1,204 @@
+import os
+import re
+import json
+import time
+import random
+import string
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Responder lokal untuk pesan trivial (salam, terima kasih, emoji) tanpa Gemini
+FAST_PATH_ENABLED = os.getenv('FAST_PATH_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# File JSON aturan (opsional), dibaca ulang otomatis saat berubah (mtime)
+FAST_PATH_RULES = os.getenv('FAST_PATH_RULES')
+FAST_PATH_RELOAD_INTERVAL = float(os.getenv('FAST_PATH_RELOAD_INTERVAL', '10'))
+
+DEFAULT_RULES = {
+    # Pesan lebih panjang dari ini selalu diteruskan ke AI
+    "max_length": 40,
+    # Kata tanya: pesan yang mengandungnya dianggap pertanyaan sungguhan
+    "question_words": [
+        "apa", "apakah", "bagaimana", "gimana", "kenapa", "mengapa", "siapa", "kapan",
+        "dimana", "di mana", "berapa", "mana", "jelaskan", "tolong", "bisakah", "bantu"
+    ],
+    "rules": [
+        {
+            "intent": "greeting",
+            "patterns": [
+                r"(ha+l+o+|ha+i+|hi+|he+y+|hel+o+|p+|pe+|permisi|punten|bro|gan|min|kak)( (bot|min|kak|gan|bro|semua))?",
+                r"(selamat )?(pagi|siang|sore|malam|malem)( (bot|min|kak|semua))?",
+                r"(assalamu ?['a]?alaikum|asw|ass?alamualaikum)( wr\.? ?wb\.?)?",
+                r"(om )?swastiastu|shalom|salam",
+            ],
+            "responses": [
+                "👋 Halo {name}! Kirim teks atau pertanyaan yang ingin dianalisis.",
+                "👋 Hai {name}! Ada yang bisa Trenbolt-Bot bantu analisis hari ini?",
+            ]
+        },
+        {
+            "intent": "thanks",
+            "patterns": [
+                r"(terima ?kasih|trima ?kasih|makasih|makasi|maacih|mksh|mks|thx|thanks?( you)?|tq|ty|tengkyu|nuhun|suwun|matur nuwun)( (banyak|ya|yaa*|bot|min|kak|gan|bro))*",
+            ],
+            "responses": [
+                "🙏 Sama-sama {name}!",
+                "😊 Sama-sama, senang bisa membantu!",
+            ]
+        },
+        {
+            "intent": "acknowledge",
+            "patterns": [
+                r"(ok+e*|oke+y?|okay|sip+|siap+|mantap+|mantul|baik|ya+|iya+|y|yoi|noted|paham|oh+|o+h+ (gitu|begitu)|oke deh|sip deh|good|nice|keren)( (deh|ya|min|kak|bot|gan|bro|banget|sekali))*",
+            ],
+            "responses": [
+                "👍 Siap {name}! Kirim teks kapan saja untuk dianalisis.",
+            ]
+        },
+        {
+            "intent": "farewell",
+            "patterns": [
+                r"(bye+|dada+h?|da+h+|sampai jumpa|sampai nanti|see you|cya|pamit|selamat tidur|met bobo)( (ya|dulu|bot|min|kak))*",
+            ],
+            "responses": [
+                "👋 Sampai jumpa {name}!",
+            ]
+        },
+        {
+            "intent": "laugh",
+            "patterns": [
+                r"(w+k+)+w*|(h+a+)+h*|(h+e+)+h*|(h+i+)+h*|lol|lmao|awokawok|anjay",
+            ],
+            "responses": [
+                "😄",
+                "😆 Ada yang lucu nih!",
+            ]
+        },
+        {
+            "intent": "emoji",
+            "patterns": [
+                r"[\U0001F000-\U0001FAFF\u2600-\u27BF\u2B00-\u2BFF\uFE0F\u200D ]+",
+            ],
+            "responses": [
+                "😊 Kirim teks atau pertanyaan untuk dianalisis ya!",
+            ]
+        },
+    ]
+}
+
+# Tanda baca di tepi pesan yang diabaikan saat pencocokan
+_EDGE_PUNCTUATION = ' \t\n.,!~-_*'
+_SPACES = re.compile(r'\s+')
+
+def _check_templates(intent: str, templates: list) -> list:
+    """Template hanya boleh memakai placeholder {name}; dicek saat aturan dimuat"""
+    if not templates:
+        raise ValueError(f"intent {intent} tidak punya responses")
+    for template in templates:
+        # parse() juga melempar ValueError untuk kurung kurawal yang tidak seimbang
+        for _, field, _, _ in string.Formatter().parse(template):
+            if field is not None and field != 'name':
+                raise ValueError(f"placeholder {{{field}}} tidak dikenal di template {intent}: {template!r}")
+    return templates
+
+class FastPathResponder:
+    """
+    Classifier murah di depan analisis AI. Semua pola digabung menjadi satu
+    regex (alternation dengan named group) yang dicompile sekali, dan pesan
+    harus cocok penuh (fullmatch) agar pertanyaan sungguhan tetap ke AI.
+    """
+
+    def __init__(self, rules_path: Optional[str] = FAST_PATH_RULES,
+                 reload_interval: float = FAST_PATH_RELOAD_INTERVAL):
+        self.rules_path = rules_path
+        self.reload_interval = reload_interval
+        self._mtime = None
+        self._next_check = 0.0
+        self.checked = 0
+        self.absorbed = 0
+        self.by_intent = {}
+        self.total_ns = 0
+        self._compile(DEFAULT_RULES)
+        self.maybe_reload(force=True)
+
+    def _compile(self, config: dict):
+        groups = []
+        intents = {}
+        responses = {}
+        for index, rule in enumerate(config['rules']):
+            group = f"r{index}"
+            intents[group] = rule['intent']
+            responses[rule['intent']] = _check_templates(rule['intent'], rule['responses'])
+            groups.append(f"(?P<{group}>{'|'.join(f'(?:{p})' for p in rule['patterns'])})")
+
+        question_words = '|'.join(re.escape(w) for w in config.get('question_words', []))
+
+        # Swap atomik setelah semua pola valid
+        self._automaton = re.compile('|'.join(groups), re.IGNORECASE)
+        self._question = re.compile(rf"\?|\b(?:{question_words})\b", re.IGNORECASE) if question_words else re.compile(r"\?")
+        self._intents = intents
+        self._responses = responses
+        self.max_length = int(config.get('max_length', DEFAULT_RULES['max_length']))
+
+    def maybe_reload(self, force: bool = False) -> bool:
+        """Baca ulang file aturan jika mtime berubah (dicek maksimal per interval)"""
+        if not self.rules_path:
+            return False
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return False
+        self._next_check = now + self.reload_interval
+
+        try:
+            mtime = os.stat(self.rules_path).st_mtime
+            if mtime == self._mtime:
+                return False
+            # Dicatat lebih dulu: file rusak dilaporkan sekali sampai diubah lagi
+            self._mtime = mtime
+            with open(self.rules_path, encoding='utf-8') as f:
+                config = json.load(f)
+            self._compile({**DEFAULT_RULES, **config})
+            logger.info(f"✅ Aturan fast-path dimuat dari {self.rules_path} ({len(self._intents)} intent)")
+            return True
+        except Exception as e:
+            # Aturan lama tetap dipakai jika file rusak/hilang
+            logger.error(f"❌ Gagal memuat aturan fast-path {self.rules_path}: {e}")
+            return False
+
+    def classify(self, text: str) -> Optional[str]:
+        """Intent trivial atau None jika pesan perlu dijawab AI"""
+        text = _SPACES.sub(' ', text.strip(_EDGE_PUNCTUATION))
+        if not text or len(text) > self.max_length or self._question.search(text):
+            return None
+        match = self._automaton.fullmatch(text)
+        if match is None:
+            return None
+        return self._intents[match.lastgroup]
+
+    def respond(self, text: str, name: Optional[str] = None) -> Optional[str]:
+        """Jawaban template untuk pesan trivial, None jika harus ke AI"""
+        self.maybe_reload()
+        started = time.perf_counter_ns()
+        intent = self.classify(text)
+        self.total_ns += time.perf_counter_ns() - started
+        self.checked += 1
+
+        if intent is None:
+            return None
+        self.absorbed += 1
+        self.by_intent[intent] = self.by_intent.get(intent, 0) + 1
+        return random.choice(self._responses[intent]).format(name=name or 'kak')
+
+    def stats(self) -> dict:
+        return {
+            'checked': self.checked,
+            'absorbed': self.absorbed,
+            'absorbed_rate': self.absorbed / self.checked if self.checked else 0.0,
+            'by_intent': dict(self.by_intent),
+            'avg_us': self.total_ns / self.checked / 1000 if self.checked else 0.0,
+            'rules_path': self.rules_path,
+        }
+
+# Global instance
+fast_path = FastPathResponder()
@@ -0,0 +1,273 @@
+import os
+import json
+import time
+import logging
+from collections import deque
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Kuota per key per model (per menit) dan lama key diistirahatkan setelah error kuota
+GEMINI_KEY_RPM = int(os.getenv('GEMINI_KEY_RPM', '15'))
+GEMINI_KEY_TPM = int(os.getenv('GEMINI_KEY_TPM', '1000000'))
+GEMINI_KEY_SIDELINE = float(os.getenv('GEMINI_KEY_SIDELINE', '60'))
+# Endpoint REST Gemini; bisa diarahkan ke server palsu lokal untuk menguji routing
+GEMINI_API_ENDPOINT = os.getenv('GEMINI_API_ENDPOINT', 'https://generativelanguage.googleapis.com')
+GEMINI_API_VERSION = 'v1beta'
+
+QUOTA_WINDOW = 60.0
+
+def load_api_keys() -> List[str]:
+    """Key dari GOOGLE_AI_STUDIO_API_KEYS (dipisah koma) plus GOOGLE_AI_STUDIO_API_KEY"""
+    keys = [k.strip() for k in os.getenv('GOOGLE_AI_STUDIO_API_KEYS', '').split(',') if k.strip()]
+    single = os.getenv('GOOGLE_AI_STUDIO_API_KEY')
+    if single and single not in keys:
+        keys.insert(0, single)
+    return keys
+
+def load_fallback_models() -> List[str]:
+    return [m.strip() for m in os.getenv('GEMINI_FALLBACK_MODELS', '').split(',') if m.strip()]
+
+class KeyPoolExhausted(Exception):
+    """Semua key sedang penuh kuota atau diistirahatkan"""
+
+class KeySlot:
+    """Satu pasangan (API key, model) dengan jendela kuota 60 detik"""
+
+    def __init__(self, api_key: str, model_name: str, model, rpm: int, tpm: int):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.model = model
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = deque()
+        # Entri [waktu, token]; token diperbarui dengan pemakaian sebenarnya
+        self._tokens = deque()
+        self._token_sum = 0
+        self.sidelined_until = 0.0
+        self.requests = 0
+        self.quota_errors = 0
+
+    @property
+    def label(self) -> str:
+        return f"***{self.api_key[-4:]}/{self.model_name.split('/')[-1]}"
+
+    def _prune(self, now: float):
+        cutoff = now - QUOTA_WINDOW
+        while self._requests and self._requests[0] <= cutoff:
+            self._requests.popleft()
+        while self._tokens and self._tokens[0][0] <= cutoff:
+            self._token_sum -= self._tokens.popleft()[1]
+
+    def has_capacity(self, now: float, tokens: int) -> bool:
+        if now < self.sidelined_until:
+            return False
+        self._prune(now)
+        return len(self._requests) < self.rpm and self._token_sum + tokens <= self.tpm
+
+    def record(self, now: float, tokens: int) -> list:
+        """Catat request dengan estimasi token; entri dipakai untuk rekonsiliasi"""
+        self._requests.append(now)
+        self.requests += 1
+        usage = [now, tokens]
+        self._tokens.append(usage)
+        self._token_sum += tokens
+        return usage
+
+    def reconcile(self, usage: list, tokens: int):
+        """Ganti estimasi token dengan jumlah sebenarnya dari usageMetadata"""
+        if tokens is None or tokens == usage[1]:
+            return
+        self._prune(time.monotonic())
+        # Entri yang sudah keluar dari jendela 60 detik tidak dihitung lagi
+        if self._tokens and usage[0] >= self._tokens[0][0]:
+            self._token_sum += tokens - usage[1]
+            usage[1] = tokens
+
+    def stats(self, now: float) -> dict:
+        self._prune(now)
+        return {
+            'key': self.label,
+            'rpm': len(self._requests),
+            'tpm': self._token_sum,
+            'requests': self.requests,
+            'quota_errors': self.quota_errors,
+            'sidelined': now < self.sidelined_until,
+        }
+
+class KeyPool:
+    """
+    Round-robin antar API key dengan routing sadar kuota (RPM/TPM per key).
+    Slot model utama selalu dicoba lebih dulu; model fallback hanya dipakai
+    jika semua key model utama penuh atau diistirahatkan.
+    """
+
+    def __init__(self, slots_by_model: List[List[KeySlot]], sideline_seconds: float = GEMINI_KEY_SIDELINE):
+        self.tiers = [tier for tier in slots_by_model if tier]
+        self.sideline_seconds = sideline_seconds
+        self._cursors = [0] * len(self.tiers)
+        self.exhausted = 0
+
+    def __len__(self) -> int:
+        return sum(len(tier) for tier in self.tiers)
+
+    def acquire(self, tokens: int, exclude=()) -> Tuple[KeySlot, list]:
+        """Pilih slot dengan kuota tersisa; kembalikan slot dan entri pemakaian token"""
+        now = time.monotonic()
+        for index, tier in enumerate(self.tiers):
+            start = self._cursors[index]
+            for offset in range(len(tier)):
+                slot = tier[(start + offset) % len(tier)]
+                if slot in exclude or not slot.has_capacity(now, tokens):
+                    continue
+                self._cursors[index] = (start + offset + 1) % len(tier)
+                return slot, slot.record(now, tokens)
+
+        self.exhausted += 1
+        raise KeyPoolExhausted("Semua API key Gemini sedang penuh kuota")
+
+    def sideline(self, slot: KeySlot, seconds: Optional[float] = None):
+        slot.quota_errors += 1
+        slot.sidelined_until = time.monotonic() + (seconds or self.sideline_seconds)
+        logger.warning(f"⚠️ Key {slot.label} diistirahatkan {seconds or self.sideline_seconds:.0f}s (quota error)")
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            'keys': [slot.stats(now) for tier in self.tiers for slot in tier],
+            'exhausted': self.exhausted,
+        }
+
+def is_quota_error(exc: BaseException) -> bool:
+    return getattr(exc, 'code', None) == 429 or 'ResourceExhausted' in type(exc).__name__
+
+class GeminiAPIError(Exception):
+    """Error HTTP dari REST API Gemini (code = status HTTP)"""
+
+    def __init__(self, code: int, message: str, status: str = ''):
+        super().__init__(f"{code} {status}: {message}" if status else f"{code}: {message}")
+        self.code = code
+        self.status = status
+
+class GeminiResponse:
+    """Respons generateContent (satu chunk saat streaming) dengan atribut .text seperti SDK"""
+
+    __slots__ = ('raw', 'text', 'total_tokens')
+
+    def __init__(self, raw: dict):
+        self.raw = raw
+        candidates = raw.get('candidates') or [{}]
+        parts = (candidates[0].get('content') or {}).get('parts') or []
+        self.text = ''.join(part.get('text', '') for part in parts)
+        # Token prompt + output menurut server (kumulatif saat streaming)
+        self.total_tokens = (raw.get('usageMetadata') or {}).get('totalTokenCount')
+
+class GeminiStream:
+    """Chunk streamGenerateContent (SSE), dibaca per baris tanpa menampung seluruh body"""
+
+    def __init__(self, response):
+        self._response = response
+        self.total_tokens = None
+        # Dipanggil dengan total token tiap kali usageMetadata chunk berubah
+        self.on_usage = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> GeminiResponse:
+        while True:
+            line = await self._response.content.readline()
+            if not line:
+                await self.aclose()
+                raise StopAsyncIteration
+            line = line.strip()
+            if line.startswith(b'data:'):
+                chunk = GeminiResponse(json.loads(line[5:]))
+                if chunk.total_tokens is not None and chunk.total_tokens != self.total_tokens:
+                    self.total_tokens = chunk.total_tokens
+                    if self.on_usage is not None:
+                        self.on_usage(chunk.total_tokens)
+                return chunk
+
+    async def aclose(self):
+        self._response.release()
+
+_session = None
+
+def _http_session():
+    # Satu session (connection pool) bersama untuk semua key; dibuat di dalam event loop
+    global _session
+    if _session is None or _session.closed:
+        import aiohttp
+        _session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None, sock_connect=10))
+    return _session
+
+async def close_http_session():
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+def _camel(name: str) -> str:
+    head, *rest = name.split('_')
+    return head + ''.join(word.title() for word in rest)
+
+class GeminiModel:
+    """
+    Model Gemini untuk satu API key lewat REST API publik (generateContent /
+    streamGenerateContent). Antarmukanya mengikuti GenerativeModel
+    (generate_content_async, .text), tapi tiap key punya kredensial sendiri
+    tanpa menyentuh konfigurasi global SDK.
+    """
+
+    def __init__(self, model_name: str, api_key: str, endpoint: str = None):
+        self.model_name = model_name if '/' in model_name else f"models/{model_name}"
+        self.api_key = api_key
+        self.endpoint = (endpoint or GEMINI_API_ENDPOINT).rstrip('/')
+
+    def _url(self, method: str) -> str:
+        return f"{self.endpoint}/{GEMINI_API_VERSION}/{self.model_name}:{method}"
+
+    async def _post(self, method: str, prompt: str, generation_config: Optional[dict], params=None):
+        body = {'contents': [{'role': 'user', 'parts': [{'text': prompt}]}]}
+        if generation_config:
+            body['generationConfig'] = {_camel(key): value for key, value in generation_config.items()}
+
+        response = await _http_session().post(
+            self._url(method), json=body, params=params, headers={'x-goog-api-key': self.api_key}
+        )
+        if response.status >= 400:
+            try:
+                error = (await response.json(content_type=None)).get('error', {})
+            except ValueError:
+                error = {}
+            finally:
+                response.release()
+            raise GeminiAPIError(response.status, error.get('message', response.reason), error.get('status', ''))
+        return response
+
+    async def generate_content_async(self, prompt: str, generation_config: Optional[dict] = None,
+                                     stream: bool = False):
+        if stream:
+            response = await self._post('streamGenerateContent', prompt, generation_config, {'alt': 'sse'})
+            return GeminiStream(response)
+
+        response = await self._post('generateContent', prompt, generation_config)
+        try:
+            return GeminiResponse(await response.json())
+        finally:
+            response.release()
+
+def build_model(model_name: str, api_key: str) -> GeminiModel:
+    """Model dengan kredensial milik key sendiri"""
+    return GeminiModel(model_name, api_key)
+
+def build_key_pool(api_keys: List[str], model_names: List[str],
+                   rpm: int = GEMINI_KEY_RPM, tpm: int = GEMINI_KEY_TPM) -> KeyPool:
+    tiers = []
+    for model_name in model_names:
+        tiers.append([
+            KeySlot(key, model_name, build_model(model_name, key), rpm, tpm)
+            for key in api_keys
+        ])
+    return KeyPool(tiers)
@@ -0,0 +1,58 @@
+import os
+import asyncio
+import logging
+from typing import Optional
+
+from app.services.database import db
+
+logger = logging.getLogger(__name__)
+
+# Interval job maintenance partisi user_usage (detik)
+MAINTENANCE_INTERVAL = float(os.getenv('MAINTENANCE_INTERVAL', str(6 * 3600)))
+# Transkripsi yang tidak dipakai selama ini (hari) dihapus dari cache DB
+TRANSCRIPT_RETENTION_DAYS = int(os.getenv('TRANSCRIPT_RETENTION_DAYS', '90'))
+
+class MaintenanceJob:
+    """Job periodik: partisi ke depan, retensi dan kompaksi user_usage, pruning cache transkripsi"""
+
+    def __init__(self, database=db, interval: float = MAINTENANCE_INTERVAL):
+        self.database = database
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self.last_result = None
+
+    async def run_once(self):
+        if not self.database.is_connected:
+            return
+        try:
+            self.last_result = await self.database.maintain_partitions()
+        except Exception as e:
+            logger.error(f"❌ Error maintenance partisi: {e}")
+        try:
+            pruned = await self.database.prune_transcripts(TRANSCRIPT_RETENTION_DAYS)
+            if pruned:
+                logger.info(f"🧹 {pruned} transkripsi lama dihapus dari cache")
+        except Exception as e:
+            logger.error(f"❌ Error pruning cache transkripsi: {e}")
+
+    async def _run(self):
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info("✅ Maintenance job berjalan")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# Global job instance
+maintenance_job = MaintenanceJob()
@@ -0,0 +1,326 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional
+from app.utils.metrics import LatencyWindow
+
+logger = logging.getLogger(__name__)
+
+# AIMD: batas concurrency Gemini menyesuaikan latency dan error rate
+AI_MIN_CONCURRENT = int(os.getenv('AI_MIN_CONCURRENT', '1'))
+AI_LATENCY_TARGET = float(os.getenv('AI_LATENCY_TARGET', '8'))
+AI_SLOT_WAIT = float(os.getenv('AI_SLOT_WAIT', '3'))
+
+# Circuit breaker
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', '5'))
+BREAKER_ERROR_RATE = float(os.getenv('BREAKER_ERROR_RATE', '0.5'))
+BREAKER_WINDOW = int(os.getenv('BREAKER_WINDOW', '20'))
+BREAKER_RESET_TIMEOUT = float(os.getenv('BREAKER_RESET_TIMEOUT', '30'))
+
+# Hedging: kirim duplikat setelah persentil latency ini (0 = mati), maksimal
+# AI_HEDGE_BUDGET request tambahan per request utama
+AI_HEDGE_PERCENTILE = float(os.getenv('AI_HEDGE_PERCENTILE', '95'))
+AI_HEDGE_BUDGET = float(os.getenv('AI_HEDGE_BUDGET', '0.05'))
+AI_HEDGE_MIN_SAMPLES = int(os.getenv('AI_HEDGE_MIN_SAMPLES', '20'))
+
+# Status HTTP dari upstream yang dianggap gangguan (bukan kesalahan request)
+UPSTREAM_FAILURE_CODES = {429, 500, 502, 503, 504}
+# Status gRPC yang setara dengan kode HTTP di atas
+GRPC_HTTP_CODES = {'RESOURCE_EXHAUSTED': 429, 'INTERNAL': 500, 'UNAVAILABLE': 503, 'DEADLINE_EXCEEDED': 504}
+
+class CircuitOpenError(Exception):
+    """Upstream sedang tidak sehat; panggilan ditolak tanpa menunggu"""
+
+class OverloadedError(Exception):
+    """Tidak ada slot concurrency dalam batas waktu tunggu"""
+
+def is_upstream_failure(exc: BaseException) -> bool:
+    if isinstance(exc, (asyncio.TimeoutError, OSError)):
+        return True
+    code = getattr(exc, 'code', None)
+    if callable(code):  # grpc error: code() -> StatusCode
+        status = code()
+        code = GRPC_HTTP_CODES.get(getattr(status, 'name', str(status)))
+    return code in UPSTREAM_FAILURE_CODES
+
+class AdaptiveLimiter:
+    """
+    Batas concurrency AIMD: naik +1/limit per request sukses yang cepat,
+    turun setengah saat error atau latency melewati target (maksimal sekali
+    per jendela latency target agar tidak turun beruntun).
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = AI_MIN_CONCURRENT,
+                 latency_target: float = AI_LATENCY_TARGET, slot_wait: float = AI_SLOT_WAIT):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.latency_target = latency_target
+        self.slot_wait = slot_wait
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self._changed = asyncio.Condition()
+        self._last_decrease = 0.0
+        self.rejected = 0
+
+    def on_success(self, latency: float):
+        if latency > self.latency_target:
+            self._decrease()
+        else:
+            self.limit = min(self.limit + 1 / self.limit, float(self.max_limit))
+
+    def on_failure(self):
+        self._decrease()
+
+    def _decrease(self):
+        now = time.monotonic()
+        if now - self._last_decrease < self.latency_target:
+            return
+        self._last_decrease = now
+        self.limit = max(self.limit / 2, float(self.min_limit))
+        logger.warning(f"⚠️ Batas concurrency AI turun ke {int(self.limit)}")
+
+    async def _acquire(self):
+        async with self._changed:
+            try:
+                await asyncio.wait_for(
+                    self._changed.wait_for(lambda: self.in_flight < int(self.limit)),
+                    timeout=self.slot_wait
+                )
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise OverloadedError(f"AI sibuk ({self.in_flight} request berjalan)")
+            self.in_flight += 1
+
+    async def _release(self):
+        async with self._changed:
+            self.in_flight -= 1
+            self._changed.notify_all()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self._acquire()
+        try:
+            yield
+        finally:
+            await self._release()
+
+    def stats(self) -> dict:
+        return {
+            'limit': int(self.limit),
+            'max_limit': self.max_limit,
+            'in_flight': self.in_flight,
+            'rejected': self.rejected,
+        }
+
+class CircuitBreaker:
+    """Closed -> open (gangguan) -> half-open (satu probe) -> closed"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 error_rate: float = BREAKER_ERROR_RATE, window: int = BREAKER_WINDOW,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.error_rate = error_rate
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.trips = 0
+        self.short_circuited = 0
+
+    @property
+    def is_open(self) -> bool:
+        """True jika request saat ini pasti ditolak (tanpa memakai jatah probe)"""
+        if self.state == self.OPEN:
+            return time.monotonic() - self._opened_at < self.reset_timeout
+        return self.state == self.HALF_OPEN and self._probe_in_flight
+
+    def before_call(self):
+        if self.state == self.CLOSED:
+            return
+        if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+            logger.info("🔌 Circuit breaker AI half-open, mengirim probe")
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return
+        self.short_circuited += 1
+        raise CircuitOpenError("AI sedang gangguan, menggunakan analisis dasar")
+
+    def record_success(self):
+        self._outcomes.append(True)
+        self.consecutive_failures = 0
+        if self.state != self.CLOSED:
+            logger.info("✅ Circuit breaker AI kembali closed")
+        self.state = self.CLOSED
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self._outcomes.append(False)
+        self.consecutive_failures += 1
+
+        if self.state == self.HALF_OPEN:
+            self._trip()
+            return
+
+        failures = self._outcomes.count(False)
+        rate_exceeded = (len(self._outcomes) >= self._outcomes.maxlen // 2
+                         and failures / len(self._outcomes) >= self.error_rate)
+        if self.consecutive_failures >= self.failure_threshold or rate_exceeded:
+            self._trip()
+
+    def record_ignored(self):
+        # Error bukan dari upstream (mis. prompt ditolak): lepaskan jatah probe saja
+        self._probe_in_flight = False
+
+    def _trip(self):
+        if self.state != self.OPEN:
+            self.trips += 1
+            logger.error(f"🔌 Circuit breaker AI terbuka selama {self.reset_timeout:.0f}s")
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+        self._outcomes.clear()
+
+    def stats(self) -> dict:
+        return {
+            'state': self.state,
+            'consecutive_failures': self.consecutive_failures,
+            'trips': self.trips,
+            'short_circuited': self.short_circuited,
+        }
+
+class _CallTimer:
+    __slots__ = ('started', 'latency')
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.latency = None
+
+    def mark(self):
+        """Tandai latency lebih awal (mis. saat chunk stream pertama tiba)"""
+        if self.latency is None:
+            self.latency = time.monotonic() - self.started
+
+@asynccontextmanager
+async def guarded_call(breaker: CircuitBreaker, limiter: AdaptiveLimiter):
+    """Jalankan satu panggilan upstream lewat breaker dan limiter AIMD"""
+    breaker.before_call()
+    try:
+        async with limiter.slot():
+            timer = _CallTimer()
+            yield timer
+            timer.mark()
+    except Exception as e:
+        if is_upstream_failure(e):
+            breaker.record_failure()
+            limiter.on_failure()
+        else:
+            breaker.record_ignored()
+        raise
+    except BaseException:
+        # Dibatalkan/ditutup oleh pemanggil: bukan sinyal kesehatan upstream
+        breaker.record_ignored()
+        raise
+    breaker.record_success()
+    limiter.on_success(timer.latency)
+
+class HedgePolicy:
+    """
+    Kapan request duplikat boleh dikirim: setelah persentil latency terakhir,
+    dengan budget token (tiap request utama menambah `budget`, satu hedge
+    memakai 1 token) sehingga request tambahan tetap di bawah ~budget.
+    """
+
+    def __init__(self, percentile: float = AI_HEDGE_PERCENTILE, budget: float = AI_HEDGE_BUDGET,
+                 min_samples: int = AI_HEDGE_MIN_SAMPLES, max_tokens: float = 10.0):
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.max_tokens = max_tokens
+        self.latency = LatencyWindow()
+        self._tokens = 0.0
+        self.requests = 0
+        self.hedges = 0
+        self.denied = 0
+        self.wins = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.percentile > 0 and self.budget > 0
+
+    def delay(self) -> Optional[float]:
+        """Jeda sebelum hedge, None jika hedging mati atau sampel belum cukup"""
+        if not self.enabled or self.latency.count < self.min_samples:
+            return None
+        return self.latency.percentile(self.percentile)
+
+    def on_request(self):
+        self.requests += 1
+        self._tokens = min(self._tokens + self.budget, self.max_tokens)
+
+    def try_hedge(self) -> bool:
+        if self._tokens < 1:
+            self.denied += 1
+            return False
+        self._tokens -= 1
+        self.hedges += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            'enabled': self.enabled,
+            'delay': self.delay(),
+            'requests': self.requests,
+            'hedges': self.hedges,
+            'denied': self.denied,
+            'wins': self.wins,
+            'hedge_rate': self.hedges / self.requests if self.requests else 0.0,
+        }
+
+async def hedged(factory, policy: HedgePolicy):
+    """
+    Jalankan factory(); jika belum selesai setelah policy.delay(), kirim satu
+    duplikat. Hasil sukses pertama menang, sisanya dibatalkan.
+    """
+    policy.on_request()
+    delay = policy.delay()
+    started = time.monotonic()
+    primary = asyncio.ensure_future(factory())
+    tasks = [primary]
+
+    try:
+        if delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and policy.try_hedge():
+                logger.info(f"🪃 Hedge request AI setelah {delay:.2f}s")
+                tasks.append(asyncio.ensure_future(factory()))
+
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.cancelled():
+                    continue
+                if task.exception() is None:
+                    # Latency request utama (batas bawah jika hedge yang menang)
+                    policy.latency.add(time.monotonic() - started)
+                    if task is not primary:
+                        policy.wins += 1
+                    return task.result()
+                error = error or task.exception()
+        raise error or asyncio.CancelledError()
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,185 @@
+import os
+import re
+import hashlib
+import logging
+from array import array
+from typing import Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Konfigurasi index near-duplicate
+NEAR_DUP_CAPACITY = int(os.getenv('NEAR_DUP_CAPACITY', '20000'))
+NEAR_DUP_MAX_DISTANCE = int(os.getenv('NEAR_DUP_MAX_DISTANCE', '3'))
+NEAR_DUP_MIN_TOKENS = int(os.getenv('NEAR_DUP_MIN_TOKENS', '4'))
+
+FINGERPRINT_BITS = 64
+
+# Emoji, tanda baca dan spasi berlebih tidak ikut dalam fingerprint
+_non_word = re.compile(r'[^\w\s]+|_')
+
+try:
+    _popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def _popcount(value: int) -> int:
+        return bin(value).count('1')
+
+def tokenize(text: str) -> list:
+    return _non_word.sub(' ', text.lower()).split()
+
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little'
+    )
+
+def simhash(tokens: list) -> int:
+    """Fingerprint SimHash 64-bit dari unigram + bigram"""
+    weights = [0] * FINGERPRINT_BITS
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    for feature in features:
+        h = _feature_hash(feature)
+        for i in range(FINGERPRINT_BITS):
+            if h >> i & 1:
+                weights[i] += 1
+            else:
+                weights[i] -= 1
+
+    fingerprint = 0
+    for i, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << i
+    return fingerprint
+
+def hamming_distance(a: int, b: int) -> int:
+    return _popcount(a ^ b)
+
+class SimHashIndex:
+    """
+    Index fingerprint terbatas (ring buffer) dengan lookup berbasis band.
+    Dengan jarak maksimum k, fingerprint dibagi k+1 band; dua fingerprint
+    yang berjarak <= k pasti identik di minimal satu band (pigeonhole),
+    sehingga lookup hanya memeriksa isi k+1 bucket.
+    """
+
+    def __init__(self, capacity: int = NEAR_DUP_CAPACITY, max_distance: int = NEAR_DUP_MAX_DISTANCE):
+        self.capacity = capacity
+        self.max_distance = max_distance
+        self._fingerprints = array('Q', [0]) * capacity
+        self._values = [None] * capacity
+        self._next = 0
+        self._size = 0
+
+        band_count = max_distance + 1
+        width, extra = divmod(FINGERPRINT_BITS, band_count)
+        self._bands = []
+        shift = 0
+        for i in range(band_count):
+            bits = width + (1 if i < extra else 0)
+            self._bands.append((shift, (1 << bits) - 1))
+            shift += bits
+        self._tables = [{} for _ in self._bands]
+
+        self.lookups = 0
+        self.matches = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, fingerprint: int, value: Any = None):
+        slot = self._next
+        if self._size == self.capacity:
+            self._unlink(slot)
+        else:
+            self._size += 1
+
+        self._fingerprints[slot] = fingerprint
+        self._values[slot] = value
+        for (shift, mask), table in zip(self._bands, self._tables):
+            band = fingerprint >> shift & mask
+            bucket = table.get(band)
+            if bucket is None:
+                table[band] = array('I', [slot])
+            else:
+                bucket.append(slot)
+
+        self._next = (slot + 1) % self.capacity
+
+    def _unlink(self, slot: int):
+        fingerprint = self._fingerprints[slot]
+        for (shift, mask), table in zip(self._bands, self._tables):
+            band = fingerprint >> shift & mask
+            bucket = table[band]
+            bucket.remove(slot)
+            if not bucket:
+                del table[band]
+        self._values[slot] = None
+
+    def lookup(self, fingerprint: int) -> Optional[Tuple[int, Any]]:
+        """Cari entry terdekat dalam max_distance, return (jarak, value)"""
+        self.lookups += 1
+        best = None
+        fingerprints = self._fingerprints
+
+        for (shift, mask), table in zip(self._bands, self._tables):
+            bucket = table.get(fingerprint >> shift & mask)
+            if not bucket:
+                continue
+            for slot in bucket:
+                distance = _popcount(fingerprints[slot] ^ fingerprint)
+                if distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, slot)
+                    if distance == 0:
+                        break
+
+        if best is None:
+            return None
+        self.matches += 1
+        return best[0], self._values[best[1]]
+
+    def clear(self):
+        self._tables = [{} for _ in self._bands]
+        self._values = [None] * self.capacity
+        self._next = 0
+        self._size = 0
+
+    def stats(self) -> dict:
+        return {
+            'size': self._size,
+            'capacity': self.capacity,
+            'lookups': self.lookups,
+            'matches': self.matches,
+        }
+
+class NearDuplicateIndex:
+    """Index prompt yang baru dijawab untuk menyajikan ulang analisis serupa"""
+
+    def __init__(self, capacity: int = NEAR_DUP_CAPACITY, max_distance: int = NEAR_DUP_MAX_DISTANCE,
+                 min_tokens: int = NEAR_DUP_MIN_TOKENS):
+        self.index = SimHashIndex(capacity, max_distance)
+        self.min_tokens = min_tokens
+
+    def fingerprint(self, text: str) -> Optional[int]:
+        tokens = tokenize(text)
+        # Teks terlalu pendek terlalu mudah bertabrakan; serahkan ke cache exact
+        if len(tokens) < self.min_tokens:
+            return None
+        return simhash(tokens)
+
+    def get(self, fingerprint: Optional[int]) -> Optional[str]:
+        if fingerprint is None:
+            return None
+        match = self.index.lookup(fingerprint)
+        return match[1] if match else None
+
+    def add(self, fingerprint: Optional[int], analysis: str):
+        if fingerprint is not None:
+            self.index.add(fingerprint, analysis)
+
+    def clear(self):
+        self.index.clear()
+
+    def stats(self) -> dict:
+        return self.index.stats()
+
+# Global index instance
+near_duplicates = NearDuplicateIndex()
@@ -0,0 +1,289 @@
+import os
+import sys
+import json
+import shutil
+import zipfile
+import tempfile
+import urllib.request
+import time
+import zlib
+import asyncio
+import logging
+import importlib.util
+import multiprocessing
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, List, Optional, Tuple
+
+from app.services.audio_pipeline import AUDIO_SAMPLE_RATE, AUDIO_SAMPLE_WIDTH, PcmAudio
+from app.utils.metrics import LatencyWindow
+
+logger = logging.getLogger(__name__)
+
+# Engine STT: 'vosk' (offline, CPU) atau 'stub' (deterministik, untuk test)
+STT_ENGINE = os.getenv('STT_ENGINE', 'vosk')
+VOSK_MODEL_PATH = os.getenv('VOSK_MODEL_PATH', 'models/vosk-model-small-id')
+# Arsip zip model Vosk (https://alphacephei.com/vosk/models) yang diunduh saat build
+VOSK_MODEL_URL = os.getenv('VOSK_MODEL_URL', '')
+# Jumlah proses worker transkripsi. Tiap worker memuat model Vosk sendiri,
+# jadi memori naik per worker; naikkan lewat env jika RAM container cukup
+STT_WORKERS = int(os.getenv('STT_WORKERS', str(min(2, os.cpu_count() or 1))))
+# Target dan batas panjang potongan audio; potongan dipotong di jeda hening
+STT_CHUNK_SECONDS = float(os.getenv('STT_CHUNK_SECONDS', '20'))
+STT_MAX_CHUNK_SECONDS = float(os.getenv('STT_MAX_CHUNK_SECONDS', '30'))
+STT_MIN_SILENCE_MS = int(os.getenv('STT_MIN_SILENCE_MS', '300'))
+
+FRAME_MS = 30
+# Frame dianggap hening jika energinya di bawah fraksi ini dari persentil 95
+SILENCE_RATIO = 0.1
+SILENCE_FLOOR = 100
+
+class STTEngine:
+    """Antarmuka engine STT; transcribe() dijalankan di proses worker"""
+
+    name = 'base'
+    version = '0'
+
+    def available(self) -> bool:
+        return True
+
+    def load(self):
+        """Muat model (sekali per proses worker)"""
+
+    def transcribe(self, pcm: bytes, sample_rate: int = AUDIO_SAMPLE_RATE) -> str:
+        raise NotImplementedError
+
+class VoskEngine(STTEngine):
+    """Engine offline berbasis Vosk/Kaldi (dependency opsional: pip install vosk)"""
+
+    name = 'vosk'
+
+    def __init__(self, model_path: str = VOSK_MODEL_PATH):
+        self.model_path = model_path
+        self.version = os.path.basename(os.path.normpath(model_path))
+        self._model = None
+
+    def available(self) -> bool:
+        return importlib.util.find_spec('vosk') is not None and os.path.isdir(self.model_path)
+
+    def load(self):
+        import vosk
+        vosk.SetLogLevel(-1)
+        self._model = vosk.Model(self.model_path)
+
+    def transcribe(self, pcm: bytes, sample_rate: int = AUDIO_SAMPLE_RATE) -> str:
+        import vosk
+        if self._model is None:
+            self.load()
+        recognizer = vosk.KaldiRecognizer(self._model, sample_rate)
+        recognizer.AcceptWaveform(pcm)
+        return json.loads(recognizer.FinalResult()).get('text', '')
+
+class StubEngine(STTEngine):
+    """Engine deterministik untuk test: teks bergantung isi audio, tanpa model"""
+
+    name = 'stub'
+    version = '1'
+
+    def __init__(self, cost: float = 0.0):
+        # Simulasi beban CPU: detik kerja per detik audio (untuk benchmark)
+        self.cost = cost
+
+    def transcribe(self, pcm: bytes, sample_rate: int = AUDIO_SAMPLE_RATE) -> str:
+        duration = len(pcm) / (AUDIO_SAMPLE_WIDTH * sample_rate)
+        deadline = time.process_time() + duration * self.cost
+        while time.process_time() < deadline:
+            pass
+        return f"[{duration:.1f}s {zlib.crc32(pcm):08x}]"
+
+ENGINES = {engine.name: engine for engine in (VoskEngine, StubEngine)}
+
+# State engine di dalam proses worker
+_worker_engine: Optional[STTEngine] = None
+
+def _init_worker(engine_name: str, options: dict):
+    global _worker_engine
+    _worker_engine = ENGINES[engine_name](**options)
+    _worker_engine.load()
+
+def _transcribe_chunk(pcm: bytes, sample_rate: int) -> str:
+    return _worker_engine.transcribe(pcm, sample_rate).strip()
+
+def _frame_energy(samples: array, frame: int) -> List[int]:
+    # Rata-rata |amplitudo| dari tiap sampel ke-4: cukup untuk deteksi hening, 4x lebih murah
+    step = 4
+    return [
+        sum(map(abs, samples[start:start + frame:step])) * step // frame
+        for start in range(0, len(samples), frame)
+    ]
+
+def split_on_silence(pcm: bytes, sample_rate: int = AUDIO_SAMPLE_RATE,
+                     target_seconds: float = STT_CHUNK_SECONDS, max_seconds: float = STT_MAX_CHUNK_SECONDS,
+                     min_silence_ms: int = STT_MIN_SILENCE_MS) -> List[Tuple[int, int]]:
+    """
+    Potong PCM s16le menjadi rentang byte (start, end). Setelah potongan
+    mencapai target, potong di tengah jeda hening pertama; jika tidak ada
+    jeda sampai batas maksimal, potong paksa.
+    """
+    samples = array('h')
+    samples.frombytes(pcm[:len(pcm) - len(pcm) % AUDIO_SAMPLE_WIDTH])
+    frame = sample_rate * FRAME_MS // 1000
+    energies = _frame_energy(samples, frame)
+    if not energies:
+        return []
+
+    ordered = sorted(energies)
+    threshold = max(SILENCE_FLOOR, ordered[int(0.95 * (len(ordered) - 1))] * SILENCE_RATIO)
+    target = int(target_seconds * 1000 / FRAME_MS)
+    limit = int(max_seconds * 1000 / FRAME_MS)
+    min_silence = max(1, min_silence_ms // FRAME_MS)
+
+    cuts = []
+    start = 0
+    silent_run = 0
+    for index, energy in enumerate(energies):
+        silent_run = silent_run + 1 if energy < threshold else 0
+        length = index + 1 - start
+        if length >= target and silent_run >= min_silence:
+            # Potong di dalam jeda (bukan di awal jeda panjang yang sudah lewat)
+            cut = index + 1 - min_silence // 2
+            cuts.append((start, cut))
+            start = cut
+            silent_run = 0
+        elif length >= limit:
+            cuts.append((start, index + 1))
+            start = index + 1
+            silent_run = 0
+    if start < len(energies):
+        cuts.append((start, len(energies)))
+
+    frame_bytes = frame * AUDIO_SAMPLE_WIDTH
+    return [(a * frame_bytes, min(b * frame_bytes, len(pcm))) for a, b in cuts]
+
+class Transcriber:
+    """
+    Transkripsi audio panjang: dipotong di jeda hening, potongan dikerjakan
+    paralel di process pool, hasil dikirim berurutan begitu tersedia.
+    """
+
+    def __init__(self, engine_name: str = STT_ENGINE, workers: int = STT_WORKERS, **engine_options):
+        self.engine_name = engine_name
+        self.engine_options = engine_options
+        self.workers = max(1, workers)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.chunks = 0
+        self.latency = LatencyWindow()
+
+    @property
+    def engine(self):
+        return ENGINES.get(self.engine_name)
+
+    @property
+    def is_available(self) -> bool:
+        engine = self.engine
+        return engine is not None and engine(**self.engine_options).available()
+
+    @property
+    def version(self) -> str:
+        """Identitas engine + model (untuk kunci cache transkripsi)"""
+        engine = self.engine(**self.engine_options)
+        return f"{engine.name}:{engine.version}"
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: worker tidak mewarisi event loop/thread milik proses bot
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.engine_name, self.engine_options),
+            )
+            logger.info(f"✅ STT {self.engine_name}: {self.workers} worker")
+        return self._pool
+
+    async def stream(self, audio: PcmAudio) -> AsyncIterator[str]:
+        """Teks per potongan, berurutan, segera setelah potongan sebelumnya selesai"""
+        started = time.monotonic()
+        loop = asyncio.get_running_loop()
+        executor = self._executor()
+        futures = []
+
+        try:
+            # Submit juga di dalam try: pool yang worker-nya mati saat idle
+            # langsung melempar BrokenProcessPool di sini
+            # Deteksi hening (~200 ms per 10 menit audio) di thread, bukan di event loop
+            cuts = await loop.run_in_executor(None, split_on_silence, audio.pcm, audio.sample_rate)
+            for start, end in cuts:
+                futures.append(loop.run_in_executor(
+                    executor, _transcribe_chunk, audio.pcm[start:end], audio.sample_rate
+                ))
+            self.chunks += len(futures)
+
+            for future in futures:
+                text = await future
+                if text:
+                    yield text
+        except BrokenProcessPool:
+            # Worker mati (mis. OOM): pool baru dibuat pada request berikutnya
+            if self._pool is executor:
+                self._pool = None
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            # Pemanggil berhenti/error: potongan yang belum mulai tidak dikerjakan
+            for future in futures:
+                future.cancel()
+        self.latency.add(time.monotonic() - started)
+
+    async def transcribe(self, audio: PcmAudio) -> str:
+        return ' '.join([text async for text in self.stream(audio)])
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        return {
+            'engine': self.engine_name,
+            'available': self.is_available,
+            'workers': self.workers,
+            'chunks': self.chunks,
+            'latency': self.latency.summary(),
+        }
+
+def download_model(url: str = VOSK_MODEL_URL, path: str = VOSK_MODEL_PATH) -> bool:
+    """Unduh dan ekstrak model Vosk ke VOSK_MODEL_PATH (dilewati jika sudah ada)"""
+    if os.path.isdir(path):
+        logger.info(f"✅ Model Vosk sudah ada di {path}")
+        return True
+    if not url:
+        logger.warning("⚠️ VOSK_MODEL_URL tidak diisi, transkripsi audio tidak aktif")
+        return False
+
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    logger.info(f"⬇️ Mengunduh model Vosk dari {url}")
+    with tempfile.TemporaryDirectory(dir=parent) as workdir:
+        archive_path = os.path.join(workdir, 'model.zip')
+        urllib.request.urlretrieve(url, archive_path)
+        extracted = os.path.join(workdir, 'model')
+        with zipfile.ZipFile(archive_path) as archive:
+            archive.extractall(extracted)
+        # Arsip resmi berisi satu folder model di dalamnya
+        entries = os.listdir(extracted)
+        source = os.path.join(extracted, entries[0]) if len(entries) == 1 else extracted
+        shutil.move(source, path)
+    logger.info(f"✅ Model Vosk tersimpan di {path}")
+    return True
+
+# Global instance
+transcriber = Transcriber()
+
+if __name__ == '__main__':
+    # Langkah build: python -m app.services.stt download
+    logging.basicConfig(level=logging.INFO)
+    if sys.argv[1:] != ['download']:
+        sys.exit("Gunakan: python -m app.services.stt download")
+    download_model()
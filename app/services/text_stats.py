@@ -0,0 +1,137 @@
+import os
+import re
+import math
+import heapq
+import logging
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Jumlah kata kunci dan ukuran tabel document frequency (DF)
+TEXT_KEYWORDS = int(os.getenv('TEXT_KEYWORDS', '8'))
+TEXT_DF_MAX_TERMS = int(os.getenv('TEXT_DF_MAX_TERMS', '50000'))
+
+MIN_KEYWORD_LENGTH = 3
+
+# Stopword bahasa Indonesia (plus bahasa gaul dan beberapa kata Inggris umum)
+STOPWORDS = frozenset('''
+ada adalah adanya agar akan akhirnya aku akulah amat anda andalah antara apa apakah apalagi atas atau
+ataukah ataupun awal bagai bagaimana bagi bahkan bahwa bahwasanya baik banyak barangkali baru bawah
+beberapa begini begitu belum benar berada berapa berikut bersama betul biasa biasanya bila bilamana
+bisa boleh buat bukan bukankah bukanlah cara cukup dalam dan dapat dari daripada datang dekat demi
+dengan depan di dia diantara diri dirinya disini disitu dong dulu harus hal hampir hanya hanyalah
+hari hingga ia ialah ibarat ikut ini inilah itu itulah jadi jangan jika jikalau juga justru kalau
+kalian kami kamu kan kapan karena kata ke kebanyakan kecil kembali kemudian kenapa kepada ketika
+kini kita lagi lah lain lalu lama lebih maka mana masih masing mau melainkan memang mengapa menjadi
+menurut mereka merupakan meski meskipun misalnya mungkin nah namun nanti nya oleh pada padahal para
+pernah perlu pula pun saat saja sama sambil sampai sana sangat satu saya se sebab sebagai sebelum
+sebenarnya sebuah secara sedang sedangkan sedikit segera sehingga sejak sekali sekarang selain selalu
+selama semua sempat senantiasa seperti sepertinya serta seseorang sesuatu setelah setiap sini situ
+suatu sudah supaya tadi tanpa tapi telah tentang tentu terhadap terlalu termasuk tersebut tetapi
+tiap toh untuk usah walau walaupun yaitu yakni yang
+aja ajah banget bgt deh dgn dll dr gak ga gitu gimana gue gw jd kalo kayak klo krn lagi loh lu nih
+sih tuh udah udh utk yg
+the a an and or of to in is are was were be for on with as at by it this that from not but
+'''.split())
+
+# Satu regex untuk kata (termasuk reduplikasi "buku-buku") dan akhir kalimat
+_TOKEN = re.compile(r"[^\W_]+(?:-[^\W_]+)*|[.!?]+")
+_SENTENCE_END = '.!?'
+
+class TextStats(NamedTuple):
+    char_count: int
+    word_count: int
+    unique_words: int
+    sentence_count: int
+    longest_word: Optional[str]
+    avg_word_length: float
+    keywords: List[Tuple[str, float]]
+
+class DocumentFrequency:
+    """
+    Tabel document frequency korpus untuk bobot IDF. Saat jumlah term
+    melewati batas, semua hitungan dibagi dua (term langka hilang) agar
+    memori tetap terbatas dan korpus lama perlahan terlupakan.
+    """
+
+    def __init__(self, max_terms: int = TEXT_DF_MAX_TERMS):
+        self.max_terms = max_terms
+        self.documents = 0
+        self._df: Dict[str, int] = {}
+        self.decays = 0
+
+    def __len__(self) -> int:
+        return len(self._df)
+
+    def add_document(self, terms):
+        df = self._df
+        for term in terms:
+            df[term] = df.get(term, 0) + 1
+        self.documents += 1
+        if len(df) > self.max_terms:
+            self._decay()
+
+    def _decay(self):
+        self._df = {term: count // 2 for term, count in self._df.items() if count > 1}
+        self.documents //= 2
+        self.decays += 1
+
+    def idf(self, term: str) -> float:
+        # IDF halus: term yang belum pernah terlihat mendapat bobot tertinggi
+        return math.log((1 + self.documents) / (1 + self._df.get(term, 0))) + 1.0
+
+    def stats(self) -> dict:
+        return {'documents': self.documents, 'terms': len(self._df), 'decays': self.decays}
+
+def analyze(text: str, top_k: int = TEXT_KEYWORDS, df: Optional[DocumentFrequency] = None,
+            learn: bool = True) -> TextStats:
+    """
+    Statistik teks dari satu lintasan tokenizer: jumlah kata/kalimat, kata
+    terpanjang, rata-rata panjang, dan kata kunci TF-IDF (atau TF jika tanpa
+    tabel DF). Agregasi memakai Counter (C), loop Python hanya atas kata unik.
+    Teks ikut dicatat ke tabel DF jika `learn`.
+    """
+    tokens = _TOKEN.findall(text.lower())
+    counts = Counter(tokens)
+
+    # Pisahkan tanda akhir kalimat dari kata
+    sentence_count = 0
+    punctuation_length = 0
+    for token in [token for token in counts if token[0] in _SENTENCE_END]:
+        count = counts.pop(token)
+        sentence_count += count
+        punctuation_length += count * len(token)
+    word_count = len(tokens) - sentence_count
+    if not word_count:
+        sentence_count = 0
+    elif tokens[-1][0] not in _SENTENCE_END:
+        # Kalimat terakhir tanpa tanda titik
+        sentence_count += 1
+
+    tf = {
+        term: count for term, count in counts.items()
+        if len(term) >= MIN_KEYWORD_LENGTH and term not in STOPWORDS and not term.isdigit()
+    }
+    if df is not None:
+        scores = {term: count * df.idf(term) for term, count in tf.items()}
+        if learn and tf:
+            df.add_document(tf)
+    else:
+        scores = tf
+
+    # Skor tertinggi dulu; seri diurutkan menurut kemunculan pertama
+    keywords = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    return TextStats(
+        char_count=len(text),
+        word_count=word_count,
+        unique_words=len(counts),
+        sentence_count=sentence_count,
+        longest_word=max(counts, key=len) if counts else None,
+        avg_word_length=(sum(map(len, tokens)) - punctuation_length) / word_count if word_count else 0.0,
+        keywords=keywords,
+    )
+
+# Tabel DF bersama, dipelajari dari teks yang dianalisis bot
+document_frequency = DocumentFrequency()
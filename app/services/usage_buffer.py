@@ -0,0 +1,144 @@
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from app.services.database import db
+
+logger = logging.getLogger(__name__)
+
+# Konfigurasi write-behind buffer untuk event penggunaan
+USAGE_FLUSH_SIZE = int(os.getenv('USAGE_FLUSH_SIZE', '500'))
+USAGE_FLUSH_INTERVAL = float(os.getenv('USAGE_FLUSH_INTERVAL', '5'))
+USAGE_BUFFER_MAX = int(os.getenv('USAGE_BUFFER_MAX', '10000'))
+
+UsageEvent = Tuple[int, str, datetime]
+
+class UsageBuffer:
+    """
+    Menampung event penggunaan di memori dan menulisnya ke database secara
+    bulk (per ukuran atau per interval). Jika buffer penuh, pemanggil ikut
+    menunggu flush sebagai backpressure.
+    """
+
+    def __init__(self, database=db, flush_size: int = USAGE_FLUSH_SIZE,
+                 flush_interval: float = USAGE_FLUSH_INTERVAL, max_events: int = USAGE_BUFFER_MAX):
+        self.database = database
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_events = max_events
+        self._events: List[UsageEvent] = []
+        self._flush_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.flushed = 0
+        self.dropped = 0
+        self.failures = 0
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    async def record(self, user_id: int, action_type: str):
+        if not self.database.is_connected:
+            return
+
+        if len(self._events) >= self.max_events:
+            # Backpressure: buffer penuh, tunggu flush selesai dulu
+            await self.flush()
+            if len(self._events) >= self.max_events:
+                self.dropped += 1
+                logger.warning("⚠️ Usage buffer penuh, event dibuang")
+                return
+
+        self._events.append((user_id, action_type, datetime.now(timezone.utc).replace(tzinfo=None)))
+        if len(self._events) >= self.flush_size:
+            self._wake.set()
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            events, self._events = self._events, []
+            if not events:
+                return 0
+
+            try:
+                await self.database.flush_usage_events(events)
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"❌ Error flush usage events: {e}")
+                # Kembalikan ke buffer selama masih muat, sisanya dibuang
+                room = max(self.max_events - len(self._events), 0)
+                self.dropped += max(len(events) - room, 0)
+                self._events = events[:room] + self._events
+                return 0
+
+            self.flushed += len(events)
+            return len(events)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+            logger.info("✅ Usage buffer berjalan")
+
+    async def stop(self):
+        """Hentikan loop flush dan pastikan semua event tersisa tertulis"""
+        if self._task is not None:
+            # Bangunkan loop lewat flag, bukan cancel: cancel bisa tertelan
+            # oleh wait_for ketika event bersamaan ter-set
+            self._stopping = True
+            self._wake.set()
+            await self._task
+            self._task = None
+        if self.database.is_connected:
+            await self.flush()
+
+    def pending_counts(self) -> dict:
+        """Hitung event yang belum di-flush (bucket yang sedang berjalan)"""
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        hour_start = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=23)
+        today = now.date()
+        month_start = today.replace(day=1)
+
+        counts = {'total_usage': 0, 'last_24h_usage': 0, 'today_usage': 0, 'month_usage': 0}
+        for _, _, timestamp in self._events:
+            counts['total_usage'] += 1
+            if timestamp >= hour_start:
+                counts['last_24h_usage'] += 1
+            day = timestamp.date()
+            if day == today:
+                counts['today_usage'] += 1
+            if day >= month_start:
+                counts['month_usage'] += 1
+        return counts
+
+    def stats(self) -> dict:
+        return {
+            'pending': len(self._events),
+            'flushed': self.flushed,
+            'dropped': self.dropped,
+            'failures': self.failures,
+        }
+
+# Global buffer instance
+usage_buffer = UsageBuffer()
+
+async def track_usage(user_id: int, action_type: str):
+    await usage_buffer.record(user_id, action_type)
+
+async def get_usage_stats() -> dict:
+    """Statistik dari rollup database ditambah event yang masih di buffer"""
+    stats = await db.get_usage_stats()
+    for key, value in usage_buffer.pending_counts().items():
+        stats[key] += value
+    return stats
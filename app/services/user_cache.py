@@ -0,0 +1,100 @@
+import os
+import logging
+from typing import NamedTuple, Optional
+
+from app.services.cache import TTLCache
+from app.services.database import db
+
+logger = logging.getLogger(__name__)
+
+# Konfigurasi cache profil user
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '50000'))
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '600'))
+
+class UserProfile(NamedTuple):
+    """Representasi ringkas baris users (tuple, tanpa dict per entry)"""
+    user_id: int
+    username: Optional[str]
+    first_name: Optional[str]
+    last_name: Optional[str]
+    is_premium: bool
+
+class UserProfileCache:
+    """Cache profil user di depan get_user/create_user/update_user_premium"""
+
+    def __init__(self, database=db, maxsize: int = USER_CACHE_SIZE, ttl: int = USER_CACHE_TTL):
+        self.database = database
+        self.cache = TTLCache(maxsize, ttl)
+        self.upserts = 0
+        self.upserts_skipped = 0
+
+    async def get_user(self, user_id: int) -> Optional[UserProfile]:
+        profile = self.cache.get(user_id)
+        if profile is not None:
+            return profile
+
+        row = await self.database.get_user(user_id)
+        if row is None:
+            return None
+
+        profile = UserProfile(row['user_id'], row['username'], row['first_name'],
+                              row['last_name'], bool(row['is_premium']))
+        self.cache.set(user_id, profile)
+        return profile
+
+    async def create_user(self, user_data: dict) -> UserProfile:
+        """Upsert lazy: DB hanya disentuh jika username/nama berubah"""
+        user_id = user_data['user_id']
+        cached = self.cache.get(user_id)
+        if cached is not None and (cached.username, cached.first_name, cached.last_name) == (
+                user_data['username'], user_data['first_name'], user_data['last_name']):
+            self.upserts_skipped += 1
+            return cached
+
+        is_premium = await self.database.create_user(user_data)
+        self.upserts += 1
+        profile = UserProfile(user_id, user_data['username'], user_data['first_name'],
+                              user_data['last_name'], bool(is_premium))
+        self.cache.set(user_id, profile)
+        return profile
+
+    async def update_user_premium(self, user_id: int, is_premium: bool) -> None:
+        await self.database.update_user_premium(user_id, is_premium)
+        self.cache.pop(user_id)
+
+    def invalidate(self, user_id: int):
+        self.cache.pop(user_id)
+
+    def stats(self) -> dict:
+        stats = self.cache.stats()
+        stats['upserts'] = self.upserts
+        stats['upserts_skipped'] = self.upserts_skipped
+        return stats
+
+# Global cache instance
+user_cache = UserProfileCache()
+
+async def remember_user(user) -> Optional[UserProfile]:
+    """Simpan user Telegram ke database (lazy) dan return profilnya"""
+    if user is None or not db.is_connected:
+        return None
+    try:
+        return await user_cache.create_user({
+            'user_id': user.id,
+            'username': user.username,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+        })
+    except Exception as e:
+        logger.warning(f"⚠️ Error menyimpan user {user.id}: {e}")
+        return None
+
+async def is_premium_user(user_id: int) -> bool:
+    if not db.is_connected:
+        return False
+    try:
+        profile = await user_cache.get_user(user_id)
+    except Exception as e:
+        logger.warning(f"⚠️ Error cek premium user {user_id}: {e}")
+        return False
+    return bool(profile and profile.is_premium)
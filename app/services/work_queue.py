@@ -0,0 +1,156 @@
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict
+
+from app.utils.metrics import LatencyWindow
+
+logger = logging.getLogger(__name__)
+
+# Slot kerja AI/audio dan porsi yang dicadangkan untuk user premium
+AI_WORK_CONCURRENCY = int(os.getenv('AI_WORK_CONCURRENCY', '8'))
+AI_PREMIUM_RESERVED = int(os.getenv('AI_PREMIUM_RESERVED', '2'))
+AUDIO_WORK_CONCURRENCY = int(os.getenv('AUDIO_WORK_CONCURRENCY', '2'))
+AUDIO_PREMIUM_RESERVED = int(os.getenv('AUDIO_PREMIUM_RESERVED', '1'))
+
+PREMIUM = 'premium'
+FREE = 'free'
+
+class PriorityWorkQueue:
+    """
+    Antrean kerja dua tier. User premium selalu dilayani lebih dulu dan
+    punya slot cadangan yang tidak bisa dipakai user free. Antar user free
+    dilayani bergiliran (round-robin per user) agar satu user yang mengirim
+    banyak pekerjaan tidak menghabiskan semua slot.
+    """
+
+    def __init__(self, name: str, concurrency: int, premium_reserved: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.premium_reserved = min(premium_reserved, concurrency - 1)
+        self.running = 0
+        self.running_free = 0
+        self._premium: Deque[asyncio.Future] = deque()
+        self._free: Dict[int, Deque[asyncio.Future]] = OrderedDict()
+        self.waits = {PREMIUM: LatencyWindow(), FREE: LatencyWindow()}
+        self.latencies = {PREMIUM: LatencyWindow(), FREE: LatencyWindow()}
+
+    @property
+    def free_limit(self) -> int:
+        return self.concurrency - self.premium_reserved
+
+    def queued(self) -> dict:
+        return {
+            PREMIUM: len(self._premium),
+            FREE: sum(len(q) for q in self._free.values()),
+        }
+
+    def _start(self, premium: bool):
+        self.running += 1
+        if not premium:
+            self.running_free += 1
+
+    async def acquire(self, user_id: int, premium: bool):
+        if premium:
+            if not self._premium and self.running < self.concurrency:
+                self._start(True)
+                return
+        elif not self._premium and not self._free and \
+                self.running < self.concurrency and self.running_free < self.free_limit:
+            self._start(False)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        if premium:
+            self._premium.append(future)
+        else:
+            self._free.setdefault(user_id, deque()).append(future)
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot sudah diberikan tepat saat dibatalkan: kembalikan
+                self.release(premium)
+            else:
+                self._discard(user_id, premium, future)
+            raise
+
+    def _discard(self, user_id: int, premium: bool, future: asyncio.Future):
+        if premium:
+            try:
+                self._premium.remove(future)
+            except ValueError:
+                pass
+            return
+        queue = self._free.get(user_id)
+        if queue is not None:
+            try:
+                queue.remove(future)
+            except ValueError:
+                pass
+            if not queue:
+                del self._free[user_id]
+
+    def release(self, premium: bool):
+        self.running -= 1
+        if not premium:
+            self.running_free -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while self.running < self.concurrency:
+            if self._premium:
+                future = self._premium.popleft()
+                if future.done():
+                    continue
+                self._start(True)
+                future.set_result(None)
+                continue
+
+            if not self._free or self.running_free >= self.free_limit:
+                break
+
+            # Giliran user free berikutnya; user dipindah ke belakang jika masih punya antrean
+            user_id, queue = self._free.popitem(last=False)
+            future = queue.popleft()
+            if queue:
+                self._free[user_id] = queue
+            if future.done():
+                continue
+            self._start(False)
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, user_id: int, premium: bool):
+        tier = PREMIUM if premium else FREE
+        enqueued = time.monotonic()
+        await self.acquire(user_id, premium)
+        self.waits[tier].add(time.monotonic() - enqueued)
+        try:
+            yield
+        finally:
+            self.latencies[tier].add(time.monotonic() - enqueued)
+            self.release(premium)
+
+    def stats(self) -> dict:
+        queued = self.queued()
+        return {
+            'running': self.running,
+            'concurrency': self.concurrency,
+            'tiers': {
+                tier: {
+                    'queued': queued[tier],
+                    'wait': self.waits[tier].summary(),
+                    'latency': self.latencies[tier].summary(),
+                }
+                for tier in (PREMIUM, FREE)
+            },
+        }
+
+# Global queue instances
+ai_queue = PriorityWorkQueue('ai', AI_WORK_CONCURRENCY, AI_PREMIUM_RESERVED)
+audio_queue = PriorityWorkQueue('audio', AUDIO_WORK_CONCURRENCY, AUDIO_PREMIUM_RESERVED)
@@ -1,4 +1,3 @@
-import time
 from typing import Dict, Any
 from functools import wraps
 
@@ -18,20 +17,37 @@ def validate_text(text: str, max_length: int = 4000) -> bool:
 
 def rate_limit(max_calls: int = 10, time_frame: int = 60):
     """
-    Decorator untuk rate limiting
+    Decorator untuk rate limiting per user (GCRA, memori konstan per user).
+    Untuk handler dengan budget per tier gunakan rate_limiter.rate_limited.
     """
-    calls = []
+    from app.utils.rate_limiter import GCRALimiter, Limit, notify_limited
+    limiter = GCRALimiter(Limit(max_calls, time_frame, max_calls))
     
     def decorator(func):
         @wraps(func)
-        async def wrapper(*args, **kwargs):
-            current_time = time.time()
-            calls_in_timeframe = [call for call in calls if call > current_time - time_frame]
+        async def wrapper(update, *args, **kwargs):
+            user = getattr(update, 'effective_user', None)
+            retry_after = limiter.check(user.id if user else None)
             
-            if len(calls_in_timeframe) >= max_calls:
-                raise Exception("Rate limit exceeded")
+            if retry_after:
+                await notify_limited(update, retry_after)
+                return
             
-            calls.append(current_time)
-            return await func(*args, **kwargs)
+            return await func(update, *args, **kwargs)
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
+
+def split_message(text: str, limit: int = 4000) -> list:
+    """Pecah teks panjang menjadi beberapa bagian <= limit, utamakan batas baris/kata"""
+    parts = []
+    while len(text) > limit:
+        cut = text.rfind('\n', limit // 2, limit)
+        if cut == -1:
+            cut = text.rfind(' ', limit // 2, limit)
+        if cut == -1:
+            cut = limit
+        parts.append(text[:cut])
+        text = text[cut:].lstrip()
+    if text:
+        parts.append(text)
+    return parts
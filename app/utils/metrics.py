@@ -0,0 +1,38 @@
+from array import array
+
+class LatencyWindow:
+    """Ring buffer sampel latency (detik) untuk persentil jendela terakhir"""
+
+    def __init__(self, size: int = 512):
+        self.size = size
+        self._samples = array('d')
+        self._next = 0
+        self.count = 0
+
+    def add(self, value: float):
+        if len(self._samples) < self.size:
+            self._samples.append(value)
+        else:
+            self._samples[self._next] = value
+        self._next = (self._next + 1) % self.size
+        self.count += 1
+
+    def percentile(self, q: float) -> float:
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        index = min(int(q / 100 * len(ordered)), len(ordered) - 1)
+        return ordered[index]
+
+    def summary(self) -> dict:
+        if not self._samples:
+            return {'count': self.count, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+        ordered = sorted(self._samples)
+        last = len(ordered) - 1
+        return {
+            'count': self.count,
+            'p50': ordered[min(int(0.50 * len(ordered)), last)],
+            'p95': ordered[min(int(0.95 * len(ordered)), last)],
+            'p99': ordered[min(int(0.99 * len(ordered)), last)],
+            'max': ordered[last],
+        }
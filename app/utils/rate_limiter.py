@@ -0,0 +1,168 @@
+import os
+import time
+import logging
+from collections import OrderedDict
+from functools import wraps
+from typing import Dict, Hashable, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# Batas jumlah key per limiter (key idle dibuang lebih dulu)
+RATE_LIMIT_MAX_KEYS = int(os.getenv('RATE_LIMIT_MAX_KEYS', '200000'))
+
+class Limit(NamedTuple):
+    rate: int        # jumlah request
+    period: float    # per detik
+    burst: int       # toleransi burst
+
+    @classmethod
+    def parse(cls, value: str) -> 'Limit':
+        """Format: "jumlah/detik" atau "jumlah/detik/burst", mis. "10/60" """
+        parts = value.split('/')
+        rate, period = int(parts[0]), float(parts[1])
+        burst = int(parts[2]) if len(parts) > 2 else rate
+        return cls(rate, period, burst)
+
+class GCRALimiter:
+    """
+    Generic Cell Rate Algorithm: state per key hanya satu float (TAT,
+    theoretical arrival time). Key dengan TAT <= sekarang setara dengan key
+    baru, sehingga bisa dibuang tanpa mengubah perilaku limiter.
+    """
+
+    def __init__(self, limit: Limit, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.limit = limit
+        self.interval = limit.period / limit.rate
+        self.tolerance = self.interval * (limit.burst - 1)
+        self.max_keys = max_keys
+        self._tat: Dict[Hashable, float] = OrderedDict()
+        self.allowed = 0
+        self.rejected = 0
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+    def check(self, key: Hashable, now: float = None) -> float:
+        """Return 0 jika diizinkan, atau jumlah detik sampai boleh mencoba lagi"""
+        if now is None:
+            now = time.monotonic()
+
+        tat = self._tat.get(key, now)
+        if tat < now:
+            tat = now
+
+        if tat - now > self.tolerance:
+            self.rejected += 1
+            return tat - self.tolerance - now
+
+        self._tat[key] = tat + self.interval
+        self._tat.move_to_end(key)
+        self.allowed += 1
+        self._evict(now)
+        return 0.0
+
+    def refund(self, key: Hashable):
+        """Batalkan check() yang baru saja diizinkan (mis. ditolak limiter lain)"""
+        tat = self._tat.get(key)
+        if tat is not None:
+            self._tat[key] = tat - self.interval
+            self.allowed -= 1
+
+    def _evict(self, now: float):
+        # Key paling depan adalah yang paling lama tidak aktif
+        tat = self._tat
+        while tat:
+            key, value = next(iter(tat.items()))
+            if value > now and len(tat) <= self.max_keys:
+                break
+            del tat[key]
+
+    def stats(self) -> dict:
+        return {'keys': len(self._tat), 'allowed': self.allowed, 'rejected': self.rejected}
+
+def _limit_from_env(name: str, default: str) -> Limit:
+    return Limit.parse(os.getenv(name, default))
+
+# Budget per lane: (free, premium)
+DEFAULT_LIMITS = {
+    'text': (_limit_from_env('RATE_TEXT_FREE', '10/60/3'), _limit_from_env('RATE_TEXT_PREMIUM', '40/60/10')),
+    'audio': (_limit_from_env('RATE_AUDIO_FREE', '3/60/2'), _limit_from_env('RATE_AUDIO_PREMIUM', '20/60/5')),
+    'command': (_limit_from_env('RATE_COMMAND_FREE', '20/60/5'), _limit_from_env('RATE_COMMAND_PREMIUM', '60/60/10')),
+}
+# Batas per chat (grup) berlaku untuk semua user di chat tersebut
+CHAT_LIMIT = _limit_from_env('RATE_CHAT', '60/60/20')
+# Pesan "terlalu banyak permintaan" maksimal sekali per 10 detik per user
+NOTICE_LIMIT = Limit(1, 10, 1)
+
+class RateLimits:
+    """Kumpulan limiter per lane, per tier (free/premium) dan per chat"""
+
+    def __init__(self, limits: Dict[str, tuple] = None, chat_limit: Limit = CHAT_LIMIT):
+        limits = limits or DEFAULT_LIMITS
+        self.lanes = {
+            lane: (GCRALimiter(free), GCRALimiter(premium))
+            for lane, (free, premium) in limits.items()
+        }
+        self.chats = GCRALimiter(chat_limit)
+        self.notices = GCRALimiter(NOTICE_LIMIT)
+
+    def check(self, lane: str, user_id: int, chat_id: Optional[int] = None, premium: bool = False) -> float:
+        free, paid = self.lanes[lane]
+        limiter = paid if premium else free
+        retry_after = limiter.check(user_id)
+        if retry_after:
+            return retry_after
+        # Chat privat (chat_id == user_id) sudah tercakup limit per user
+        if chat_id is not None and chat_id != user_id:
+            retry_after = self.chats.check(chat_id)
+            if retry_after:
+                # Request ditolak di level chat: token user dikembalikan
+                limiter.refund(user_id)
+            return retry_after
+        return 0.0
+
+    def should_notify(self, user_id: int) -> bool:
+        return self.notices.check(user_id) == 0
+
+    def stats(self) -> dict:
+        stats = {
+            lane: {'free': free.stats(), 'premium': paid.stats()}
+            for lane, (free, paid) in self.lanes.items()
+        }
+        stats['chat'] = self.chats.stats()
+        return stats
+
+# Global limiter instance
+rate_limits = RateLimits()
+
+async def notify_limited(update, retry_after: float):
+    """Balas user yang kena rate limit dengan waktu tunggu"""
+    if update.effective_message is None:
+        return
+    await update.effective_message.reply_text(
+        f"⏳ Terlalu banyak permintaan. Silakan coba lagi dalam {max(int(retry_after + 0.999), 1)} detik."
+    )
+
+def rate_limited(lane: str):
+    """Decorator handler Telegram: limit per user/chat sesuai tier premium"""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(update, context, *args, **kwargs):
+            user = update.effective_user
+            if user is None:
+                return await func(update, context, *args, **kwargs)
+
+            from app.services.user_cache import is_premium_user
+            premium = await is_premium_user(user.id)
+            chat_id = update.effective_chat.id if update.effective_chat else None
+
+            retry_after = rate_limits.check(lane, user.id, chat_id, premium)
+            if retry_after:
+                logger.info(f"⏳ Rate limit {lane} untuk user {user.id} ({retry_after:.1f}s)")
+                if rate_limits.should_notify(user.id):
+                    await notify_limited(update, retry_after)
+                return
+
+            return await func(update, context, *args, **kwargs)
+        return wrapper
+    return decorator
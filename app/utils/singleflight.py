@@ -0,0 +1,87 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+class LeaderAbandoned(Exception):
+    """Pemilik request pergi sebelum selesai; follower harus mencoba ulang"""
+
+def _consume_exception(future: asyncio.Future):
+    # Hindari warning "exception was never retrieved" saat tidak ada follower
+    if not future.cancelled():
+        future.exception()
+
+class _Call:
+    __slots__ = ('future', 'waiters', 'owned')
+
+    def __init__(self, future: asyncio.Future, owned: bool):
+        self.future = future
+        self.waiters = 0
+        # owned: future dijalankan oleh SingleFlight sendiri (bukan milik leader stream)
+        self.owned = owned
+
+class SingleFlight:
+    """
+    Menggabungkan request identik yang sedang berjalan: pemanggil berikutnya
+    dengan key yang sama menunggu future yang sama. Pekerjaan bersama hanya
+    dibatalkan ketika semua penunggunya sudah pergi.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    def _register(self, key: Hashable, future: asyncio.Future, owned: bool) -> _Call:
+        call = _Call(future, owned)
+        self._calls[key] = call
+        future.add_done_callback(_consume_exception)
+        future.add_done_callback(lambda _, c=call: self._forget(key, c))
+        self.leaders += 1
+        return call
+
+    def _forget(self, key: Hashable, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        while True:
+            call = self._calls.get(key)
+            if call is None or call.future.done():
+                call = self._register(key, asyncio.ensure_future(factory()), owned=True)
+            else:
+                self.coalesced += 1
+
+            call.waiters += 1
+            try:
+                return await asyncio.shield(call.future)
+            except LeaderAbandoned:
+                continue
+            finally:
+                call.waiters -= 1
+                if call.waiters == 0 and call.owned and not call.future.done():
+                    call.future.cancel()
+                    self._forget(key, call)
+
+    def lead(self, key: Hashable) -> Optional[asyncio.Future]:
+        """
+        Klaim key untuk pekerjaan yang dijalankan pemanggil sendiri (mis. stream).
+        Return None jika sudah ada request identik yang berjalan. Pemanggil wajib
+        menyelesaikan future dengan hasil, exception, atau LeaderAbandoned.
+        """
+        if key in self._calls:
+            return None
+        future = asyncio.get_running_loop().create_future()
+        self._register(key, future, owned=False)
+        return future
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'in_flight': len(self._calls),
+            'leaders': self.leaders,
+            'coalesced': self.coalesced,
+        }
@@ -0,0 +1,104 @@
+import os
+import time
+import asyncio
+import logging
+from telegram.error import BadRequest, RetryAfter
+from app.utils.helpers import split_message
+
+logger = logging.getLogger(__name__)
+
+# Batas panjang pesan Telegram (dengan margin) dan jeda minimal antar edit
+TELEGRAM_MESSAGE_LIMIT = 4000
+STREAM_EDIT_INTERVAL = float(os.getenv('STREAM_EDIT_INTERVAL', '1.2'))
+
+class MessageStreamer:
+    """
+    Menulis teks bertahap ke satu pesan Telegram dengan edit in-place.
+    Chunk digabung dan edit dibatasi per interval; teks yang melebihi
+    batas Telegram dilanjutkan ke pesan berikutnya.
+    """
+
+    def __init__(self, message, header: str = '', footer: str = '',
+                 min_interval: float = STREAM_EDIT_INTERVAL, limit: int = TELEGRAM_MESSAGE_LIMIT):
+        self.message = message
+        self.header = header
+        self.footer = footer
+        self.min_interval = min_interval
+        self.limit = limit
+        self.text = ''
+        self.messages = [message]
+        self._rendered = None
+        self._last_edit = 0.0
+        self._blocked_until = 0.0
+
+    @property
+    def _budget(self) -> int:
+        return self.limit - len(self.header) - len(self.footer)
+
+    async def append(self, chunk: str):
+        if not chunk:
+            return
+        self.text += chunk
+
+        # Pindahkan kelebihan teks ke pesan lanjutan
+        while len(self.text) > self._budget:
+            head = split_message(self.text, self._budget)[0]
+            rest = self.text[len(head):].lstrip()
+            self.text = head
+            # Potongan ini harus benar-benar tertulis sebelum lanjut ke pesan baru
+            await self._wait_blocked()
+            await self._edit(final=False, force=True, wait=True)
+            self.header = ''
+            self.text = rest
+            self.message = await self._with_retry(lambda: self.message.reply_text(rest[:self._budget] or '…'))
+            self.messages.append(self.message)
+            self._rendered = rest[:self._budget]
+            self._last_edit = time.monotonic()
+
+        now = time.monotonic()
+        if now - self._last_edit >= self.min_interval and now >= self._blocked_until:
+            await self._edit(final=False)
+
+    async def finish(self):
+        """Edit terakhir dengan footer, tunggu jika sedang kena RetryAfter"""
+        await self._wait_blocked()
+        await self._edit(final=True, force=True, wait=True)
+
+    async def _wait_blocked(self):
+        delay = self._blocked_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _with_retry(self, call):
+        """Jalankan request Telegram, tunggu RetryAfter lalu ulangi sampai berhasil"""
+        while True:
+            try:
+                return await call()
+            except RetryAfter as e:
+                self._blocked_until = time.monotonic() + float(e.retry_after)
+                logger.warning(f"⚠️ Stream kena RetryAfter {e.retry_after}s, menunggu")
+                await asyncio.sleep(float(e.retry_after))
+
+    async def _edit(self, final: bool, force: bool = False, wait: bool = False):
+        """Edit pesan; wait=True menunggu RetryAfter alih-alih melewatkan edit"""
+        rendered = self.header + (self.text or '…') + (self.footer if final else '')
+        if rendered == self._rendered:
+            return
+        if not force and time.monotonic() < self._blocked_until:
+            return
+
+        try:
+            await self.message.edit_text(rendered)
+            self._rendered = rendered
+        except RetryAfter as e:
+            self._blocked_until = time.monotonic() + float(e.retry_after)
+            logger.warning(f"⚠️ Edit stream kena RetryAfter {e.retry_after}s")
+            if wait:
+                await asyncio.sleep(float(e.retry_after))
+                await self._with_retry(lambda: self.message.edit_text(rendered))
+                self._rendered = rendered
+        except BadRequest as e:
+            if 'not modified' not in str(e).lower():
+                raise
+        finally:
+            self._last_edit = time.monotonic()
@@ -0,0 +1,165 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+from app.utils.metrics import LatencyWindow
+
+logger = logging.getLogger(__name__)
+
+# Batas handler yang berjalan bersamaan: total, dan khusus lane berat (AI/audio).
+# Selisihnya selalu tersedia untuk lane ringan sehingga command tidak antre
+# di belakang pekerjaan AI/audio.
+UPDATE_CONCURRENCY = int(os.getenv('UPDATE_CONCURRENCY', '64'))
+UPDATE_HEAVY_CONCURRENCY = int(os.getenv('UPDATE_HEAVY_CONCURRENCY', '48'))
+# Lane audio terpisah: lonjakan voice note tidak menghabiskan slot lane teks
+UPDATE_AUDIO_CONCURRENCY = int(os.getenv('UPDATE_AUDIO_CONCURRENCY', '8'))
+# Batas update yang boleh menunggu slot lane + berjalan di processor. Ini bukan
+# backpressure: PTB tetap membuat task per update, sisanya menunggu di semaphore ini
+UPDATE_QUEUE_LIMIT = int(os.getenv('UPDATE_QUEUE_LIMIT', '10000'))
+
+# Command murah yang diproses di lane ringan
+FAST_COMMANDS = {'start', 'help', 'premium', 'status', 'admin'}
+
+FAST_LANE = 'fast'
+HEAVY_LANE = 'heavy'
+AUDIO_LANE = 'audio'
+
+class LaneStats:
+    __slots__ = ('queued', 'running', 'processed', 'waits')
+
+    def __init__(self):
+        self.queued = 0
+        self.running = 0
+        self.processed = 0
+        self.waits = LatencyWindow()
+
+    def as_dict(self) -> dict:
+        waits = self.waits.summary()
+        return {
+            'queued': self.queued,
+            'running': self.running,
+            'processed': self.processed,
+            'wait_p50': waits['p50'],
+            'wait_p95': waits['p95'],
+            'wait_max': waits['max'],
+        }
+
+def classify_update(update: Any) -> str:
+    """Tentukan lane update: command murah/callback ke lane ringan"""
+    if not isinstance(update, Update):
+        return FAST_LANE
+    if update.callback_query is not None:
+        return FAST_LANE
+
+    message = update.effective_message
+    if message is not None and (message.voice is not None or message.audio is not None):
+        return AUDIO_LANE
+    text = message.text if message is not None else None
+    if text and text.startswith('/'):
+        command = text[1:].split(maxsplit=1)[0].split('@', 1)[0].lower() if len(text) > 1 else ''
+        if command in FAST_COMMANDS:
+            return FAST_LANE
+    return HEAVY_LANE
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Memproses update antar chat secara paralel dengan urutan tetap di dalam
+    satu chat. Update lane berat/audio mengantre per chat (FIFO) lalu
+    mengambil slot lane masing-masing; update lane ringan tidak menunggu
+    pekerjaan berat.
+    """
+
+    def __init__(self, max_concurrent: int = UPDATE_CONCURRENCY,
+                 heavy_concurrent: int = UPDATE_HEAVY_CONCURRENCY,
+                 audio_concurrent: int = UPDATE_AUDIO_CONCURRENCY, queue_limit: int = UPDATE_QUEUE_LIMIT):
+        # Semaphore bawaan hanya membatasi total antrean; slot kerja diatur per lane
+        super().__init__(max_concurrent_updates=queue_limit)
+        # Minimal satu slot per lane; lane berat + audio bersama-sama selalu
+        # menyisakan minimal satu slot untuk lane ringan
+        self.max_concurrent = max(max_concurrent, 3)
+        background = self.max_concurrent - 1
+        self.heavy_concurrent = max(1, min(heavy_concurrent, background - 1))
+        self.audio_concurrent = max(1, min(audio_concurrent, background - self.heavy_concurrent))
+        if self.max_concurrent != max_concurrent:
+            logger.warning(f"⚠️ UPDATE_CONCURRENCY={max_concurrent} terlalu kecil, dipakai {self.max_concurrent}")
+        self._global = asyncio.Semaphore(self.max_concurrent)
+        # Lane berurutan per chat beserta slot kerjanya
+        self._lane_slots = {
+            HEAVY_LANE: asyncio.Semaphore(self.heavy_concurrent),
+            AUDIO_LANE: asyncio.Semaphore(self.audio_concurrent),
+        }
+        self._chat_locks: Dict[int, list] = {}
+        self.lanes = {FAST_LANE: LaneStats(), HEAVY_LANE: LaneStats(), AUDIO_LANE: LaneStats()}
+
+    async def initialize(self) -> None:
+        logger.info(
+            f"✅ Update processor: {self.max_concurrent} slot total, "
+            f"{self.heavy_concurrent} untuk AI, {self.audio_concurrent} untuk audio"
+        )
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        lane = classify_update(update)
+        stats = self.lanes[lane]
+        slots = self._lane_slots.get(lane)
+        chat = getattr(update, 'effective_chat', None)
+        chat_id = chat.id if chat is not None and slots is not None else None
+
+        enqueued = time.monotonic()
+        stats.queued += 1
+        entry = None
+        chat_locked = slot_acquired = False
+        try:
+            if chat_id is not None:
+                # Lock per chat, diambil dalam urutan kedatangan (asyncio.Lock FIFO)
+                entry = self._chat_locks.get(chat_id)
+                if entry is None:
+                    entry = self._chat_locks[chat_id] = [asyncio.Lock(), 0]
+                entry[1] += 1
+                await entry[0].acquire()
+                chat_locked = True
+            if slots is not None:
+                await slots.acquire()
+                slot_acquired = True
+            await self._global.acquire()
+        except BaseException:
+            stats.queued -= 1
+            if slot_acquired:
+                slots.release()
+            self._release_chat(chat_id, entry, chat_locked)
+            coroutine.close()
+            raise
+
+        stats.queued -= 1
+        stats.running += 1
+        stats.waits.add(time.monotonic() - enqueued)
+        try:
+            await coroutine
+        finally:
+            stats.running -= 1
+            stats.processed += 1
+            self._global.release()
+            if slots is not None:
+                slots.release()
+            self._release_chat(chat_id, entry, locked=True)
+
+    def _release_chat(self, chat_id, entry, locked: bool):
+        if entry is None:
+            return
+        if locked:
+            entry[0].release()
+        entry[1] -= 1
+        if entry[1] == 0:
+            self._chat_locks.pop(chat_id, None)
+
+    def stats(self) -> dict:
+        return {
+            'chats_waiting': len(self._chat_locks),
+            'lanes': {name: lane.as_dict() for name, lane in self.lanes.items()},
+        }
@@ -0,0 +1,38 @@
+"""
+Benchmark FastPathResponder: biaya klasifikasi per pesan (target: mikrodetik).
+
+    python -m benchmarks.bench_fast_path
+"""
+import time
+
+from app.services.fast_path import FastPathResponder
+
+MESSAGES = [
+    "halo", "Selamat pagi kak", "makasih banyak ya", "ok", "wkwkwk", "👍",
+    "Apa itu machine learning?", "Tolong jelaskan cara kerja fotosintesis pada tumbuhan",
+    "Saya ingin tahu bagaimana cara membuat CV yang baik untuk melamar kerja",
+    "halo, apa kabar?",
+]
+ROUNDS = 50_000
+
+def main():
+    responder = FastPathResponder(rules_path=None)
+    for text in MESSAGES:
+        responder.classify(text)
+
+    for text in MESSAGES:
+        start = time.perf_counter()
+        for _ in range(ROUNDS // 10):
+            intent = responder.classify(text)
+        elapsed = time.perf_counter() - start
+        print(f"{elapsed / (ROUNDS // 10) * 1e6:6.2f} µs  {intent or '-> AI':12} {text[:50]!r}")
+
+    start = time.perf_counter()
+    for i in range(ROUNDS):
+        responder.respond(MESSAGES[i % len(MESSAGES)], 'Budi')
+    elapsed = time.perf_counter() - start
+    stats = responder.stats()
+    print(f"respond(): {elapsed / ROUNDS * 1e6:.2f} µs/pesan, diserap {stats['absorbed_rate']:.0%}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark KeyPool: RPM yang diterima naik linear dengan jumlah API key.
+
+Memakai jam palsu dan model palsu (tanpa network), 10 menit simulasi
+dengan permintaan masuk jauh di atas kuota.
+
+    python -m benchmarks.bench_key_pool
+"""
+import time
+
+from app.services import key_pool as key_pool_module
+from app.services.key_pool import KeyPool, KeyPoolExhausted, KeySlot
+
+RPM = 15
+TPM = 1_000_000
+TOKENS = 1_000
+ARRIVALS_PER_SECOND = 5
+MINUTES = 10
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+def bench(num_keys: int):
+    clock = FakeClock()
+    key_pool_module.time = clock
+    try:
+        pool = KeyPool([[KeySlot(f"key-{i:04d}", 'models/fake', None, RPM, TPM) for i in range(num_keys)]])
+        admitted = rejected = 0
+        for tick in range(MINUTES * 60 * ARRIVALS_PER_SECOND):
+            clock.now = tick / ARRIVALS_PER_SECOND
+            try:
+                pool.acquire(TOKENS)
+                admitted += 1
+            except KeyPoolExhausted:
+                rejected += 1
+        return admitted / MINUTES, rejected, pool
+    finally:
+        key_pool_module.time = time
+
+def main():
+    print(f"Kuota {RPM} rpm/key, permintaan masuk {ARRIVALS_PER_SECOND * 60} rpm")
+    for num_keys in (1, 2, 4, 8, 16):
+        rpm, rejected, pool = bench(num_keys)
+        spread = [slot.requests for slot in pool.tiers[0]]
+        print(
+            f"{num_keys:>3} key: {rpm:6.1f} rpm diterima "
+            f"({rpm / (RPM * num_keys):.0%} kuota, ditolak {rejected:,}, "
+            f"per key min/max {min(spread)}/{max(spread)})"
+        )
+
+    start = time.perf_counter()
+    pool = KeyPool([[KeySlot(f"key-{i:04d}", 'models/fake', None, 10**9, 10**12) for i in range(16)]])
+    for _ in range(200_000):
+        pool.acquire(TOKENS)
+    elapsed = time.perf_counter() - start
+    print(f"Biaya acquire: {elapsed / 200_000 * 1e6:.2f} µs")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Benchmark GCRALimiter: biaya check konstan dari 1k sampai 100k user aktif.
+
+    python -m benchmarks.bench_rate_limiter
+"""
+import random
+import time
+import tracemalloc
+
+from app.utils.rate_limiter import GCRALimiter, Limit
+
+CHECKS = 500_000
+
+def bench(active_users: int):
+    limiter = GCRALimiter(Limit(10, 60, 3), max_keys=active_users * 2)
+    users = list(range(active_users))
+    now = 0.0
+
+    # Isi state untuk semua user aktif
+    for user_id in users:
+        limiter.check(user_id, now)
+
+    keys = [random.choice(users) for _ in range(CHECKS)]
+    start = time.perf_counter()
+    for i, user_id in enumerate(keys):
+        limiter.check(user_id, now + i * 1e-4)
+    elapsed = time.perf_counter() - start
+    return elapsed / CHECKS * 1e9, len(limiter)
+
+def main():
+    random.seed(7)
+    for active_users in (1_000, 10_000, 100_000):
+        ns_per_check, keys = bench(active_users)
+        print(f"{active_users:>7,} user aktif: {ns_per_check:,.0f} ns/check ({keys:,} key tersimpan)")
+
+    tracemalloc.start()
+    limiter = GCRALimiter(Limit(10, 60, 3))
+    for user_id in range(100_000):
+        limiter.check(user_id, 0.0)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"Memori untuk 100,000 key: {current / 2**20:.1f} MiB ({current / 100_000:.0f} byte/key)")
+
+if __name__ == '__main__':
+    main()
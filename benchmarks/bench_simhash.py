@@ -0,0 +1,57 @@
+"""
+Benchmark lookup SimHashIndex pada 1 juta fingerprint.
+
+    python -m benchmarks.bench_simhash
+"""
+import random
+import time
+import tracemalloc
+
+from app.services.simhash import SimHashIndex, simhash, tokenize
+
+STORED = 1_000_000
+LOOKUPS = 20_000
+
+def flip_bits(value: int, count: int) -> int:
+    for bit in random.sample(range(64), count):
+        value ^= 1 << bit
+    return value
+
+def main():
+    random.seed(42)
+
+    tracemalloc.start()
+    index = SimHashIndex(capacity=STORED, max_distance=3)
+    fingerprints = [random.getrandbits(64) for _ in range(STORED)]
+
+    start = time.perf_counter()
+    for fp in fingerprints:
+        index.add(fp)
+    build_time = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"Index {len(index):,} fingerprint dibangun dalam {build_time:.1f}s, peak memori {peak / 2**20:.0f} MiB")
+
+    # Query near-duplicate (2 bit berbeda) dan query acak (miss)
+    near = [flip_bits(random.choice(fingerprints), 2) for _ in range(LOOKUPS)]
+    misses = [random.getrandbits(64) for _ in range(LOOKUPS)]
+
+    for label, queries in (('near-duplicate', near), ('miss', misses)):
+        found = 0
+        start = time.perf_counter()
+        for fp in queries:
+            if index.lookup(fp) is not None:
+                found += 1
+        elapsed = time.perf_counter() - start
+        print(f"Lookup {label}: {elapsed / len(queries) * 1e6:.1f} µs/lookup, ketemu {found}/{len(queries)}")
+
+    text = "Breaking news!!! Harga BBM naik mulai besok, cek daftar lengkapnya di sini 🔥🔥 " * 4
+    start = time.perf_counter()
+    for _ in range(1000):
+        simhash(tokenize(text))
+    elapsed = time.perf_counter() - start
+    print(f"Fingerprint teks {len(text)} karakter: {elapsed:.3f} ms/teks")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark Transcriber: latency voice note 5 menit vs jumlah worker.
+
+Memakai StubEngine dengan beban CPU tersimulasi (STT_BENCH_COST detik CPU
+per detik audio), jadi hasilnya bergantung jumlah core mesin.
+
+    python -m benchmarks.bench_stt
+"""
+import os
+import math
+import time
+import random
+import asyncio
+from array import array
+
+from app.services.audio_pipeline import AUDIO_SAMPLE_RATE, PcmAudio
+from app.services.stt import Transcriber, split_on_silence
+
+SECONDS = 300
+COST = float(os.getenv('STT_BENCH_COST', '0.05'))
+
+def synthesize(seconds: float, seed: int = 7) -> bytes:
+    """Ucapan sintetis (nada) diselingi jeda hening 0.2-0.8 detik"""
+    rng = random.Random(seed)
+    samples = array('h')
+    elapsed = 0.0
+    while elapsed < seconds:
+        speech = rng.uniform(2, 6)
+        samples.extend(int(6000 * math.sin(i / 7)) for i in range(int(speech * AUDIO_SAMPLE_RATE)))
+        silence = rng.uniform(0.2, 0.8)
+        samples.extend(rng.randint(-30, 30) for _ in range(int(silence * AUDIO_SAMPLE_RATE)))
+        elapsed += speech + silence
+    return samples.tobytes()
+
+async def bench(audio: PcmAudio, workers: int):
+    transcriber = Transcriber('stub', workers=workers, cost=COST)
+    try:
+        # Pemanasan: spawn semua worker sebelum diukur
+        await asyncio.gather(*(transcriber.transcribe(PcmAudio(audio.pcm[:3200])) for _ in range(workers)))
+        start = time.perf_counter()
+        first = None
+        async for _ in transcriber.stream(audio):
+            if first is None:
+                first = time.perf_counter() - start
+        return time.perf_counter() - start, first
+    finally:
+        transcriber.shutdown()
+
+async def main():
+    audio = PcmAudio(synthesize(SECONDS))
+    start = time.perf_counter()
+    chunks = split_on_silence(audio.pcm)
+    print(f"Audio {audio.duration:.0f}s -> {len(chunks)} potongan ({(time.perf_counter() - start) * 1000:.0f} ms split)")
+
+    cores = os.cpu_count() or 1
+    for workers in sorted({1, 2, 4, cores}):
+        total, first = await bench(audio, workers)
+        print(f"{workers:>2} worker: {total:6.2f}s total, transkrip pertama {first:5.2f}s")
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+"""
+Benchmark text_stats.analyze vs analisis dasar lama (beberapa lintasan split)
+pada input 4096 karakter.
+
+    python -m benchmarks.bench_text_stats
+"""
+import random
+import time
+
+from app.services.text_stats import DocumentFrequency, analyze
+
+VOCABULARY = (
+    "pemerintah ekonomi digital pertumbuhan investasi teknologi pendidikan masyarakat "
+    "kebijakan harga pasar produksi petani nelayan daerah kota jakarta indonesia startup "
+    "yang dan di ke dari untuk dengan ini itu adalah akan pada juga tidak sudah bisa "
+    "buku-buku anak-anak 2024 data analisis tren media sosial konten video"
+).split()
+TEXTS = 2_000
+ROUNDS = 2_000
+
+def make_text(rng: random.Random, size: int = 4096) -> str:
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(VOCABULARY)
+        if rng.random() < 0.08:
+            word += '.'
+        words.append(word)
+        length += len(word) + 1
+    return ' '.join(words)[:size]
+
+def legacy(text: str):
+    words = text.split()
+    word_count = len(words)
+    return (
+        len(text), word_count,
+        max(words, key=len) if words else 'N/A',
+        sum(len(word) for word in words) // word_count if word_count > 0 else 0,
+        ', '.join(set(words[:8])),
+    )
+
+def main():
+    rng = random.Random(7)
+    corpus = [make_text(rng) for _ in range(TEXTS)]
+
+    df = DocumentFrequency()
+    for text in corpus:
+        analyze(text, df=df)
+    print(f"Tabel DF: {df.stats()}")
+
+    sample = corpus[:ROUNDS]
+    for name, func in (
+        ('lama (multi-pass, tanpa keyword)', legacy),
+        ('analyze TF', lambda text: analyze(text)),
+        ('analyze TF-IDF', lambda text: analyze(text, df=df, learn=False)),
+    ):
+        start = time.perf_counter()
+        for text in sample:
+            func(text)
+        elapsed = time.perf_counter() - start
+        print(f"{name:34}: {elapsed / len(sample) * 1e6:8.1f} µs per teks 4096 karakter")
+
+    stats = analyze(corpus[0], df=df, learn=False)
+    print(f"Contoh kata kunci: {', '.join(term for term, _ in stats.keywords)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Server Gemini palsu lokal (REST generateContent / streamGenerateContent)
+untuk menguji routing API key tanpa kuota sungguhan. Key (atau pasangan
+(key, model)) di `quota_keys` selalu dibalas 429 RESOURCE_EXHAUSTED.
+
+    python -m tests.fake_gemini --port 8089 --quota-keys key-b
+    GEMINI_API_ENDPOINT=http://127.0.0.1:8089 python -m app.main
+"""
+import json
+import asyncio
+import argparse
+from collections import Counter
+
+from aiohttp import web
+
+class FakeGemini:
+    def __init__(self, quota_keys=()):
+        self.quota_keys = set(quota_keys)
+        # Jumlah request per (key, model)
+        self.requests = Counter()
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/v1beta/models/{target}', self.handle)
+        return app
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> web.AppRunner:
+        runner = web.AppRunner(self.app())
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        return runner
+
+    @staticmethod
+    def endpoint(runner: web.AppRunner) -> str:
+        host, port = runner.addresses[0][:2]
+        return f"http://{host}:{port}"
+
+    def key_requests(self, key: str) -> int:
+        return sum(count for (request_key, _), count in self.requests.items() if request_key == key)
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        model, _, method = request.match_info['target'].partition(':')
+        key = request.headers.get('x-goog-api-key', '')
+        self.requests[key, model] += 1
+
+        if key in self.quota_keys or (key, model) in self.quota_keys:
+            return web.json_response({'error': {
+                'code': 429, 'message': 'Resource has been exhausted', 'status': 'RESOURCE_EXHAUSTED',
+            }}, status=429)
+
+        body = await request.json()
+        prompt = body['contents'][0]['parts'][0]['text']
+        words = f"{model} {key}: {prompt}".split(' ')
+
+        if method == 'generateContent':
+            return web.json_response(_candidate(' '.join(words), len(words)))
+
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream'})
+        await response.prepare(request)
+        for index, word in enumerate(words):
+            chunk = word if index == 0 else f" {word}"
+            payload = _candidate(chunk, index + 1)
+            await response.write(f"data: {json.dumps(payload)}\r\n\r\n".encode())
+        await response.write_eof()
+        return response
+
+def _candidate(text: str, total_tokens: int) -> dict:
+    # Satu kata dihitung satu token; saat streaming jumlahnya kumulatif seperti API asli
+    return {
+        'candidates': [{'content': {'role': 'model', 'parts': [{'text': text}]}, 'finishReason': 'STOP'}],
+        'usageMetadata': {'totalTokenCount': total_tokens},
+    }
+
+async def main(port: int, quota_keys):
+    runner = await FakeGemini(quota_keys).start(port=port)
+    print(f"Fake Gemini di {FakeGemini.endpoint(runner)} (429 untuk: {', '.join(quota_keys) or '-'})")
+    await asyncio.Event().wait()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--quota-keys', default='')
+    args = parser.parse_args()
+    asyncio.run(main(args.port, [key for key in args.quota_keys.split(',') if key]))
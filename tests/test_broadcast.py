@@ -0,0 +1,146 @@
+import asyncio
+from collections import Counter
+
+import pytest
+
+pytest.importorskip('telegram')
+
+from telegram.error import Forbidden, RetryAfter
+
+from app.services import broadcast
+from app.services.broadcast import DONE, FAILED, RUNNING, Broadcaster
+from app.utils.rate_limiter import Limit
+
+FAST_RATE = Limit(10000, 1, 10000)
+
+class FakeDatabase:
+    """Tabel users + broadcasts di memori dengan kontrak yang sama seperti Database"""
+
+    is_connected = True
+
+    def __init__(self, user_ids, failures: int = 0):
+        self.user_ids = sorted(user_ids)
+        self.broadcasts = {}
+        # Jumlah error sementara sebelum get_user_ids_after berhasil
+        self.failures = failures
+
+    async def count_users(self) -> int:
+        return len(self.user_ids)
+
+    async def create_broadcast(self, message, created_by, total) -> int:
+        broadcast_id = len(self.broadcasts) + 1
+        self.broadcasts[broadcast_id] = {
+            'id': broadcast_id, 'message': message, 'status': RUNNING, 'total': total,
+            'last_user_id': 0, 'sent': 0, 'failed': 0, 'blocked': 0,
+        }
+        return broadcast_id
+
+    async def get_user_ids_after(self, last_user_id, limit):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("koneksi database putus")
+        return [user_id for user_id in self.user_ids if user_id > last_user_id][:limit]
+
+    async def save_broadcast_checkpoint(self, broadcast_id, status, last_user_id, sent, failed, blocked):
+        self.broadcasts[broadcast_id].update(
+            status=status, last_user_id=last_user_id, sent=sent, failed=failed, blocked=blocked
+        )
+
+    async def get_active_broadcast(self):
+        running = [row for row in self.broadcasts.values() if row['status'] == RUNNING]
+        return dict(running[-1]) if running else None
+
+class FakeBot:
+    def __init__(self, errors=None, delay: float = 0.0):
+        # user_id -> daftar exception yang dilempar berurutan sebelum berhasil
+        self.errors = {user_id: list(items) for user_id, items in (errors or {}).items()}
+        self.delay = delay
+        self.delivered = Counter()
+        self.calls = Counter()
+
+    async def send_message(self, chat_id, text):
+        self.calls[chat_id] += 1
+        await asyncio.sleep(self.delay)
+        pending = self.errors.get(chat_id)
+        if pending:
+            raise pending.pop(0)
+        self.delivered[chat_id] += 1
+
+def run_broadcast(database, bot, **options):
+    async def main():
+        broadcaster = Broadcaster(database, rate=FAST_RATE, **options)
+        await broadcaster.start(bot, "halo semua", created_by=1)
+        await broadcaster._task
+        return broadcaster.job
+
+    return asyncio.run(main())
+
+def test_broadcast_reaches_every_user_in_batches():
+    database = FakeDatabase(range(1, 8))
+    bot = FakeBot(errors={3: [Forbidden("bot was blocked by the user")]})
+
+    job = run_broadcast(database, bot, batch_size=3)
+
+    assert job.status == DONE
+    assert (job.sent, job.blocked, job.failed) == (6, 1, 0)
+    assert set(bot.delivered) == {1, 2, 4, 5, 6, 7}
+    assert database.broadcasts[job.id]['status'] == DONE
+    assert database.broadcasts[job.id]['last_user_id'] == 7
+
+def test_retry_after_does_not_use_up_attempts():
+    database = FakeDatabase(range(1, 4))
+    flood = [RetryAfter(0) for _ in range(broadcast.BROADCAST_MAX_RETRIES + 2)]
+    bot = FakeBot(errors={2: flood})
+
+    job = run_broadcast(database, bot)
+
+    assert (job.sent, job.failed) == (3, 0)
+    assert bot.calls[2] == broadcast.BROADCAST_MAX_RETRIES + 3
+
+def test_transient_database_error_is_retried(monkeypatch):
+    monkeypatch.setattr(broadcast, 'BROADCAST_ERROR_BACKOFF', 0.001)
+    database = FakeDatabase(range(1, 5), failures=2)
+
+    job = run_broadcast(database, FakeBot(), batch_size=2)
+
+    assert job.status == DONE
+    assert job.sent == 4
+
+def test_persistent_database_error_marks_broadcast_failed(monkeypatch):
+    monkeypatch.setattr(broadcast, 'BROADCAST_ERROR_BACKOFF', 0.001)
+    monkeypatch.setattr(broadcast, 'BROADCAST_MAX_ERRORS', 3)
+    database = FakeDatabase(range(1, 5), failures=100)
+
+    job = run_broadcast(database, FakeBot())
+
+    assert job.status == FAILED
+    assert database.broadcasts[job.id]['status'] == FAILED
+
+def test_stopped_broadcast_resumes_from_checkpoint_without_double_counting():
+    database = FakeDatabase(range(1, 11))
+    bot = FakeBot(delay=0.01)
+
+    async def main():
+        first = Broadcaster(database, rate=FAST_RATE, batch_size=4, concurrency=2)
+        await first.start(bot, "halo semua", created_by=1)
+        # Berhenti (shutdown) di tengah batch kedua
+        while sum(bot.delivered.values()) < 5:
+            await asyncio.sleep(0.001)
+        await first.stop()
+        checkpoint = dict(database.broadcasts[first.job.id])
+
+        second = Broadcaster(database, rate=FAST_RATE, batch_size=4, concurrency=2)
+        job = await second.resume(bot)
+        await second._task
+        return checkpoint, job
+
+    checkpoint, job = asyncio.run(main())
+
+    # Checkpoint berada di batas batch dan tetap 'running' agar di-resume
+    assert checkpoint['status'] == RUNNING
+    assert (checkpoint['last_user_id'], checkpoint['sent']) == (4, 4)
+    assert job.status == DONE
+    assert job.sent == 10
+    assert set(bot.delivered) == set(range(1, 11))
+    # Hanya pesan dari batch yang terputus yang bisa terkirim dua kali
+    assert all(count == 1 for user_id, count in bot.delivered.items() if user_id <= 4)
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from app.services import key_pool
+from app.services.ai_analyzer import AIAnalyzer
+from app.services.key_pool import close_http_session, is_quota_error
+from tests.fake_gemini import FakeGemini
+
+KEYS = ['key-a', 'key-b', 'key-c']
+
+def run_with_fake(monkeypatch, quota_keys, scenario, fallback_models=''):
+    """Jalankan skenario dengan analyzer yang diarahkan ke server Gemini palsu"""
+    monkeypatch.setenv('GOOGLE_AI_STUDIO_API_KEYS', ','.join(KEYS))
+    monkeypatch.delenv('GOOGLE_AI_STUDIO_API_KEY', raising=False)
+    monkeypatch.setenv('GEMINI_MODEL', 'models/fake')
+    monkeypatch.setenv('GEMINI_FALLBACK_MODELS', fallback_models)
+
+    async def main():
+        fake = FakeGemini(quota_keys)
+        runner = await fake.start()
+        monkeypatch.setattr(key_pool, 'GEMINI_API_ENDPOINT', FakeGemini.endpoint(runner))
+        analyzer = AIAnalyzer()
+        try:
+            return fake, analyzer, await scenario(analyzer)
+        finally:
+            await close_http_session()
+            await runner.cleanup()
+
+    return asyncio.run(main())
+
+def test_requests_spread_round_robin_across_keys(monkeypatch):
+    async def scenario(analyzer):
+        return [(await analyzer._generate(f"halo {i}")).text for i in range(6)]
+
+    fake, _, texts = run_with_fake(monkeypatch, (), scenario)
+
+    assert [fake.key_requests(key) for key in KEYS] == [2, 2, 2]
+    assert texts[0] == 'fake key-a: halo 0'
+    assert texts[1] == 'fake key-b: halo 1'
+
+def test_quota_error_sidelines_key_and_retries_on_next(monkeypatch):
+    async def scenario(analyzer):
+        return [(await analyzer._generate(f"halo {i}")).text for i in range(6)]
+
+    fake, analyzer, texts = run_with_fake(monkeypatch, {'key-b'}, scenario)
+
+    # key-b hanya dicoba sekali lalu diistirahatkan; semua request tetap berhasil
+    assert fake.key_requests('key-b') == 1
+    assert fake.key_requests('key-a') + fake.key_requests('key-c') == 6
+    assert all('key-b' not in text for text in texts)
+    stats = {slot['key']: slot for slot in analyzer.key_pool.stats()['keys']}
+    assert stats['***ey-b/fake']['sidelined']
+    assert stats['***ey-b/fake']['quota_errors'] == 1
+
+def test_sidelined_primary_model_falls_back_to_next_model(monkeypatch):
+    async def scenario(analyzer):
+        with pytest.raises(Exception):
+            await analyzer._generate("pertama")
+        return (await analyzer._generate("kedua")).text
+
+    quota = {(key, 'fake') for key in KEYS}
+    fake, _, text = run_with_fake(monkeypatch, quota, scenario, fallback_models='models/cadangan')
+
+    # Semua key model utama diistirahatkan, request berikutnya ke model fallback
+    assert text == 'cadangan key-a: kedua'
+    assert [fake.requests[key, 'fake'] for key in KEYS] == [1, 1, 1]
+
+def test_quota_error_after_retry_budget_is_raised(monkeypatch):
+    async def scenario(analyzer):
+        with pytest.raises(Exception) as error:
+            await analyzer._generate("halo")
+        return error.value
+
+    fake, _, error = run_with_fake(monkeypatch, set(KEYS), scenario)
+
+    assert is_quota_error(error)
+    assert [fake.key_requests(key) for key in KEYS] == [1, 1, 1]
+
+def test_streaming_through_pool(monkeypatch):
+    async def scenario(analyzer):
+        response = await analyzer._generate("satu dua", stream=True)
+        return [chunk.text async for chunk in response]
+
+    _, _, chunks = run_with_fake(monkeypatch, (), scenario)
+
+    assert chunks == ['fake', ' key-a:', ' satu', ' dua']
+
+def test_token_usage_reconciled_with_usage_metadata(monkeypatch):
+    async def scenario(analyzer):
+        await analyzer._generate("satu dua tiga")
+        response = await analyzer._generate("empat lima", stream=True)
+        [chunk async for chunk in response]
+
+    _, analyzer, _ = run_with_fake(monkeypatch, (), scenario)
+
+    # Estimasi awal (prompt + max_output_tokens) diganti token dari server
+    stats = {slot['key']: slot for slot in analyzer.key_pool.stats()['keys']}
+    assert stats['***ey-a/fake']['tpm'] == 5
+    assert stats['***ey-b/fake']['tpm'] == 4
@@ -0,0 +1,45 @@
+from app.utils.rate_limiter import GCRALimiter, Limit, RateLimits
+
+def test_burst_then_reject_with_retry_after():
+    limiter = GCRALimiter(Limit(10, 60, 3))
+
+    # Burst 3 langsung lolos, request ke-4 harus menunggu satu interval (6 detik)
+    assert [limiter.check('u', now=100.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.check('u', now=100.0) == 6.0
+    assert limiter.check('u', now=106.0) == 0.0
+    assert limiter.stats() == {'keys': 1, 'allowed': 4, 'rejected': 1}
+
+def test_keys_are_independent():
+    limiter = GCRALimiter(Limit(1, 60, 1))
+
+    assert limiter.check('a', now=0.0) == 0.0
+    assert limiter.check('a', now=0.0) > 0
+    assert limiter.check('b', now=0.0) == 0.0
+
+def test_idle_keys_are_evicted():
+    limiter = GCRALimiter(Limit(1, 10, 1), max_keys=2)
+    for key in 'abc':
+        limiter.check(key, now=0.0)
+
+    # Batas jumlah key: key paling lama dibuang
+    assert len(limiter) == 2
+    # Key yang TAT-nya sudah lewat setara key baru dan ikut dibuang
+    limiter.check('d', now=20.0)
+    assert len(limiter) == 1
+
+def test_chat_reject_refunds_user_token():
+    limits = RateLimits({'text': (Limit(2, 60, 2), Limit(2, 60, 2))}, chat_limit=Limit(1, 60, 1))
+
+    assert limits.check('text', user_id=1, chat_id=-100) == 0.0
+    # Chat penuh: user 2 ditolak di level chat, token pribadinya tidak terpakai
+    assert limits.check('text', user_id=2, chat_id=-100) > 0
+    assert limits.check('text', user_id=2, chat_id=2) == 0.0
+    assert limits.check('text', user_id=2, chat_id=2) == 0.0
+    assert limits.check('text', user_id=2, chat_id=2) > 0
+
+def test_premium_uses_its_own_budget():
+    limits = RateLimits({'text': (Limit(1, 60, 1), Limit(5, 60, 5))})
+
+    assert limits.check('text', user_id=1) == 0.0
+    assert limits.check('text', user_id=1) > 0
+    assert all(limits.check('text', user_id=1, premium=True) == 0.0 for _ in range(5))
@@ -0,0 +1,174 @@
+import asyncio
+import enum
+
+import pytest
+
+from app.services import resilience
+from app.services.resilience import (
+    AdaptiveLimiter, CircuitBreaker, CircuitOpenError, HedgePolicy, OverloadedError,
+    guarded_call, hedged, is_upstream_failure,
+)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(resilience, 'time', clock)
+    return clock
+
+class HTTPError(Exception):
+    def __init__(self, code):
+        self.code = code
+
+StatusCode = enum.Enum('StatusCode', 'INVALID_ARGUMENT PERMISSION_DENIED RESOURCE_EXHAUSTED UNAVAILABLE')
+
+class GrpcError(Exception):
+    def __init__(self, status):
+        self.status = status
+
+    def code(self):
+        return self.status
+
+def test_upstream_failure_classification():
+    assert is_upstream_failure(asyncio.TimeoutError())
+    assert is_upstream_failure(HTTPError(503))
+    assert not is_upstream_failure(HTTPError(400))
+    assert is_upstream_failure(GrpcError(StatusCode.RESOURCE_EXHAUSTED))
+    assert is_upstream_failure(GrpcError(StatusCode.UNAVAILABLE))
+    # Error request dari sisi klien tidak membuka breaker
+    assert not is_upstream_failure(GrpcError(StatusCode.INVALID_ARGUMENT))
+    assert not is_upstream_failure(ValueError("prompt ditolak"))
+
+def test_breaker_opens_then_half_open_probe_closes(clock):
+    breaker = CircuitBreaker(failure_threshold=3, window=20, reset_timeout=30)
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    # Setelah reset_timeout hanya satu probe yang diizinkan
+    clock.now += 30
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats()['trips'] == 1
+    assert breaker.stats()['short_circuited'] == 2
+
+def test_failed_probe_reopens_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock.now += 10
+    breaker.before_call()
+    breaker.record_failure()
+
+    assert breaker.is_open
+
+def test_ignored_error_releases_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    breaker.record_failure()
+    clock.now += 10
+    breaker.before_call()
+    breaker.record_ignored()
+
+    # Probe berikutnya boleh dikirim
+    breaker.before_call()
+
+def test_aimd_halves_on_failure_and_grows_additively(clock):
+    limiter = AdaptiveLimiter(max_limit=8, min_limit=1, latency_target=5)
+
+    limiter.on_failure()
+    assert limiter.limit == 4
+    # Penurunan kedua dalam jendela latency target diabaikan
+    limiter.on_failure()
+    assert limiter.limit == 4
+
+    clock.now += 5
+    limiter.on_success(latency=6)  # lambat = sinyal overload
+    assert limiter.limit == 2
+
+    for _ in range(2):
+        limiter.on_success(latency=1)
+    assert limiter.limit == pytest.approx(2 + 1 / 2 + 1 / 2.5)
+
+    for _ in range(200):
+        limiter.on_success(latency=1)
+    assert limiter.limit == 8
+
+def test_limiter_rejects_when_no_slot_frees_up():
+    async def main():
+        limiter = AdaptiveLimiter(max_limit=1, slot_wait=0.01)
+        async with limiter.slot():
+            with pytest.raises(OverloadedError):
+                async with limiter.slot():
+                    pass
+        return limiter.stats()
+
+    stats = asyncio.run(main())
+    assert stats['rejected'] == 1
+    assert stats['in_flight'] == 0
+
+def test_guarded_call_records_outcomes():
+    async def call(breaker, limiter, error=None):
+        async with guarded_call(breaker, limiter):
+            if error:
+                raise error
+
+    async def main():
+        breaker = CircuitBreaker(failure_threshold=2)
+        limiter = AdaptiveLimiter(max_limit=4)
+        await call(breaker, limiter)
+        with pytest.raises(ValueError):
+            await call(breaker, limiter, ValueError("prompt ditolak"))
+        for _ in range(2):
+            with pytest.raises(HTTPError):
+                await call(breaker, limiter, HTTPError(503))
+        return breaker, limiter
+
+    breaker, limiter = asyncio.run(main())
+    # Error non-upstream tidak dihitung; dua 503 berturut-turut membuka breaker
+    assert breaker.state == CircuitBreaker.OPEN
+    assert limiter.limit == 2
+
+def test_hedge_fires_after_percentile_and_faster_copy_wins():
+    policy = HedgePolicy(percentile=50, budget=1.0, min_samples=1)
+    policy.latency.add(0.01)
+    delays = iter([1.0, 0.0])
+
+    async def factory():
+        await asyncio.sleep(next(delays))
+        return 'hasil'
+
+    assert asyncio.run(hedged(factory, policy)) == 'hasil'
+    assert policy.hedges == 1
+    assert policy.wins == 1
+
+def test_hedge_budget_limits_extra_requests():
+    policy = HedgePolicy(percentile=50, budget=0.5, min_samples=1)
+    for _ in range(50):
+        policy.latency.add(0.001)
+
+    async def factory():
+        await asyncio.sleep(0.02)
+        return 'hasil'
+
+    async def main():
+        for _ in range(4):
+            await hedged(factory, policy)
+
+    asyncio.run(main())
+    # Budget 0.5 token per request: 4 request hanya memberi 2 hedge
+    assert policy.hedges == 2
+    assert policy.denied == 2
@@ -0,0 +1,47 @@
+from app.services.simhash import NearDuplicateIndex, SimHashIndex, hamming_distance, simhash, tokenize
+
+def test_fingerprint_ignores_case_punctuation_and_emoji():
+    assert tokenize("Halo, Apa KABAR?? 😀") == ['halo', 'apa', 'kabar']
+    assert simhash(tokenize("Tren TikTok minggu ini!")) == simhash(tokenize("tren tiktok minggu ini"))
+
+def test_lookup_finds_entries_within_max_distance():
+    index = SimHashIndex(capacity=8, max_distance=3)
+    base = 0x0123456789ABCDEF
+    index.add(base, 'dekat')
+
+    assert index.lookup(base ^ 0b111) == (3, 'dekat')
+    assert index.lookup(base ^ 0b1111) is None
+    # Bit yang berbeda tersebar di band berbeda tetap ditemukan
+    assert index.lookup(base ^ (1 | 1 << 20 | 1 << 63)) == (3, 'dekat')
+
+def test_lookup_prefers_closest_entry():
+    index = SimHashIndex(capacity=8, max_distance=3)
+    index.add(0b1100, 'jauh')
+    index.add(0b0001, 'terdekat')
+
+    assert index.lookup(0) == (1, 'terdekat')
+
+def test_ring_buffer_evicts_oldest():
+    index = SimHashIndex(capacity=2, max_distance=0)
+    for value in (1, 2, 3):
+        index.add(value << 40, value)
+
+    assert len(index) == 2
+    assert index.lookup(1 << 40) is None
+    assert index.lookup(3 << 40) == (0, 3)
+
+def test_near_duplicate_prompts_share_analysis():
+    index = NearDuplicateIndex(capacity=16, max_distance=3, min_tokens=4)
+    prompt = "analisis tren konten video pendek di tiktok minggu ini untuk brand fashion lokal"
+    index.add(index.fingerprint(prompt), 'analisis')
+
+    variant = "Analisis tren konten video pendek di TikTok minggu ini untuk brand fashion lokal!"
+    assert index.get(index.fingerprint(variant)) == 'analisis'
+    assert index.get(index.fingerprint("resep nasi goreng kampung pedas untuk makan malam keluarga")) is None
+
+def test_short_prompts_are_not_fingerprinted():
+    index = NearDuplicateIndex(min_tokens=4)
+
+    assert index.fingerprint("halo bot") is None
+    assert index.get(None) is None
+    assert hamming_distance(0b1010, 0b0110) == 2
@@ -0,0 +1,81 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('telegram')
+
+from app.utils import update_processor
+from app.utils.update_processor import (
+    AUDIO_LANE, FAST_LANE, HEAVY_LANE, ChatOrderedUpdateProcessor,
+)
+
+def fake_update(lane: str, chat_id: int):
+    return SimpleNamespace(lane=lane, effective_chat=SimpleNamespace(id=chat_id))
+
+@pytest.fixture(autouse=True)
+def lane_from_fake_update(monkeypatch):
+    monkeypatch.setattr(update_processor, 'classify_update', lambda update: update.lane)
+
+@pytest.mark.parametrize('total, heavy, audio, expected', [
+    (64, 48, 8, (64, 48, 8)),
+    (10, 48, 8, (10, 8, 1)),
+    (4, 2, 2, (4, 2, 1)),
+    (3, 48, 8, (3, 1, 1)),
+    # Total terlalu kecil dinaikkan ke 3: satu slot per lane
+    (1, 48, 8, (3, 1, 1)),
+    (0, 0, 0, (3, 1, 1)),
+])
+def test_lane_budgets_are_clamped(total, heavy, audio, expected):
+    processor = ChatOrderedUpdateProcessor(total, heavy, audio)
+
+    assert (processor.max_concurrent, processor.heavy_concurrent, processor.audio_concurrent) == expected
+    assert processor.heavy_concurrent + processor.audio_concurrent < processor.max_concurrent
+    assert processor._global._value == processor.max_concurrent
+
+def test_fast_lane_runs_while_heavy_and_audio_are_full():
+    async def main():
+        processor = ChatOrderedUpdateProcessor(1, 48, 8)
+        release = asyncio.Event()
+        ran = []
+
+        async def handler(name):
+            ran.append(name)
+            await release.wait()
+
+        background = [
+            asyncio.create_task(processor.do_process_update(fake_update(lane, chat), handler(name)))
+            for name, lane, chat in [('ai', HEAVY_LANE, 1), ('ai-2', HEAVY_LANE, 2), ('voice', AUDIO_LANE, 3)]
+        ]
+        await asyncio.sleep(0)
+
+        # Lane berat/audio penuh, command ringan tetap langsung diproses
+        task = asyncio.create_task(processor.do_process_update(fake_update(FAST_LANE, 4), handler('start')))
+        await asyncio.sleep(0.01)
+        snapshot = list(ran)
+        release.set()
+        await asyncio.gather(task, *background)
+        return snapshot, processor.stats()
+
+    snapshot, stats = asyncio.run(main())
+    assert snapshot == ['ai', 'voice', 'start']
+    assert stats['lanes'][HEAVY_LANE]['processed'] == 2
+
+def test_updates_in_one_chat_keep_their_order():
+    async def main():
+        processor = ChatOrderedUpdateProcessor(64, 48, 8)
+        order = []
+
+        async def handler(index, delay):
+            await asyncio.sleep(delay)
+            order.append(index)
+
+        await asyncio.gather(*(
+            processor.do_process_update(fake_update(HEAVY_LANE, 7), handler(index, delay))
+            for index, delay in enumerate([0.03, 0.0, 0.01])
+        ))
+        return order, processor.stats()
+
+    order, stats = asyncio.run(main())
+    assert order == [0, 1, 2]
+    assert stats['chats_waiting'] == 0